@@ -67,6 +67,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         connection.execute(text("PRAGMA foreign_keys=ON"))
+        # Close the implicit transaction opened by the PRAGMA so that
+        # begin_transaction() below owns (and commits) the migration
+        connection.commit()
         context.configure(connection=connection, target_metadata=target_metadata)
 
         with context.begin_transaction():
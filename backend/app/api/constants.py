@@ -0,0 +1,18 @@
+# Experiment listing page size
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Response header carrying the cursor of the next listing page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Rows fetched from the database and written per chunk of a streamed export
+EXPORT_CHUNK_ROWS = 500
+
+# Experiments, and runs over all of them, accepted by a single batch submission
+MAX_BATCH_EXPERIMENTS = 1000
+MAX_BATCH_RUNS = 100000
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MINIMUM_SIZE = 1024
+GZIP_COMPRESS_LEVEL = 6
+BROTLI_QUALITY = 4
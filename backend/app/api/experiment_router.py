@@ -1,120 +1,518 @@
-import csv
-from io import StringIO
-from typing import List
+import asyncio
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from ..db.models.experiment_models import Experiment, ExperimentRun
+from ..db.enums import (
+    TERMINAL_EXPERIMENT_STATUSES,
+    ExecutionMode,
+    ExperimentStatus,
+    ResponseStatus,
+)
+from ..db.models.experiment_models import Experiment
+from ..db.queries.experiment_queries import (
+    get_experiment_token_usage,
+    get_experiment_with_runs,
+    get_model_token_usage,
+    get_parameter_cell_stats,
+    get_response_status_counts,
+    iter_experiment_response_rows,
+    list_experiments_page,
+)
 from ..db.session import get_db
 from ..schemas.experiment_schemas import (
     ExperimentCreateSchema,
     ExperimentDetailSchema,
+    ExperimentJobSchema,
     ExperimentListSchema,
+    ExperimentProgressSchema,
+    ExperimentStatsSchema,
+    ExperimentUsageSchema,
+    ModelUsageSchema,
+)
+from ..services.core.constants import EVENT_STREAM_KEEPALIVE_SECONDS
+from ..services.core.detail_cache import experiment_detail_cache
+from ..services.core.event_bus import EXPERIMENT_EVENT, experiment_event_bus
+from ..services.core.experiment_cancellation import (
+    cancel_unfinished_runs,
+    experiment_cancellations,
 )
+from ..services.core.experiment_executor import experiment_executor
+from ..services.core.experiment_factory import create_experiments
 from ..services.core.experiment_orchestrator import ExperimentOrchestrator
+from ..services.core.experiment_recovery import has_live_leases, reset_unfinished_runs
+from ..services.export.experiment_exporter import gzip_chunks, iter_csv, iter_ndjson
+from ..services.metrics.overall_metric import METRIC_CLASSES
+from ..services.timings import TIMING_NAMES
+from .constants import (
+    DEFAULT_PAGE_SIZE,
+    EXPORT_CHUNK_ROWS,
+    MAX_BATCH_EXPERIMENTS,
+    MAX_BATCH_RUNS,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+)
 
-router = APIRouter(prefix="/experiments", tags=["experiments"])
+router = APIRouter(
+    prefix="/experiments",
+    tags=["experiments"],
+    default_response_class=ORJSONResponse,
+)
 
 
 @router.get("/", response_model=List[ExperimentListSchema])
-def list_experiments(db: Session = Depends(get_db)):
+def list_experiments(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[ExperimentStatus] = None,
+    model_name: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
     """
-    Get list of experiments with basic information
+    Get list of experiments with basic information, newest first.
+    Paginated with a cursor: when more experiments exist, the cursor of the
+    next page is returned in the X-Next-Cursor header.
     """
-    experiments = db.query(Experiment).order_by(Experiment.created_at.desc()).all()
+    try:
+        experiments, next_cursor = list_experiments_page(
+            db,
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            model_name=model_name,
+            name_prefix=name_prefix,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return experiments
 
 
+@router.get("/usage", response_model=List[ModelUsageSchema])
+def get_model_usage(db: Session = Depends(get_db)):
+    """
+    Get the prompt, completion, cached and embedding tokens used by the
+    experiments of each model, and their completion tokens per second.
+    """
+    return get_model_token_usage(db)
+
+
+def _detail_etag(experiment_id: int, updated_at: datetime) -> str:
+    version = int(updated_at.replace(tzinfo=timezone.utc).timestamp() * 1_000_000)
+    return f'"{experiment_id}-{version}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _is_not_modified(request: Request, etag: str, updated_at: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison (RFC 9110): proxies that compress the response,
+        # such as nginx, hand out the ETag as W/"..."
+        tags = [_opaque_tag(tag) for tag in if_none_match.split(",")]
+        return _opaque_tag(etag) in tags or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have second precision
+        modified = updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+        return modified <= since
+    return False
+
+
 @router.get("/{experiment_id}/", response_model=ExperimentDetailSchema)
-def get_experiment_detail(experiment_id: int, db: Session = Depends(get_db)):
+def get_experiment_detail(
+    experiment_id: int, request: Request, db: Session = Depends(get_db)
+):
     """
     Get detailed experiment information with associated runs and responses
     Returns: experiment details + list of runs with responses
+
+    Finished experiments never change, so they are served with ETag and
+    Last-Modified headers (answering conditional requests with 304) from a
+    cache of serialized payloads.
+    """
+    version = (
+        db.query(Experiment.status, Experiment.updated_at)
+        .filter(Experiment.id == experiment_id)
+        .first()
+    )
+    if not version:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+
+    status, updated_at = version
+    if status not in TERMINAL_EXPERIMENT_STATUSES:
+        return get_experiment_with_runs(db, experiment_id)
+
+    etag = _detail_etag(experiment_id, updated_at)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(
+            updated_at.replace(tzinfo=timezone.utc), usegmt=True
+        ),
+        "Cache-Control": "no-cache",
+    }
+    if _is_not_modified(request, etag, updated_at):
+        return Response(status_code=304, headers=headers)
+
+    payload = experiment_detail_cache.get(experiment_id, updated_at)
+    if payload is None:
+        experiment = get_experiment_with_runs(db, experiment_id)
+        payload = ExperimentDetailSchema.model_validate(experiment).model_dump_json()
+        payload = payload.encode()
+        experiment_detail_cache.put(experiment_id, updated_at, payload)
+
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+@router.get("/{experiment_id}/status", response_model=ExperimentProgressSchema)
+def get_experiment_status(experiment_id: int, db: Session = Depends(get_db)):
+    """
+    Get the status of an experiment with per-status run counts.
+    Cheap enough to poll while an experiment is running.
     """
     experiment = db.query(Experiment).filter(Experiment.id == experiment_id).first()
+    if not experiment:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+
+    return _experiment_progress(db, experiment)
+
+
+def _experiment_progress(db: Session, experiment: Experiment):
+    counts = get_response_status_counts(db, experiment.id)
+    running = counts.get(ResponseStatus.RUNNING, 0)
+    completed = counts.get(ResponseStatus.COMPLETED, 0)
+    failed = counts.get(ResponseStatus.FAILED, 0)
+    cancelled = counts.get(ResponseStatus.CANCELLED, 0)
+
+    return ExperimentProgressSchema(
+        id=experiment.id,
+        status=experiment.status,
+        total_runs=experiment.total_runs,
+        pending=max(
+            experiment.total_runs - running - completed - failed - cancelled, 0
+        ),
+        running=running,
+        completed=completed,
+        failed=failed,
+        cancelled=cancelled,
+    )
+
+
+@router.get("/{experiment_id}/stats", response_model=ExperimentStatsSchema)
+def get_experiment_stats(experiment_id: int, db: Session = Depends(get_db)):
+    """
+    Get count, mean, stddev and p50/p90/p99 of every metric, of latency_ms
+    and of every stage timing for each (temperature, top_p, max_output_tokens)
+    cell, computed in the database from the stored values of completed
+    responses.
+    """
+    if not db.query(Experiment.id).filter(Experiment.id == experiment_id).first():
+        raise HTTPException(status_code=404, detail="Experiment not found")
+
+    metric_names = ["overall", *METRIC_CLASSES]
+    timing_names = [*TIMING_NAMES, *(f"{name}_ms" for name in METRIC_CLASSES)]
+    return ExperimentStatsSchema(
+        id=experiment_id,
+        cells=get_parameter_cell_stats(db, experiment_id, metric_names, timing_names),
+    )
+
 
+@router.get("/{experiment_id}/usage", response_model=ExperimentUsageSchema)
+def get_experiment_usage(experiment_id: int, db: Session = Depends(get_db)):
+    """
+    Get the prompt, completion, cached and embedding tokens used by an
+    experiment, failed and retried runs included, and its completion tokens
+    per second of generation.
+    """
+    experiment = (
+        db.query(Experiment.id, Experiment.model_name)
+        .filter(Experiment.id == experiment_id)
+        .first()
+    )
     if not experiment:
         raise HTTPException(status_code=404, detail="Experiment not found")
 
-    return experiment
+    return ExperimentUsageSchema(
+        id=experiment_id,
+        model_name=experiment.model_name,
+        **get_experiment_token_usage(db, experiment_id),
+    )
+
+
+def _format_sse(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/{experiment_id}/events")
+async def stream_experiment_events(experiment_id: int, db: Session = Depends(get_db)):
+    """
+    Server-Sent Events stream of experiment progress.
+    Sends one `run` event per ResponseRecord status change and ends with an
+    `experiment` event carrying the final experiment status.
+    """
+    # Subscribe before reading the status so no event can slip in between
+    subscription = experiment_event_bus.subscribe(experiment_id)
+
+    def get_status():
+        experiment = db.query(Experiment).filter(Experiment.id == experiment_id).first()
+        status = experiment.status if experiment else None
+        # Release the connection; the stream itself never touches the database
+        db.close()
+        return status
+
+    try:
+        status = await run_in_threadpool(get_status)
+    except BaseException:
+        experiment_event_bus.unsubscribe(experiment_id, subscription)
+        raise
+
+    if status is None:
+        experiment_event_bus.unsubscribe(experiment_id, subscription)
+        raise HTTPException(status_code=404, detail="Experiment not found")
+
+    async def event_stream():
+        try:
+            if status in TERMINAL_EXPERIMENT_STATUSES:
+                yield _format_sse(
+                    EXPERIMENT_EVENT, {"id": experiment_id, "status": status.value}
+                )
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), timeout=EVENT_STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield _format_sse(event["event"], event["data"])
+                if event["event"] == EXPERIMENT_EVENT:
+                    return
+        finally:
+            experiment_event_bus.unsubscribe(experiment_id, subscription)
 
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _job_handle(request: Request, experiment_id: int) -> ExperimentJobSchema:
+    return ExperimentJobSchema(
+        experiment_id=experiment_id,
+        status=ExperimentStatus.PENDING,
+        status_url=request.app.url_path_for(
+            "get_experiment_status", experiment_id=experiment_id
+        ),
+    )
 
-@router.post("/", response_model=ExperimentDetailSchema)
+
+@router.post(
+    "/",
+    response_model=ExperimentDetailSchema,
+    responses={202: {"model": ExperimentJobSchema}},
+)
 def create_experiment(
-    experiment_data: ExperimentCreateSchema, db: Session = Depends(get_db)
+    experiment_data: ExperimentCreateSchema,
+    request: Request,
+    background: bool = Query(
+        False, description="Queue the experiment and return 202 immediately"
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Create a new experiment with associated runs and execute it.
+    With background=true the experiment is queued on the job executor and a
+    job handle pointing at the status endpoint is returned instead. Batch
+    mode experiments are always queued.
+    """
+    (experiment_id,) = create_experiments(db, [experiment_data])
+    experiment = get_experiment_with_runs(db, experiment_id)
+
+    if background or experiment.execution_mode == ExecutionMode.BATCH:
+        experiment_executor.submit(experiment.id, experiment.execution_mode)
+        job = _job_handle(request, experiment.id)
+        return ORJSONResponse(status_code=202, content=job.model_dump(mode="json"))
+
+    # Run the experiment orchestrator
+    orchestrator = ExperimentOrchestrator(experiment, db)
+    orchestrator.run_experiment()
+
+    # Reload runs and responses in one query per level for the response
+    return get_experiment_with_runs(db, experiment_id)
+
+
+@router.post("/batch", status_code=202, response_model=List[ExperimentJobSchema])
+def create_experiments_batch(
+    request: Request,
+    experiments_data: List[ExperimentCreateSchema] = Body(
+        ..., min_length=1, max_length=MAX_BATCH_EXPERIMENTS
+    ),
+    db: Session = Depends(get_db),
 ):
     """
-    Create a new experiment with associated runs and execute it
+    Create many experiments at once and queue them all for execution.
+    All experiments and runs are inserted in one transaction.
     """
-    # Create the experiment
-    experiment = Experiment(
-        user_prompt=experiment_data.user_prompt,
-        name=experiment_data.name,
-        model_name=experiment_data.model_name,
-        total_runs=experiment_data.total_runs,
-        status="pending",
+    # Counted from the sweep axis lengths, before any run is expanded
+    batch_runs = sum(
+        len(data.runs) + (data.sweep.run_count if data.sweep else 0)
+        for data in experiments_data
     )
-    db.add(experiment)
-    db.commit()
-    db.refresh(experiment)
-
-    # Create experiment runs
-    for run_data in experiment_data.runs:
-        run = ExperimentRun(
-            experiment_id=experiment.id,
-            temperature=run_data.temperature,
-            top_p=run_data.top_p,
-            max_output_tokens=run_data.max_output_tokens,
+    if batch_runs > MAX_BATCH_RUNS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Batch expands to {batch_runs} runs, more than {MAX_BATCH_RUNS}",
         )
-        db.add(run)
 
-    db.commit()
+    experiment_ids = create_experiments(db, experiments_data)
+    for experiment_id, data in zip(experiment_ids, experiments_data):
+        experiment_executor.submit(experiment_id, data.execution_mode)
 
-    # Refresh to get all runs
-    db.refresh(experiment)
+    return [_job_handle(request, experiment_id) for experiment_id in experiment_ids]
 
-    # Run the experiment orchestrator
-    orchestrator = ExperimentOrchestrator(experiment, db)
-    experiment = orchestrator.run_experiment()
 
-    return experiment
+@router.post(
+    "/{experiment_id}/resume", status_code=202, response_model=ExperimentJobSchema
+)
+def resume_experiment(
+    experiment_id: int, request: Request, db: Session = Depends(get_db)
+):
+    """
+    Queue an experiment again to execute every run that has no completed
+    response, e.g. after the process running it died or some runs failed.
+    Completed runs are kept and not generated again.
+    """
+    experiment = db.query(Experiment).filter(Experiment.id == experiment_id).first()
+    if not experiment:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+
+    if experiment_executor.is_active(experiment_id) or has_live_leases(
+        db, experiment_id
+    ):
+        raise HTTPException(status_code=409, detail="Experiment is still running")
 
+    reset_unfinished_runs(db, experiment_id)
+    experiment.status = ExperimentStatus.PENDING
+    db.commit()
+    experiment_detail_cache.invalidate(experiment_id)
 
-@router.get("/{experiment_id}/export/csv/")
-def export_experiment_csv(experiment_id: int, db: Session = Depends(get_db)):
+    experiment_executor.submit(experiment_id, experiment.execution_mode)
+    return _job_handle(request, experiment_id)
+
+
+@router.post("/{experiment_id}/cancel", response_model=ExperimentProgressSchema)
+def cancel_experiment(experiment_id: int, db: Session = Depends(get_db)):
+    """
+    Cancel a queued or running experiment.
+    No new runs are started, runs in flight are abandoned and every run
+    without a response is marked cancelled. Completed runs are kept, and the
+    experiment can be resumed later.
+    """
     experiment = db.query(Experiment).filter(Experiment.id == experiment_id).first()
     if not experiment:
         raise HTTPException(status_code=404, detail="Experiment not found")
 
-    # Build CSV as string
-    csv_file = StringIO()
-    writer = csv.writer(csv_file)
+    if experiment.status in TERMINAL_EXPERIMENT_STATUSES:
+        raise HTTPException(status_code=409, detail="Experiment is already finished")
+
+    experiment.status = ExperimentStatus.CANCELLED
+    cancel_unfinished_runs(db, experiment_id)
+    db.commit()
+    experiment_detail_cache.invalidate(experiment_id)
+
+    # A queued job is dropped; a running one stops at its next check
+    if not experiment_executor.cancel(experiment_id):
+        experiment_cancellations.cancel(experiment_id)
+    experiment_event_bus.publish(
+        experiment_id,
+        EXPERIMENT_EVENT,
+        {"id": experiment_id, "status": ExperimentStatus.CANCELLED.value},
+    )
+
+    return _experiment_progress(db, experiment)
+
+
+def _export_response(
+    chunks, experiment_id: int, extension: str, media_type: str, compress: bool
+) -> StreamingResponse:
+    filename = f"experiment_{experiment_id}.{extension}"
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
 
-    # Header
-    writer.writerow(
-        ["Run ID", "Temperature", "Top P", "Response Text", "Overall Metric"]
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
-    # Rows
-    for run in experiment.runs:
-        response = run.response  # because it's one-to-one
-        if response:
-            writer.writerow(
-                [
-                    run.id,
-                    run.temperature,
-                    run.top_p,
-                    response.generated_text or "",
-                    response.metrics.get("overall") if response.metrics else "",
-                ]
-            )
-    csv_content = csv_file.getvalue()
-
-    return Response(
-        content=csv_content,
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": f"attachment; filename=experiment_{experiment_id}.csv"
-        },
+
+@router.get("/{experiment_id}/export/csv/")
+def export_experiment_csv(
+    experiment_id: int,
+    gzip: bool = Query(False, description="Gzip-compress the exported file"),
+    db: Session = Depends(get_db),
+):
+    """
+    Stream the experiment results as CSV, one row per run with every metric.
+    """
+    if not db.query(Experiment.id).filter(Experiment.id == experiment_id).first():
+        raise HTTPException(status_code=404, detail="Experiment not found")
+
+    rows = iter_experiment_response_rows(db, experiment_id, EXPORT_CHUNK_ROWS)
+    return _export_response(
+        iter_csv(rows, EXPORT_CHUNK_ROWS), experiment_id, "csv", "text/csv", gzip
+    )
+
+
+@router.get("/{experiment_id}/export/ndjson/")
+def export_experiment_ndjson(
+    experiment_id: int,
+    gzip: bool = Query(False, description="Gzip-compress the exported file"),
+    db: Session = Depends(get_db),
+):
+    """
+    Stream the experiment results as newline-delimited JSON, one object per run.
+    """
+    if not db.query(Experiment.id).filter(Experiment.id == experiment_id).first():
+        raise HTTPException(status_code=404, detail="Experiment not found")
+
+    rows = iter_experiment_response_rows(db, experiment_id, EXPORT_CHUNK_ROWS)
+    return _export_response(
+        iter_ndjson(rows, EXPORT_CHUNK_ROWS),
+        experiment_id,
+        "ndjson",
+        "application/x-ndjson",
+        gzip,
     )
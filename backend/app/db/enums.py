@@ -7,6 +7,7 @@ class ExperimentStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     PARTIAL = "partial"
+    CANCELLED = "cancelled"
 
 
 class ResponseStatus(str, Enum):
@@ -15,3 +16,19 @@ class ResponseStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     PARTIAL = "partial"
+    CANCELLED = "cancelled"
+
+
+class ExecutionMode(str, Enum):
+    # One chat completion request per run
+    INTERACTIVE = "interactive"
+    # All runs submitted together through the OpenAI Batch API
+    BATCH = "batch"
+
+
+# Experiment statuses after which an experiment no longer changes
+TERMINAL_EXPERIMENT_STATUSES = (
+    ExperimentStatus.COMPLETED,
+    ExperimentStatus.FAILED,
+    ExperimentStatus.CANCELLED,
+)
@@ -1,12 +1,12 @@
 import uuid
 
-from sqlalchemy import JSON, Column
+from sqlalchemy import JSON, Boolean, Column, DateTime
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy import Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Float, ForeignKey, Index, Integer, String, Text, false
 from sqlalchemy.orm import relationship
 
 from ..base import Base, TimestampMixin
-from ..enums import ExperimentStatus, ResponseStatus
+from ..enums import ExecutionMode, ExperimentStatus, ResponseStatus
 
 
 class Experiment(TimestampMixin, Base):
@@ -17,11 +17,32 @@ class Experiment(TimestampMixin, Base):
     name = Column(String(255), nullable=True)
     model_name = Column(String(100), nullable=False)
     total_runs = Column(Integer, default=0)
+    max_concurrency = Column(Integer, nullable=True)
+    # Reuse generations of identical reproducible runs from the generation cache
+    use_cache = Column(Boolean, nullable=False, default=False, server_default=false())
+    execution_mode = Column(
+        SQLEnum(ExecutionMode),
+        nullable=False,
+        default=ExecutionMode.INTERACTIVE,
+        server_default=ExecutionMode.INTERACTIVE.name,
+    )
+    # Provider id of the batch in progress, so polling survives a restart
+    batch_id = Column(String(100), nullable=True)
     status = Column(SQLEnum(ExperimentStatus), default=ExperimentStatus.PENDING)
 
     # Relationships
     runs = relationship("ExperimentRun", back_populates="experiment")
 
+    # Listing is keyset-paginated on (created_at, id), optionally filtered
+    __table_args__ = (
+        Index("ix_experiments_created_at_id", "created_at", "id"),
+        Index("ix_experiments_status_created_at_id", "status", "created_at", "id"),
+        Index(
+            "ix_experiments_model_name_created_at_id", "model_name", "created_at", "id"
+        ),
+        Index("ix_experiments_name", "name"),
+    )
+
 
 class ExperimentRun(TimestampMixin, Base):
     __tablename__ = "experiment_runs"
@@ -31,6 +52,7 @@ class ExperimentRun(TimestampMixin, Base):
     temperature = Column(Float, nullable=False)
     top_p = Column(Float, nullable=False)
     max_output_tokens = Column(Integer, nullable=False)
+    seed = Column(Integer, nullable=True)
 
     # Relationships
     experiment = relationship("Experiment", back_populates="runs")
@@ -50,11 +72,41 @@ class ResponseRecord(TimestampMixin, Base):
     status = Column(SQLEnum(ResponseStatus), default=ResponseStatus.PENDING)
     error_message = Column(Text, nullable=True)
     latency_ms = Column(Float, nullable=True)
+    ttft_ms = Column(Float, nullable=True)
+    generation_ms = Column(Float, nullable=True)
+    tokens_per_second = Column(Float, nullable=True)
     total_words = Column(Integer, nullable=True)
     total_sentences = Column(Integer, nullable=True)
     metrics = Column(
         JSON, nullable=True
     )  # e.g., {"coherence": 0.9, "structure": 0.8, "overall": 0.85}
+    # Milliseconds per stage, e.g. {"generation_ms": 812.0, "scoring_ms": 95.1,
+    # "coherence_ms": 60.2, "embedding_ms": 71.9, "tokenization_ms": 4.3}
+    timings = Column(JSON, nullable=True)
+    # Renewed by the orchestrator while the record is RUNNING; an expired
+    # lease means the process executing the run died
+    lease_expires_at = Column(DateTime, nullable=True)
+    # Process holding the lease ("host:pid:token"), so a restarted process
+    # can reclaim the leases of one that died without waiting for expiry
+    lease_owner = Column(String(128), nullable=True)
+    # None when the experiment does not use the generation cache
+    cache_hit = Column(Boolean, nullable=True)
+    # Index among the choices of an LLM request shared by identical runs;
+    # None when the run had a request of its own
+    choice_index = Column(Integer, nullable=True)
+    # Tokens reported by the API: of the completion (cached_tokens is the
+    # part of prompt_tokens served from the prompt cache) and of the
+    # embedding calls made to score it
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
+    embedding_tokens = Column(Integer, nullable=True)
 
     # Relationships
     experiment_run = relationship("ExperimentRun", back_populates="response")
+
+    __table_args__ = (
+        Index(
+            "ix_response_records_status_lease_expires_at", "status", "lease_expires_at"
+        ),
+    )
@@ -0,0 +1,373 @@
+import base64
+import math
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, func, literal, select, tuple_
+from sqlalchemy.orm import Session, selectinload
+
+from ..enums import ExperimentStatus, ResponseStatus
+from ..models.experiment_models import Experiment, ExperimentRun, ResponseRecord
+
+# Percentiles reported by the stats query (nearest-rank method)
+STATS_PERCENTILES = (50, 90, 99)
+
+
+def encode_cursor(created_at: datetime, experiment_id: int) -> str:
+    """Encode the (created_at, id) position of an experiment as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{experiment_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor created by encode_cursor. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, experiment_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(experiment_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def list_experiments_page(
+    db: Session,
+    limit: int,
+    cursor: Optional[str] = None,
+    status: Optional[ExperimentStatus] = None,
+    model_name: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+) -> tuple[list[Experiment], Optional[str]]:
+    """
+    Get one page of experiments, newest first, using keyset pagination on
+    (created_at, id). Every filter is backed by an index that ends in
+    (created_at, id), so the cost of a page does not grow with the table.
+    Returns the experiments and the cursor of the next page (None on the last).
+    """
+    query = db.query(Experiment)
+
+    if status is not None:
+        query = query.filter(Experiment.status == status)
+    if model_name is not None:
+        query = query.filter(Experiment.model_name == model_name)
+    if name_prefix:
+        # Range comparison instead of LIKE so the name index can be used.
+        # The bound is the highest code point, so names continuing with any
+        # character, including those outside the BMP, sort below it
+        query = query.filter(
+            Experiment.name >= name_prefix,
+            Experiment.name < name_prefix + chr(0x10FFFF),
+        )
+    if cursor is not None:
+        created_at, experiment_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(Experiment.created_at, Experiment.id)
+            < tuple_(created_at, experiment_id)
+        )
+
+    experiments = (
+        query.order_by(Experiment.created_at.desc(), Experiment.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(experiments) > limit:
+        experiments = experiments[:limit]
+        last = experiments[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return experiments, next_cursor
+
+
+def get_experiment_with_runs(
+    db: Session, experiment_id: int, refresh: bool = False
+) -> Optional[Experiment]:
+    """
+    Load an experiment together with its runs and their responses in a
+    constant number of queries (one per level) instead of lazy-loading each
+    run's response. With refresh=True, instances already in the session are
+    overwritten with the current database state.
+    """
+    query = db.query(Experiment).options(
+        selectinload(Experiment.runs).selectinload(ExperimentRun.response)
+    )
+    if refresh:
+        query = query.populate_existing()
+    return query.filter(Experiment.id == experiment_id).first()
+
+
+def _latest_responses(experiment_id: int):
+    """
+    Subquery of the latest ResponseRecord of each run of an experiment.
+    A run may have more than one record, e.g. a pending placeholder followed
+    by the record of its execution.
+    """
+    rank = (
+        func.row_number()
+        .over(
+            partition_by=ResponseRecord.experiment_run_id,
+            order_by=(ResponseRecord.created_at.desc(), ResponseRecord.id.desc()),
+        )
+        .label("rank")
+    )
+    ranked = (
+        select(
+            ResponseRecord.id,
+            ResponseRecord.experiment_run_id,
+            ResponseRecord.status,
+            rank,
+        )
+        .join(ExperimentRun, ResponseRecord.experiment_run_id == ExperimentRun.id)
+        .where(ExperimentRun.experiment_id == experiment_id)
+        .subquery()
+    )
+    return (
+        select(ranked.c.id, ranked.c.experiment_run_id, ranked.c.status)
+        .where(ranked.c.rank == 1)
+        .subquery()
+    )
+
+
+def get_latest_responses(
+    db: Session, experiment_id: int
+) -> dict[int, tuple[int, ResponseStatus]]:
+    """
+    Map each run of an experiment that has a ResponseRecord to the id and
+    status of its latest record, in a single query.
+    """
+    latest = _latest_responses(experiment_id)
+    rows = db.execute(
+        select(latest.c.experiment_run_id, latest.c.id, latest.c.status)
+    ).all()
+    return {run_id: (response_id, status) for run_id, response_id, status in rows}
+
+
+def get_response_status_counts(
+    db: Session, experiment_id: int
+) -> dict[ResponseStatus, int]:
+    """
+    Count the runs of an experiment per status of their latest ResponseRecord
+    in a single query.
+    """
+    latest = _latest_responses(experiment_id)
+    rows = db.execute(
+        select(latest.c.status, func.count()).group_by(latest.c.status)
+    ).all()
+    return {status: count for status, count in rows}
+
+
+def iter_experiment_response_rows(db: Session, experiment_id: int, batch_size: int):
+    """
+    Stream (run, response) rows of an experiment from a single joined query,
+    fetching batch_size rows at a time instead of lazy-loading each run.
+    Each run yields one row, with its latest ResponseRecord.
+    """
+    latest = _latest_responses(experiment_id)
+    return (
+        db.query(
+            ExperimentRun.id.label("run_id"),
+            ExperimentRun.temperature,
+            ExperimentRun.top_p,
+            ExperimentRun.max_output_tokens,
+            ResponseRecord.status,
+            ResponseRecord.generated_text,
+            ResponseRecord.latency_ms,
+            ResponseRecord.metrics,
+        )
+        .join(latest, latest.c.experiment_run_id == ExperimentRun.id)
+        .join(ResponseRecord, ResponseRecord.id == latest.c.id)
+        .filter(ExperimentRun.experiment_id == experiment_id)
+        .order_by(ExperimentRun.id)
+        .yield_per(batch_size)
+    )
+
+
+def get_parameter_cell_stats(
+    db: Session,
+    experiment_id: int,
+    metric_names: list[str],
+    timing_names: list[str] = (),
+) -> list[dict]:
+    """
+    Aggregate completed responses of an experiment per parameter cell
+    (temperature, top_p, max_output_tokens), entirely in the database.
+    For each metric, each timing and latency_ms, returns count, mean, sample
+    stddev and nearest-rank percentiles. generated_text is never read.
+    Returns: [{"temperature", "top_p", "max_output_tokens", "runs",
+               "stats": {name: {"count", "mean", "stddev", "p50", ...}}}]
+    """
+    value_columns = {
+        name: ResponseRecord.metrics[name].as_float() for name in metric_names
+    }
+    value_columns["latency_ms"] = ResponseRecord.latency_ms
+    for name in timing_names:
+        value_columns[name] = ResponseRecord.timings[name].as_float()
+
+    cells = []
+    for row in _cell_stats(db, experiment_id, list(value_columns.values())):
+        row = row._mapping
+        stats = {}
+        for i, name in enumerate(value_columns):
+            count = row[f"count_{i}"]
+            if not count:
+                continue
+            stddev = None
+            if count > 1:
+                stddev = math.sqrt(max(row[f"squares_{i}"] / (count - 1), 0.0))
+            stats[name] = {
+                "count": count,
+                "mean": row[f"mean_{i}"],
+                "stddev": stddev,
+                **{f"p{p}": row[f"p{p}_{i}"] for p in STATS_PERCENTILES},
+            }
+        if stats:
+            cells.append(
+                {
+                    "temperature": row["temperature"],
+                    "top_p": row["top_p"],
+                    "max_output_tokens": row["max_output_tokens"],
+                    "runs": max(stat["count"] for stat in stats.values()),
+                    "stats": stats,
+                }
+            )
+    return cells
+
+
+def _cell_stats(db: Session, experiment_id: int, values: list):
+    """
+    One grouped query computing the statistics of every value expression
+    per cell. Value i is ranked in its own window, with NULLs last so that
+    they never take a percentile rank, and its squared deviations from the
+    cell mean are summed for the stddev (two passes, avoiding the
+    cancellation of avg(x²) - avg(x)²).
+    """
+    cell = (
+        ExperimentRun.temperature,
+        ExperimentRun.top_p,
+        ExperimentRun.max_output_tokens,
+    )
+    windows = []
+    for i, value in enumerate(values):
+        windows += [
+            value.label(f"value_{i}"),
+            func.row_number()
+            .over(partition_by=cell, order_by=(value.is_(None), value))
+            .label(f"rank_{i}"),
+            func.count(value).over(partition_by=cell).label(f"size_{i}"),
+            func.avg(value).over(partition_by=cell).label(f"cell_mean_{i}"),
+        ]
+    ranked = (
+        select(*cell, *windows)
+        .join(ResponseRecord, ResponseRecord.experiment_run_id == ExperimentRun.id)
+        .where(
+            ExperimentRun.experiment_id == experiment_id,
+            ResponseRecord.status == ResponseStatus.COMPLETED,
+        )
+        .subquery()
+    )
+
+    aggregates = []
+    for i in range(len(values)):
+        value = ranked.c[f"value_{i}"]
+        rank = ranked.c[f"rank_{i}"]
+        size = ranked.c[f"size_{i}"]
+        deviation = value - ranked.c[f"cell_mean_{i}"]
+        aggregates += [
+            func.count(value).label(f"count_{i}"),
+            func.avg(value).label(f"mean_{i}"),
+            func.sum(deviation * deviation).label(f"squares_{i}"),
+            *(
+                func.max(
+                    case(
+                        # Nearest rank: ceil(p / 100 * size) with integer arithmetic
+                        (rank == (literal(p) * size + 99) // 100, value)
+                    )
+                ).label(f"p{p}_{i}")
+                for p in STATS_PERCENTILES
+            ),
+        ]
+    cell_columns = (
+        ranked.c.temperature,
+        ranked.c.top_p,
+        ranked.c.max_output_tokens,
+    )
+    query = (
+        select(*cell_columns, *aggregates)
+        .group_by(*cell_columns)
+        .order_by(*cell_columns)
+    )
+    return db.execute(query).all()
+
+
+def _token_usage_query(*group_by):
+    """
+    Token totals of the ResponseRecords of experiments, optionally grouped.
+    Throughput only counts responses with both completion tokens and a
+    generation time.
+    """
+    timed = ResponseRecord.completion_tokens.is_not(None) & (
+        ResponseRecord.generation_ms.is_not(None)
+    )
+    return (
+        select(
+            *group_by,
+            func.count(ResponseRecord.completion_tokens).label("responses"),
+            *(
+                func.coalesce(func.sum(column), 0).label(column.key)
+                for column in (
+                    ResponseRecord.prompt_tokens,
+                    ResponseRecord.completion_tokens,
+                    ResponseRecord.cached_tokens,
+                    ResponseRecord.embedding_tokens,
+                )
+            ),
+            func.sum(case((timed, ResponseRecord.completion_tokens))).label(
+                "timed_tokens"
+            ),
+            func.sum(case((timed, ResponseRecord.generation_ms))).label("timed_ms"),
+        )
+        .select_from(ResponseRecord)
+        .join(ExperimentRun, ResponseRecord.experiment_run_id == ExperimentRun.id)
+        .join(Experiment, ExperimentRun.experiment_id == Experiment.id)
+        .group_by(*group_by)
+    )
+
+
+def _token_usage(row) -> dict:
+    return {
+        "responses": row.responses,
+        "prompt_tokens": row.prompt_tokens,
+        "completion_tokens": row.completion_tokens,
+        "cached_tokens": row.cached_tokens,
+        "embedding_tokens": row.embedding_tokens,
+        "tokens_per_second": (
+            row.timed_tokens / (row.timed_ms / 1000) if row.timed_ms else None
+        ),
+    }
+
+
+def get_experiment_token_usage(db: Session, experiment_id: int) -> dict:
+    """
+    Prompt, completion, cached and embedding tokens used by every response
+    of an experiment, retried attempts included, and completion tokens per
+    second of generation, in a single query.
+    """
+    row = db.execute(_token_usage_query().where(Experiment.id == experiment_id)).one()
+    return _token_usage(row)
+
+
+def get_model_token_usage(db: Session) -> list[dict]:
+    """Token usage of all experiments per model, as get_experiment_token_usage."""
+    rows = db.execute(
+        _token_usage_query(Experiment.model_name)
+        .add_columns(func.count(Experiment.id.distinct()).label("experiments"))
+        .order_by(Experiment.model_name)
+    ).all()
+    return [
+        {
+            "model_name": row.model_name,
+            "experiments": row.experiments,
+            **_token_usage(row),
+        }
+        for row in rows
+    ]
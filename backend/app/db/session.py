@@ -1,13 +1,31 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
 
 # This would normally come from environment variables
 DATABASE_URL = "sqlite:///./data/llm_lab.db"
 
+# Milliseconds a connection waits for the SQLite write lock before failing
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Use write-ahead logging, so readers do not block the writer, and wait for
+    the write lock instead of failing with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # With WAL, commits no longer fsync; a power loss may drop the latest
+    # transactions but cannot corrupt the database
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
 def get_db():
     """
     Dependency to get database session
@@ -1,9 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from .api.constants import (
+    BROTLI_QUALITY,
+    COMPRESSION_MINIMUM_SIZE,
+    GZIP_COMPRESS_LEVEL,
+    NEXT_CURSOR_HEADER,
+)
 from .api.experiment_router import router as experiment_router
+from .db.session import SessionLocal
+from .middleware.compression import CompressionMiddleware
+from .services.core.experiment_executor import experiment_executor
+from .services.core.experiment_recovery import reclaim_stale_runs
+from .services.llm.client_registry import openai_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs left RUNNING by a process that died go back to pending
+    with SessionLocal() as db:
+        reclaim_stale_runs(db)
+    yield
+    # Drop queued experiments; they stay pending and can be submitted again
+    experiment_executor.shutdown(wait=False)
+    openai_clients.close()
 
-app = FastAPI(title="LLM Lab Backend")
+
+app = FastAPI(title="LLM Lab Backend", lifespan=lifespan)
 
 app.router.redirect_slashes = False
 
@@ -14,6 +39,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # <-- Allows all HTTP methods (GET, POST, etc.)
     allow_headers=["*"],  # <-- Allows all headers
+    expose_headers=[NEXT_CURSOR_HEADER],
+)
+
+# Negotiated br/gzip compression of large responses (details, exports)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MINIMUM_SIZE,
+    gzip_level=GZIP_COMPRESS_LEVEL,
+    brotli_quality=BROTLI_QUALITY,
 )
 
 
@@ -0,0 +1,174 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Event streams must not be buffered by a compressor, and gzip exports are
+# already compressed
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "application/gzip")
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its quality value."""
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def negotiate_encoding(header: str) -> str | None:
+    """
+    Pick the content coding for a response: brotli when the client accepts it
+    and the brotli package is installed, otherwise gzip.
+    """
+    codings = parse_accept_encoding(header)
+    default = codings.get("*", 0.0)
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = codings.get(coding, default)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class _GZipCompressor:
+    def __init__(self, level: int):
+        # wbits=31 writes the gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, body: bytes, *, more_body: bool) -> bytes:
+        mode = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        return self._compressor.compress(body) + self._compressor.flush(mode)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, body: bytes, *, more_body: bool) -> bytes:
+        if not more_body:
+            return self._compressor.process(body) + self._compressor.finish()
+        return self._compressor.process(body) + self._compressor.flush()
+
+
+class _CompressionResponder:
+    """
+    Compress the response of one request. The start message is held back
+    until the first body chunk shows whether the response is compressed;
+    every chunk is flushed so streamed responses reach the client as they go.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, encoding: str, compressor):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.compressor = compressor
+        self.send: Send | None = None
+        self.start_message: Message | None = None
+        self.compressing = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if self.start_message is None:
+            if self.compressing and message["type"] == "http.response.body":
+                message = self._compress(message)
+            await self.send(message)
+            return
+
+        start_message, self.start_message = self.start_message, None
+        headers = MutableHeaders(raw=start_message["headers"])
+        if message["type"] == "http.response.body" and self._compresses(
+            headers, message
+        ):
+            self.compressing = True
+            message = self._compress(message)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if message.get("more_body", False):
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(message["body"]))
+
+        await self.send(start_message)
+        await self.send(message)
+
+    def _compresses(self, headers: MutableHeaders, message: Message) -> bool:
+        if "content-encoding" in headers:
+            return False
+        if headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES):
+            return False
+        # Small responses are not worth compressing, unless more is to come
+        return (
+            message.get("more_body", False)
+            or len(message.get("body", b"")) >= self.minimum_size
+        )
+
+    def _compress(self, message: Message) -> Message:
+        more_body = message.get("more_body", False)
+        body = self.compressor.compress(message.get("body", b""), more_body=more_body)
+        return {**message, "body": body}
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of at least minimum_size bytes with the best coding
+    the client accepts (br or gzip). Streaming responses are compressed chunk
+    by chunk; event streams and already-compressed exports are passed through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding == "br":
+            compressor = _BrotliCompressor(self.brotli_quality)
+        elif encoding == "gzip":
+            compressor = _GZipCompressor(self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(
+            self.app, self.minimum_size, encoding, compressor
+        )
+        await responder(scope, receive, send)
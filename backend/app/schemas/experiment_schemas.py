@@ -1,9 +1,16 @@
+import itertools
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Union
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, model_validator, validator
 
-from app.db.enums import ExperimentStatus, ResponseStatus
+from app.db.enums import ExecutionMode, ExperimentStatus, ResponseStatus
+from app.services.core.constants import (
+    DEFAULT_RUN_CONCURRENCY,
+    MAX_RUN_CONCURRENCY,
+    MAX_SWEEP_REPETITIONS,
+    MAX_SWEEP_RUNS,
+)
 from app.services.llm.constants import DEFAULT_OPENAI_MODEL_NAME, MAX_OUTPUT_TOKENS
 
 
@@ -13,9 +20,19 @@ class ResponseRecordSchema(BaseModel):
     status: ResponseStatus
     error_message: Optional[str]
     latency_ms: Optional[float]
+    ttft_ms: Optional[float] = None
+    generation_ms: Optional[float] = None
+    tokens_per_second: Optional[float] = None
     total_words: Optional[int]
     total_sentences: Optional[int]
     metrics: Optional[Dict[str, Any]]
+    timings: Optional[Dict[str, float]] = None
+    cache_hit: Optional[bool] = None
+    choice_index: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    embedding_tokens: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -26,6 +43,7 @@ class ExperimentRunSchema(BaseModel):
     temperature: float
     top_p: float
     max_output_tokens: int
+    seed: Optional[int] = None
     created_at: datetime
     response: Optional[ResponseRecordSchema] = None
 
@@ -37,6 +55,7 @@ class ExperimentRunCreateSchema(BaseModel):
     temperature: float = Field(..., ge=0, le=2)
     top_p: float = Field(..., ge=0, le=1)
     max_output_tokens: int = Field(..., le=MAX_OUTPUT_TOKENS, gt=0)
+    seed: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -53,12 +72,119 @@ class ExperimentListSchema(BaseModel):
         from_attributes = True
 
 
+class SweepRangeSchema(BaseModel):
+    """Evenly spaced values from start to stop (inclusive)"""
+
+    start: float
+    stop: float
+    step: float = Field(..., gt=0)
+
+    @model_validator(mode="after")
+    def check_bounds(self):
+        if self.stop < self.start:
+            raise ValueError("stop must be greater than or equal to start")
+        return self
+
+    @property
+    def count(self) -> int:
+        # Small epsilon so that float steps still include stop
+        return int((self.stop - self.start) / self.step + 1e-9) + 1
+
+    def values(self) -> List[float]:
+        return [round(self.start + i * self.step, 6) for i in range(self.count)]
+
+
+class ExperimentSweepSchema(BaseModel):
+    """
+    Parameter grid expanded server-side into one run per combination of
+    temperature, top_p and max_output_tokens, repeated `repetitions` times.
+    Each axis is either an explicit list of values or a range. With a seed,
+    the runs of repetition i are seeded with seed + i.
+    """
+
+    temperature: Union[List[float], SweepRangeSchema]
+    top_p: Union[List[float], SweepRangeSchema]
+    max_output_tokens: Union[List[int], SweepRangeSchema]
+    repetitions: int = Field(1, ge=1, le=MAX_SWEEP_REPETITIONS)
+    seed: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_values(self):
+        bounds = {
+            "temperature": (0, 2),
+            "top_p": (0, 1),
+            "max_output_tokens": (1, MAX_OUTPUT_TOKENS),
+        }
+        for axis in bounds:
+            if not self.axis_length(axis):
+                raise ValueError(f"{axis} must have at least one value")
+        # Checked on the axis lengths before any range is expanded
+        if self.run_count > MAX_SWEEP_RUNS:
+            raise ValueError(f"Sweep expands to more than {MAX_SWEEP_RUNS} runs")
+
+        for axis, (low, high) in bounds.items():
+            if any(v < low or v > high for v in self.axis_values(axis)):
+                raise ValueError(f"{axis} values must be between {low} and {high}")
+        return self
+
+    def axis_length(self, axis: str) -> int:
+        values = getattr(self, axis)
+        if isinstance(values, SweepRangeSchema):
+            return values.count
+        return len(values)
+
+    def axis_values(self, axis: str) -> list:
+        values = getattr(self, axis)
+        if isinstance(values, SweepRangeSchema):
+            values = values.values()
+        if axis == "max_output_tokens":
+            values = [int(round(v)) for v in values]
+        return values
+
+    @property
+    def run_count(self) -> int:
+        return (
+            self.axis_length("temperature")
+            * self.axis_length("top_p")
+            * self.axis_length("max_output_tokens")
+            * self.repetitions
+        )
+
+    def iter_runs(self) -> Iterator[tuple[float, float, int, Optional[int]]]:
+        """
+        Yield (temperature, top_p, max_output_tokens, seed) for every run of
+        the grid
+        """
+        cells = itertools.product(
+            self.axis_values("temperature"),
+            self.axis_values("top_p"),
+            self.axis_values("max_output_tokens"),
+        )
+        for cell in cells:
+            for repetition in range(self.repetitions):
+                seed = None if self.seed is None else self.seed + repetition
+                yield (*cell, seed)
+
+
 class ExperimentCreateSchema(BaseModel):
     user_prompt: str
     name: Optional[str] = None
     model_name: str = DEFAULT_OPENAI_MODEL_NAME
-    total_runs: int
-    runs: List[ExperimentRunCreateSchema]
+    total_runs: Optional[int] = None
+    max_concurrency: int = Field(DEFAULT_RUN_CONCURRENCY, ge=1, le=MAX_RUN_CONCURRENCY)
+    runs: List[ExperimentRunCreateSchema] = []
+    sweep: Optional[ExperimentSweepSchema] = None
+    use_cache: bool = Field(
+        False,
+        description="Reuse cached generations of identical runs that are "
+        "seeded or at temperature 0",
+    )
+    execution_mode: ExecutionMode = Field(
+        ExecutionMode.INTERACTIVE,
+        description="batch submits every run through the OpenAI Batch API: "
+        "cheaper and outside the interactive rate limits, but results take "
+        "up to 24 hours",
+    )
 
     @validator("name", always=True)
     def set_name_from_prompt(cls, v, values):
@@ -66,6 +192,16 @@ class ExperimentCreateSchema(BaseModel):
             return values["user_prompt"][:100]
         return v
 
+    @model_validator(mode="after")
+    def set_total_runs(self):
+        """Count explicit runs plus the runs the sweep expands to"""
+        sweep_runs = self.sweep.run_count if self.sweep else 0
+        if not self.runs and not sweep_runs:
+            raise ValueError("Either runs or sweep must be provided")
+        if self.total_runs is None or self.sweep is not None:
+            self.total_runs = len(self.runs) + sweep_runs
+        return self
+
     class Config:
         from_attributes = True
 
@@ -77,9 +213,70 @@ class ExperimentDetailSchema(BaseModel):
     status: ExperimentStatus
     user_prompt: str
     model_name: str
+    use_cache: bool = False
+    execution_mode: ExecutionMode = ExecutionMode.INTERACTIVE
+    batch_id: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     runs: List[ExperimentRunSchema] = []
 
     class Config:
         from_attributes = True
+
+
+class ExperimentJobSchema(BaseModel):
+    experiment_id: int
+    status: ExperimentStatus
+    status_url: str
+
+
+class ExperimentProgressSchema(BaseModel):
+    id: int
+    status: ExperimentStatus
+    total_runs: int
+    pending: int
+    running: int
+    completed: int
+    failed: int
+    cancelled: int
+
+
+class StatSummarySchema(BaseModel):
+    count: int
+    mean: Optional[float]
+    stddev: Optional[float]
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+
+
+class ParameterCellStatsSchema(BaseModel):
+    temperature: float
+    top_p: float
+    max_output_tokens: int
+    runs: int
+    stats: Dict[str, StatSummarySchema]
+
+
+class ExperimentStatsSchema(BaseModel):
+    id: int
+    cells: List[ParameterCellStatsSchema]
+
+
+class TokenUsageSchema(BaseModel):
+    responses: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    embedding_tokens: int
+    tokens_per_second: Optional[float]
+
+
+class ExperimentUsageSchema(TokenUsageSchema):
+    id: int
+    model_name: str
+
+
+class ModelUsageSchema(TokenUsageSchema):
+    model_name: str
+    experiments: int
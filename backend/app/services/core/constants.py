@@ -0,0 +1,56 @@
+# Number of experiments the in-process executor runs at the same time
+EXPERIMENT_EXECUTOR_MAX_WORKERS = 2
+
+# Batch-mode experiments mostly wait for the Batch API, so they run on a
+# separate pool of the executor and poll for their results at this interval
+BATCH_EXECUTOR_MAX_WORKERS = 4
+BATCH_POLL_INTERVAL_SECONDS = 30
+
+# Upper bound on LLM calls in flight for a single experiment
+DEFAULT_RUN_CONCURRENCY = 4
+MAX_RUN_CONCURRENCY = 16
+
+# Identical unseeded runs are generated together, as the choices of a single
+# LLM request of at most this many choices, so the prompt is sent once
+MAX_CHOICES_PER_REQUEST = 8
+
+# Worker threads scoring generated responses of a single experiment, and how
+# many generated responses may wait for scoring before generation pauses
+SCORING_CONCURRENCY = 4
+SCORING_QUEUE_SIZE = 16
+
+# Seconds between keep-alive comments on an idle experiment event stream
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
+# Events waiting for a slow event stream subscriber beyond which its partial
+# text (delta events) is dropped. Status and terminal events are always kept
+EVENT_STREAM_QUEUE_SIZE = 1000
+
+# Stream completions so partial text and time-to-first-token are available
+STREAM_RESPONSES = True
+
+# Finished experiments whose serialized detail payload is kept in memory
+DETAIL_CACHE_MAX_ENTRIES = 128
+
+# Limits on server-side parameter sweeps
+MAX_SWEEP_REPETITIONS = 100
+MAX_SWEEP_RUNS = 10000
+
+# Buffered ResponseRecord updates are written once this many records changed
+# or this many seconds passed since the oldest unwritten change
+RESPONSE_WRITE_BATCH_SIZE = 50
+RESPONSE_WRITE_INTERVAL_SECONDS = 1.0
+
+# Lease on a RUNNING ResponseRecord and how often the orchestrator renews it;
+# records whose lease expired belong to a process that died
+RUN_LEASE_SECONDS = 300
+RUN_LEASE_RENEW_SECONDS = 60
+
+# Persistent cache of generations (with their metrics) of reproducible runs,
+# evicting least recently used entries beyond the size limit
+GENERATION_CACHE_PATH = "./data/generation_cache.db"
+GENERATION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Share of the size limit left after an eviction, so that evictions (and the
+# size scan they start with) are spread over many writes
+GENERATION_CACHE_EVICT_TO = 0.9
+# Bump to invalidate every cached entry, e.g. when metrics change
+GENERATION_CACHE_VERSION = 1
@@ -0,0 +1,43 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from .constants import DETAIL_CACHE_MAX_ENTRIES
+
+
+class ExperimentDetailCache:
+    """
+    LRU cache of pre-serialized detail payloads of finished experiments.
+
+    Entries are versioned by the experiment's updated_at, so a payload is
+    only served for the exact row version it was rendered from. The
+    orchestrator also invalidates an experiment whenever it writes to it.
+    """
+
+    def __init__(self, max_entries: int = DETAIL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, tuple[datetime, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, experiment_id: int, updated_at: datetime) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(experiment_id)
+            if entry is None or entry[0] != updated_at:
+                return None
+            self._entries.move_to_end(experiment_id)
+            return entry[1]
+
+    def put(self, experiment_id: int, updated_at: datetime, payload: bytes):
+        with self._lock:
+            self._entries[experiment_id] = (updated_at, payload)
+            self._entries.move_to_end(experiment_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, experiment_id: int):
+        with self._lock:
+            self._entries.pop(experiment_id, None)
+
+
+experiment_detail_cache = ExperimentDetailCache()
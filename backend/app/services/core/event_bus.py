@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from .constants import EVENT_STREAM_QUEUE_SIZE
+
+# Event types published while an experiment runs
+RUN_EVENT = "run"
+DELTA_EVENT = "delta"
+EXPERIMENT_EVENT = "experiment"
+
+
+class ExperimentEventBus:
+    """
+    In-process fan-out of experiment progress events.
+
+    Orchestrators publish from worker threads; subscribers are asyncio queues
+    owned by the event loop that serves the event stream, so events are
+    handed over with call_soon_threadsafe. A subscriber that falls behind
+    misses partial text, never a status change.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, experiment_id: int) -> asyncio.Queue:
+        """Subscribe to an experiment. Must be called from a running event loop."""
+        queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers[experiment_id].append((loop, queue))
+        return queue
+
+    def unsubscribe(self, experiment_id: int, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(experiment_id, [])
+            subscribers[:] = [(l, q) for l, q in subscribers if q is not queue]
+            if not subscribers:
+                self._subscribers.pop(experiment_id, None)
+
+    def subscriber_count(self, experiment_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(experiment_id, []))
+
+    def publish(self, experiment_id: int, event_type: str, data: dict):
+        """Publish an event to every subscriber of the experiment."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(experiment_id, []))
+
+        event = {"event": event_type, "data": data}
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's event loop is closed
+                self.unsubscribe(experiment_id, queue)
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, event: dict):
+        # Deltas come once per token, so they are what fills up the queue;
+        # there are only a few status events per run
+        if event["event"] == DELTA_EVENT and queue.qsize() >= EVENT_STREAM_QUEUE_SIZE:
+            return
+        queue.put_nowait(event)
+
+
+experiment_event_bus = ExperimentEventBus()
@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import exists, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from ...db.enums import ResponseStatus
+from ...db.models.experiment_models import ExperimentRun, ResponseRecord
+
+
+class CancellationRegistry:
+    """
+    Cancellation flags of the experiments running in this process.
+
+    An orchestrator registers its experiment while it runs and checks the
+    returned event; the cancel endpoint sets it. Experiments running in other
+    processes notice the CANCELLED status in the database instead.
+    """
+
+    def __init__(self):
+        self._events: dict[int, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def register(self, experiment_id: int) -> threading.Event:
+        event = threading.Event()
+        with self._lock:
+            self._events[experiment_id] = event
+        return event
+
+    def unregister(self, experiment_id: int, event: threading.Event):
+        with self._lock:
+            if self._events.get(experiment_id) is event:
+                del self._events[experiment_id]
+
+    def cancel(self, experiment_id: int) -> bool:
+        """Signal the experiment to stop. Returns True if it runs in this process."""
+        with self._lock:
+            event = self._events.get(experiment_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+
+def cancel_unfinished_runs(db: Session, experiment_id: int) -> int:
+    """
+    Mark every PENDING or RUNNING ResponseRecord of the experiment CANCELLED
+    and add a CANCELLED record for runs that were never started. Returns the
+    number of records updated or added. Does not commit.
+    """
+    experiment_runs = select(ExperimentRun.id).where(
+        ExperimentRun.experiment_id == experiment_id
+    )
+    updated = db.execute(
+        update(ResponseRecord)
+        .where(
+            ResponseRecord.experiment_run_id.in_(experiment_runs),
+            ResponseRecord.status.in_([ResponseStatus.PENDING, ResponseStatus.RUNNING]),
+        )
+        .values(status=ResponseStatus.CANCELLED, lease_expires_at=None),
+        execution_options={"synchronize_session": False},
+    )
+
+    now = datetime.utcnow()
+    unstarted_runs = select(
+        ExperimentRun.id,
+        literal(ResponseStatus.CANCELLED, ResponseRecord.status.type),
+        literal(now, ResponseRecord.created_at.type),
+        literal(now, ResponseRecord.updated_at.type),
+    ).where(
+        ExperimentRun.experiment_id == experiment_id,
+        ~exists().where(ResponseRecord.experiment_run_id == ExperimentRun.id),
+    )
+    added = db.execute(
+        insert(ResponseRecord).from_select(
+            ["experiment_run_id", "status", "created_at", "updated_at"],
+            unstarted_runs,
+        )
+    )
+    return updated.rowcount + added.rowcount
+
+
+experiment_cancellations = CancellationRegistry()
@@ -0,0 +1,109 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ...db.enums import ExecutionMode, ExperimentStatus
+from ...db.queries.experiment_queries import get_experiment_with_runs
+from ...db.session import SessionLocal
+from .constants import BATCH_EXECUTOR_MAX_WORKERS, EXPERIMENT_EXECUTOR_MAX_WORKERS
+from .experiment_orchestrator import ExperimentOrchestrator
+
+logger = logging.getLogger(__name__)
+
+
+class ExperimentExecutor:
+    """
+    In-process job executor that runs experiments outside the request thread.
+    Each job opens its own database session, so the request that queued the
+    experiment can return as soon as the experiment and its runs are saved.
+
+    Batch-mode experiments run on a separate pool, so the hours they spend
+    waiting for the Batch API never hold a worker interactive experiments
+    need.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_workers: int = EXPERIMENT_EXECUTOR_MAX_WORKERS,
+        batch_max_workers: int = BATCH_EXECUTOR_MAX_WORKERS,
+    ):
+        self.session_factory = session_factory
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="experiment"
+        )
+        self._batch_pool = ThreadPoolExecutor(
+            max_workers=batch_max_workers, thread_name_prefix="experiment-batch"
+        )
+        self._jobs: dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        experiment_id: int,
+        execution_mode: ExecutionMode = ExecutionMode.INTERACTIVE,
+    ) -> Future:
+        """
+        Queue an experiment for execution.
+        Submitting an experiment that is already queued or running returns the
+        existing job instead of scheduling it twice.
+        """
+        with self._lock:
+            job = self._jobs.get(experiment_id)
+            if job is not None and not job.done():
+                return job
+
+            pool = (
+                self._batch_pool
+                if execution_mode == ExecutionMode.BATCH
+                else self._pool
+            )
+            job = pool.submit(self._run, experiment_id)
+            self._jobs[experiment_id] = job
+
+        job.add_done_callback(lambda f: self._forget(experiment_id, f))
+        return job
+
+    def is_active(self, experiment_id: int) -> bool:
+        """Return True if the experiment is queued or running in this process."""
+        with self._lock:
+            job = self._jobs.get(experiment_id)
+            return job is not None and not job.done()
+
+    def cancel(self, experiment_id: int) -> bool:
+        """
+        Drop the job of an experiment that is queued but not started yet.
+        Returns True if the job was dropped.
+        """
+        with self._lock:
+            job = self._jobs.get(experiment_id)
+        return job is not None and job.cancel()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+        self._batch_pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _forget(self, experiment_id: int, job: Future):
+        with self._lock:
+            if self._jobs.get(experiment_id) is job:
+                del self._jobs[experiment_id]
+
+    def _run(self, experiment_id: int):
+        db = self.session_factory()
+        try:
+            experiment = get_experiment_with_runs(db, experiment_id)
+            if experiment is None:
+                return
+
+            try:
+                ExperimentOrchestrator(experiment, db).run_experiment()
+            except Exception:
+                logger.exception("Experiment %s failed", experiment_id)
+                db.rollback()
+                experiment.status = ExperimentStatus.FAILED
+                db.commit()
+        finally:
+            db.close()
+
+
+experiment_executor = ExperimentExecutor()
@@ -0,0 +1,66 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ...db.enums import ExperimentStatus
+from ...db.models.experiment_models import Experiment, ExperimentRun
+from ...schemas.experiment_schemas import ExperimentCreateSchema
+
+
+def create_experiments(
+    db: Session, experiments_data: list[ExperimentCreateSchema]
+) -> list[int]:
+    """
+    Insert experiments and all of their runs in a single transaction.
+    Sweeps are expanded here, straight into rows for the bulk insert.
+    Experiments and runs are each written with one executemany INSERT, so the
+    number of round trips does not grow with the number of rows.
+    Returns the new experiment ids in the order of experiments_data.
+    """
+    # Rows get increasing ids in insertion order, so sorting the returned ids
+    # matches them to experiments_data without a per-row sentinel round trip
+    experiment_ids = db.scalars(
+        insert(Experiment).returning(Experiment.id),
+        [
+            {
+                "user_prompt": data.user_prompt,
+                "name": data.name,
+                "model_name": data.model_name,
+                "total_runs": data.total_runs,
+                "max_concurrency": data.max_concurrency,
+                "use_cache": data.use_cache,
+                "execution_mode": data.execution_mode,
+                "status": ExperimentStatus.PENDING,
+            }
+            for data in experiments_data
+        ],
+    ).all()
+    experiment_ids = sorted(experiment_ids)
+
+    run_rows = [
+        {
+            "experiment_id": experiment_id,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_output_tokens": max_output_tokens,
+            "seed": seed,
+        }
+        for experiment_id, data in zip(experiment_ids, experiments_data)
+        for temperature, top_p, max_output_tokens, seed in _iter_run_parameters(data)
+    ]
+    if run_rows:
+        db.execute(insert(ExperimentRun), run_rows)
+
+    db.commit()
+    return experiment_ids
+
+
+def _iter_run_parameters(data: ExperimentCreateSchema):
+    for run_data in data.runs:
+        yield (
+            run_data.temperature,
+            run_data.top_p,
+            run_data.max_output_tokens,
+            run_data.seed,
+        )
+    if data.sweep is not None:
+        yield from data.sweep.iter_runs()
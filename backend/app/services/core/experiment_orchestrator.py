@@ -1,95 +1,630 @@
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
 
 from nltk.tokenize import sent_tokenize, word_tokenize
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.services.core.experiment_runner import ExperimentRunner
 
-from ...db.enums import ExperimentStatus, ResponseStatus
-from ...db.models.experiment_models import Experiment, ExperimentRun, ResponseRecord
+from ...db.enums import ExecutionMode, ExperimentStatus, ResponseStatus
+from ...db.models.experiment_models import Experiment
+from ...db.queries.experiment_queries import (
+    get_latest_responses,
+    get_response_status_counts,
+)
+from ..llm.batch_provider import BatchRequest, OpenAIBatchProvider
+from ..llm.constants import BATCH_DONE_STATES
+from ..timings import merge_timings, record_timings, timed
+from ..token_usage import USAGE_NAMES, record_usage, split_tokens
+from .constants import (
+    BATCH_POLL_INTERVAL_SECONDS,
+    DEFAULT_RUN_CONCURRENCY,
+    MAX_CHOICES_PER_REQUEST,
+    RUN_LEASE_RENEW_SECONDS,
+    SCORING_CONCURRENCY,
+    SCORING_QUEUE_SIZE,
+    STREAM_RESPONSES,
+)
+from .detail_cache import experiment_detail_cache
+from .event_bus import DELTA_EVENT, EXPERIMENT_EVENT, RUN_EVENT, experiment_event_bus
+from .experiment_cancellation import cancel_unfinished_runs, experiment_cancellations
+from .experiment_recovery import lease_expiry, lease_owner
+from .generation_cache import generation_cache
+from .response_writer import ResponseWriter
+
+
+def _usage_columns(usage: Optional[dict]) -> dict:
+    """ResponseRecord token columns of a runner usage dict."""
+    return {
+        name: tokens for name, tokens in (usage or {}).items() if name in USAGE_NAMES
+    }
+
+
+def _text_counts(text: str) -> dict:
+    """
+    NLTK word and sentence counts of a response, timed as tokenization.
+    Called off the orchestrator loop, next to scoring.
+    """
+    with timed("tokenization_ms"):
+        return {
+            "total_words": len(word_tokenize(text)),
+            "total_sentences": len(sent_tokenize(text)),
+        }
+
+
+def _runs_in_flight(
+    generating: dict[Future, list[tuple[int, int]]],
+    scoring: dict[Future, tuple[int, int]],
+) -> list[tuple[int, int]]:
+    """(run id, response id) of every run being generated or scored."""
+    return [
+        *(member for members in generating.values() for member in members),
+        *scoring.values(),
+    ]
 
 
 class ExperimentOrchestrator:
     """
     Orchestrates running all ExperimentRun instances of an Experiment,
     storing responses and metrics, and updating statuses.
+
+    Runs go through two stages, each on its own thread pool: generation, with
+    at most `max_concurrency` LLM calls in flight, and scoring, which computes
+    the metrics of generated responses while the next LLM calls run. At most
+    `scoring_queue_size` generated responses wait for or undergo scoring;
+    generation pauses while that queue is full. Generated text is persisted
+    as soon as it arrives and metrics once scoring completes.
+
+    Identical runs without a seed, typically the repetitions of a sweep
+    cell, are generated together as the choices of one LLM request of up to
+    `max_choices_per_request` choices, each choice going to one of the runs.
+
+    Worker threads only call the runner; every database write happens on the
+    calling thread, so the session is never shared.
+    ResponseRecord changes go through a ResponseWriter, which writes them in
+    batches instead of committing twice per run.
+
+    Every ResponseRecord status change, the partial text of streamed
+    completions and the final experiment status are published on the event
+    bus for the event stream endpoint as they happen, ahead of the batched
+    database writes.
+
+    In batch mode all pending runs are instead submitted as one Batch API
+    batch whose results are ingested and scored in bulk once it is done.
+
+    A cancelled experiment stops dispatching runs and returns without waiting
+    for the runs in flight: their results are dropped and every unfinished
+    run is marked CANCELLED.
     """
 
     def __init__(self, experiment: Experiment, db_session: Session):
         self.experiment = experiment
+        self.experiment_id = experiment.id
         self.db_session = db_session
-        self.runner = ExperimentRunner(model_name=experiment.model_name)
+        self.event_bus = experiment_event_bus
+        self.detail_cache = experiment_detail_cache
+        self.writer = ResponseWriter(db_session)
+        self.runner = ExperimentRunner(
+            model_name=experiment.model_name,
+            stream=STREAM_RESPONSES,
+            cache=generation_cache if experiment.use_cache else None,
+        )
+        self.max_concurrency = experiment.max_concurrency or DEFAULT_RUN_CONCURRENCY
+        self.max_choices_per_request = MAX_CHOICES_PER_REQUEST
+        self.scoring_concurrency = SCORING_CONCURRENCY
+        self.scoring_queue_size = SCORING_QUEUE_SIZE
+        self.batch_provider = (
+            OpenAIBatchProvider()
+            if experiment.execution_mode == ExecutionMode.BATCH
+            else None
+        )
+        self.batch_poll_interval = BATCH_POLL_INTERVAL_SECONDS
+        self.cancellations = experiment_cancellations
+        self.cancel_event = threading.Event()
 
     def run_experiment(self):
         """
         Run all pending ExperimentRun instances for the experiment.
         """
-        all_success = True
-
-        for run in self.experiment.runs:
-            # Check if there's already a ResponseRecord that is not PENDING
-            latest_response = (
-                self.db_session.query(ResponseRecord)
-                .filter(ResponseRecord.experiment_run_id == run.id)
-                .order_by(ResponseRecord.created_at.desc())
-                .first()
+        self.cancel_event = self.cancellations.register(self.experiment_id)
+        try:
+            return self._run_experiment()
+        finally:
+            self.cancellations.unregister(self.experiment_id, self.cancel_event)
+
+    def _run_experiment(self):
+        # Registered before checking, so a cancel cannot slip in between
+        if self._cancel_requested():
+            return self.experiment
+
+        self.experiment.status = ExperimentStatus.RUNNING
+        self.db_session.commit()
+        self.detail_cache.invalidate(self.experiment_id)
+
+        user_prompt = self.experiment.user_prompt
+        # Latest response of every run, loaded in one query
+        latest_responses = get_latest_responses(self.db_session, self.experiment_id)
+        # Plain values, so that later commits do not reload each run
+        pending_runs = [
+            (run.id, run.temperature, run.top_p, run.max_output_tokens, run.seed)
+            for run in self.experiment.runs
+            if latest_responses.get(run.id, (None, ResponseStatus.PENDING))[1]
+            == ResponseStatus.PENDING
+        ]
+
+        # Reuse pending records and create the missing ones in one insert
+        response_ids = {
+            run_id: response_id
+            for run_id, (response_id, status) in latest_responses.items()
+            if status == ResponseStatus.PENDING
+        }
+        response_ids.update(
+            self.writer.create_pending(
+                run_id for run_id, *_ in pending_runs if run_id not in response_ids
             )
+        )
 
-            if latest_response and latest_response.status != ResponseStatus.PENDING:
-                continue  # Skip already processed runs
+        try:
+            if self.experiment.execution_mode == ExecutionMode.BATCH:
+                self._execute_batch(user_prompt, pending_runs, response_ids)
+            else:
+                self._execute_pending_runs(user_prompt, pending_runs, response_ids)
+        finally:
+            # Everything buffered is written before the status roll-up
+            self.writer.flush()
 
-            # Create a new ResponseRecord for this run
-            response_record = ResponseRecord(
-                experiment_run=run,
-                status=ResponseStatus.RUNNING,
+        if self.cancel_event.is_set():
+            cancel_unfinished_runs(self.db_session, self.experiment_id)
+            self.experiment.status = ExperimentStatus.CANCELLED
+        else:
+            # Update experiment status from the per-status counts of the runs
+            status_counts = get_response_status_counts(
+                self.db_session, self.experiment_id
             )
-            self.db_session.add(response_record)
+
+            if all(s == ResponseStatus.COMPLETED for s in status_counts):
+                self.experiment.status = ExperimentStatus.COMPLETED
+            elif status_counts.get(ResponseStatus.RUNNING):
+                self.experiment.status = ExperimentStatus.RUNNING
+            elif status_counts.get(ResponseStatus.FAILED):
+                self.experiment.status = ExperimentStatus.FAILED
+            elif status_counts.get(ResponseStatus.CANCELLED):
+                self.experiment.status = ExperimentStatus.CANCELLED
+
+        experiment_status = self.experiment.status
+        self.db_session.commit()
+        self.detail_cache.invalidate(self.experiment_id)
+
+        self.event_bus.publish(
+            self.experiment_id,
+            EXPERIMENT_EVENT,
+            {"id": self.experiment_id, "status": experiment_status.value},
+        )
+        return self.experiment
+
+    def _execute_pending_runs(
+        self,
+        user_prompt: str,
+        pending_runs: list[tuple[int, float, float, int, Optional[int]]],
+        response_ids: dict[int, int],
+    ):
+        run_groups = iter(self._group_runs(pending_runs))
+        # Requests in the generation stage, with the runs they generate, and
+        # runs generated but not scored yet
+        generating: dict[Future, list[tuple[int, int]]] = {}
+        scoring: dict[Future, tuple[int, int]] = {}
+        leases_renewed_at = time.monotonic()
+
+        generation_pool = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="experiment-run"
+        )
+        scoring_pool = ThreadPoolExecutor(
+            max_workers=self.scoring_concurrency,
+            thread_name_prefix="experiment-score",
+        )
+        try:
+            while not self.cancel_event.is_set():
+                # Top up the generation stage so that max_concurrency requests
+                # are in flight, unless the scoring queue is full
+                while (
+                    len(generating) < self.max_concurrency
+                    and len(scoring) < self.scoring_queue_size
+                ):
+                    group = next(run_groups, None)
+                    if group is None:
+                        break
+                    run_ids = [run_id for run_id, *_ in group]
+                    _, temperature, top_p, max_tokens, seed = group[0]
+                    members = []
+                    for run_id in run_ids:
+                        response_id = response_ids[run_id]
+                        self._start_response(run_id, response_id)
+                        members.append((run_id, response_id))
+                    future = generation_pool.submit(
+                        self._execute_run,
+                        run_ids=run_ids,
+                        user_prompt=user_prompt,
+                        temperature=temperature,
+                        top_p=top_p,
+                        max_tokens=max_tokens,
+                        seed=seed,
+                    )
+                    generating[future] = members
+
+                if not generating and not scoring:
+                    break
+
+                # Wake up at least once per flush interval to write updates
+                done, _ = wait(
+                    [*generating, *scoring],
+                    timeout=self.writer.flush_interval,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    if future in generating:
+                        members = generating.pop(future)
+                        for run_id, response_id, *generated in self._finish_generation(
+                            members, future
+                        ):
+                            scoring_future = scoring_pool.submit(
+                                self._score_run, user_prompt, *generated
+                            )
+                            scoring[scoring_future] = (run_id, response_id)
+                    else:
+                        run_id, response_id = scoring.pop(future)
+                        self._finish_response(run_id, response_id, future)
+
+                # Heartbeat: extend the leases of the runs still in flight and
+                # pick up cancels made by other processes
+                if time.monotonic() - leases_renewed_at >= RUN_LEASE_RENEW_SECONDS:
+                    expiry = lease_expiry()
+                    for _, response_id in _runs_in_flight(generating, scoring):
+                        self.writer.update(response_id, lease_expires_at=expiry)
+                    leases_renewed_at = time.monotonic()
+                    self._cancel_requested()
+
+                self.writer.flush_if_due()
+
+            for run_id, _ in _runs_in_flight(generating, scoring):
+                self.event_bus.publish(
+                    self.experiment_id,
+                    RUN_EVENT,
+                    {"run_id": run_id, "status": ResponseStatus.CANCELLED.value},
+                )
+        finally:
+            # Abandoned runs are not waited for, which frees the executor
+            # worker for the next experiment right away
+            wait_for_runs = not self.cancel_event.is_set()
+            generation_pool.shutdown(wait=wait_for_runs, cancel_futures=True)
+            scoring_pool.shutdown(wait=wait_for_runs, cancel_futures=True)
+
+    def _group_runs(
+        self, pending_runs: list[tuple[int, float, float, int, Optional[int]]]
+    ) -> list[list[tuple[int, float, float, int, Optional[int]]]]:
+        """
+        Split the pending runs into the groups generated by one request each,
+        in the order of their first run. Seeded and cached runs are kept
+        reproducible by generating them alone.
+        """
+        groups = []
+        open_groups = {}
+        for run in pending_runs:
+            run_id, temperature, top_p, max_tokens, seed = run
+            if seed is not None or self.runner.uses_cache(temperature, seed):
+                groups.append([run])
+                continue
+
+            key = (temperature, top_p, max_tokens)
+            group = open_groups.get(key)
+            if group is None or len(group) >= self.max_choices_per_request:
+                group = open_groups[key] = []
+                groups.append(group)
+            group.append(run)
+        return groups
+
+    def _execute_batch(
+        self,
+        user_prompt: str,
+        pending_runs: list[tuple[int, float, float, int, Optional[int]]],
+        response_ids: dict[int, int],
+    ):
+        """
+        Batch mode: submit every pending run as one Batch API batch, poll
+        until it is done, then ingest and score all results in bulk.
+        A batch submitted before a restart is polled again instead of being
+        submitted twice.
+        """
+        if not pending_runs:
+            return
+
+        batch_id = self.experiment.batch_id
+        if batch_id is None:
+            requests = [
+                BatchRequest(
+                    custom_id=str(run_id),
+                    prompt=user_prompt,
+                    temperature=temperature,
+                    top_p=top_p,
+                    max_tokens=max_tokens,
+                    seed=seed,
+                )
+                for run_id, temperature, top_p, max_tokens, seed in pending_runs
+            ]
+            batch_id = self.batch_provider.submit(self.experiment.model_name, requests)
+            self.experiment.batch_id = batch_id
             self.db_session.commit()
 
-            try:
-                start_time = time.time()
-                # Run LLM + metrics
-                result = self.runner.run(
-                    user_prompt=self.experiment.user_prompt,
-                    temperature=run.temperature,
-                    top_p=run.top_p,
-                    max_tokens=run.max_output_tokens,
+        for run_id, *_ in pending_runs:
+            self._start_response(run_id, response_ids[run_id])
+        self.writer.flush()
+
+        leases_renewed_at = time.monotonic()
+        batch_status = self.batch_provider.status(batch_id)
+        while batch_status not in BATCH_DONE_STATES:
+            if self.cancel_event.wait(self.batch_poll_interval):
+                self.batch_provider.cancel(batch_id)
+                self.experiment.batch_id = None
+                return
+
+            # Heartbeat: extend the leases of the runs in the batch and pick
+            # up cancels made by other processes
+            if time.monotonic() - leases_renewed_at >= RUN_LEASE_RENEW_SECONDS:
+                expiry = lease_expiry()
+                for run_id, *_ in pending_runs:
+                    self.writer.update(response_ids[run_id], lease_expires_at=expiry)
+                self.writer.flush()
+                leases_renewed_at = time.monotonic()
+                self._cancel_requested()
+
+            batch_status = self.batch_provider.status(batch_id)
+
+        results = {
+            result.custom_id: result for result in self.batch_provider.results(batch_id)
+        }
+        # The next execution submits a new batch for the runs left unfinished
+        self.experiment.batch_id = None
+
+        generated = []
+        for run_id, *_ in pending_runs:
+            response_id = response_ids[run_id]
+            result = results.get(str(run_id))
+            if result is None:
+                self._fail_response(
+                    run_id,
+                    response_id,
+                    f"No result in batch {batch_id} ({batch_status})",
+                )
+            elif result.error is not None:
+                self._fail_response(run_id, response_id, result.error)
+            else:
+                generated.append(
+                    (run_id, response_id, result.content or "", result.usage)
                 )
-                end_time = time.time()
 
-                # Fill response record
-                generated_text = result.get("llm_response", "")
-                metrics = result.get("metrics", {})
+        # Generated text is persisted before the bulk scoring
+        for run_id, response_id, text, usage in generated:
+            self.writer.update(response_id, generated_text=text)
+            self.writer.add(response_id, **_usage_columns(usage))
+        self.writer.flush()
 
-                response_record.generated_text = generated_text
-                response_record.metrics = metrics
-                response_record.latency_ms = (end_time - start_time) * 1000
-                response_record.total_words = len(word_tokenize(generated_text))
-                response_record.total_sentences = len(sent_tokenize(generated_text))
-                response_record.status = ResponseStatus.COMPLETED
+        texts = [text for _, _, text, _ in generated]
+        try:
+            counts = []
+            for text in texts:
+                with record_timings() as recorder:
+                    counts.append((_text_counts(text), recorder.timings))
+            with record_usage() as usage_recorder:
+                scores = self.runner.score_many(user_prompt, texts)
+        except Exception as e:
+            for run_id, response_id, *_ in generated:
+                self._fail_response(run_id, response_id, str(e))
+            return
 
-            except Exception as e:
-                response_record.status = ResponseStatus.FAILED
-                response_record.error_message = str(e)
+        # Embedding calls are shared by the batch, so their tokens are split
+        # in proportion to the length of each response
+        embedding_tokens = split_tokens(
+            usage_recorder.tokens.get("embedding_tokens", 0), [len(t) for t in texts]
+        )
+        for (run_id, response_id, *_), metrics, tokens, (text_counts, timings) in zip(
+            generated, scores, embedding_tokens, counts
+        ):
+            self.writer.update(
+                response_id,
+                **text_counts,
+                timings=timings,
+                metrics=metrics,
+                status=ResponseStatus.COMPLETED,
+                lease_expires_at=None,
+            )
+            self.writer.add(response_id, embedding_tokens=tokens)
+            self.event_bus.publish(
+                self.experiment_id,
+                RUN_EVENT,
+                {
+                    "run_id": run_id,
+                    "status": ResponseStatus.COMPLETED.value,
+                    "metrics": metrics,
+                },
+            )
 
-            finally:
-                self.db_session.commit()
+    def _cancel_requested(self) -> bool:
+        """
+        Return True if the experiment was cancelled, either through the
+        registry of this process or by another process in the database.
+        """
+        if not self.cancel_event.is_set():
+            status = self.db_session.scalar(
+                select(Experiment.status).where(Experiment.id == self.experiment_id)
+            )
+            if status == ExperimentStatus.CANCELLED:
+                self.cancel_event.set()
+        return self.cancel_event.is_set()
 
-        # Update experiment status based on all ResponseRecords
-        response_statuses = [
-            r.status
-            for run in self.experiment.runs
-            for r in self.db_session.query(ResponseRecord)
-            .filter(ResponseRecord.experiment_run_id == run.id)
-            .all()
-        ]
+    def _start_response(self, run_id: int, response_id: int):
+        self.writer.update(
+            response_id,
+            status=ResponseStatus.RUNNING,
+            lease_expires_at=lease_expiry(),
+            lease_owner=lease_owner(),
+        )
+        self.event_bus.publish(
+            self.experiment_id,
+            RUN_EVENT,
+            {"run_id": run_id, "status": ResponseStatus.RUNNING.value},
+        )
 
-        if all(s == ResponseStatus.COMPLETED for s in response_statuses):
-            self.experiment.status = ExperimentStatus.COMPLETED
-        elif any(s == ResponseStatus.RUNNING for s in response_statuses):
-            self.experiment.status = ExperimentStatus.RUNNING
-        elif any(s == ResponseStatus.FAILED for s in response_statuses):
-            self.experiment.status = ExperimentStatus.FAILED
+    def _execute_run(
+        self,
+        run_ids: list[int],
+        user_prompt: str,
+        temperature: float,
+        top_p: float,
+        max_tokens: int,
+        seed: Optional[int] = None,
+    ):
+        """
+        Generation stage of a group of identical runs, with one choice of a
+        single request per run when there are several. Called from a worker
+        thread, so it must not touch the database session or ORM instances.
+        Returns the result of every run, in run_ids order, and the latency.
+        """
 
-        self.db_session.commit()
-        return self.experiment
+        def relay_delta(index: int, delta: str):
+            # Abandoned runs may still stream until their next chunk
+            if self.cancel_event.is_set():
+                return
+            self.event_bus.publish(
+                self.experiment_id,
+                DELTA_EVENT,
+                {"run_id": run_ids[index], "delta": delta},
+            )
+
+        start_time = time.time()
+        if len(run_ids) == 1:
+            results = [
+                self.runner.generate(
+                    user_prompt=user_prompt,
+                    temperature=temperature,
+                    top_p=top_p,
+                    max_tokens=max_tokens,
+                    on_delta=lambda delta: relay_delta(0, delta),
+                    seed=seed,
+                    cancel_event=self.cancel_event,
+                )
+            ]
+        else:
+            results = self.runner.generate_choices(
+                user_prompt=user_prompt,
+                n=len(run_ids),
+                temperature=temperature,
+                top_p=top_p,
+                max_tokens=max_tokens,
+                on_delta=relay_delta,
+                seed=seed,
+                cancel_event=self.cancel_event,
+            )
+        end_time = time.time()
+        return results, (end_time - start_time) * 1000
+
+    def _score_run(self, user_prompt: str, result: dict, generation_latency_ms: float):
+        """
+        Scoring stage of a single run, with its word and sentence counts.
+        Called from a worker thread.
+        """
+        with record_timings() as recorder:
+            text_counts = _text_counts(result.get("llm_response", ""))
+        result = {
+            **result,
+            "timings": merge_timings(result.get("timings"), recorder.timings),
+        }
+        start_time = time.time()
+        result = {**self.runner.score(user_prompt, result), **text_counts}
+        end_time = time.time()
+        return result, generation_latency_ms + (end_time - start_time) * 1000
+
+    def _finish_generation(
+        self, members: list[tuple[int, int]], future: Future
+    ) -> list[tuple[int, int, dict, float]]:
+        """
+        Persist the generated text of a group of runs ahead of their metrics.
+        Returns the run id, response id, result and latency of every run to
+        score; runs whose generation failed are marked FAILED instead.
+        """
+        try:
+            results, latency_ms = future.result()
+        except Exception as e:
+            for run_id, response_id in members:
+                self._fail_response(run_id, response_id, str(e))
+            return []
+
+        generated = []
+        for (run_id, response_id), result in zip(members, results):
+            generated_text = result.get("llm_response", "")
+            generation = result.get("generation", {})
+            self.writer.update(
+                response_id,
+                generated_text=generated_text,
+                ttft_ms=generation.get("ttft_ms"),
+                generation_ms=generation.get("generation_ms"),
+                tokens_per_second=generation.get("tokens_per_second"),
+                cache_hit=result.get("cache_hit"),
+                choice_index=result.get("choice_index"),
+            )
+            # Added to the tokens of earlier attempts of the run; scoring then
+            # reports only the tokens it uses itself
+            self.writer.add(response_id, **_usage_columns(result.get("usage")))
+            result = {**result, "usage": {}}
+            generated.append((run_id, response_id, result, latency_ms))
+        return generated
+
+    def _finish_response(self, run_id: int, response_id: int, future: Future):
+        try:
+            result, latency_ms = future.result()
+        except Exception as e:
+            self._fail_response(run_id, response_id, str(e))
+            return
+
+        metrics = result.get("metrics", {})
+        self.writer.update(
+            response_id,
+            total_words=result.get("total_words"),
+            total_sentences=result.get("total_sentences"),
+            metrics=metrics,
+            timings=result.get("timings"),
+            latency_ms=latency_ms,
+            status=ResponseStatus.COMPLETED,
+            lease_expires_at=None,
+        )
+        self.writer.add(response_id, **_usage_columns(result.get("usage")))
+        self.event_bus.publish(
+            self.experiment_id,
+            RUN_EVENT,
+            {
+                "run_id": run_id,
+                "status": ResponseStatus.COMPLETED.value,
+                "latency_ms": latency_ms,
+                "ttft_ms": result.get("generation", {}).get("ttft_ms"),
+                "metrics": metrics,
+                "cache_hit": result.get("cache_hit"),
+            },
+        )
+
+    def _fail_response(self, run_id: int, response_id: int, error_message: str):
+        self.writer.update(
+            response_id,
+            status=ResponseStatus.FAILED,
+            error_message=error_message,
+            lease_expires_at=None,
+        )
+        self.event_bus.publish(
+            self.experiment_id,
+            RUN_EVENT,
+            {
+                "run_id": run_id,
+                "status": ResponseStatus.FAILED.value,
+                "error_message": error_message,
+            },
+        )
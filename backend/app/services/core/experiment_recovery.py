@@ -0,0 +1,198 @@
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from ...db.enums import ExperimentStatus, ResponseStatus
+from ...db.models.experiment_models import Experiment, ExperimentRun, ResponseRecord
+from .constants import RUN_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def _new_lease_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+
+_lease_owner = _new_lease_owner()
+
+
+def _forget_lease_owner():
+    global _lease_owner
+    _lease_owner = _new_lease_owner()
+
+
+# A forked child is a different process and must not share the parent's id
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_lease_owner)
+
+
+def lease_owner() -> str:
+    """Id of this process, stored on the leases it takes."""
+    return _lease_owner
+
+
+def _owner_is_dead(owner: str) -> bool:
+    """
+    Return True if the process that took a lease is known to have exited:
+    it ran on this host and its pid is gone, or the pid now belongs to
+    another process (e.g. pid 1 of a restarted container). Owners on other
+    hosts are unknown; their leases are reclaimed when they expire.
+    """
+    host, pid, token = owner.rsplit(":", 2)
+    if owner == _lease_owner or host != socket.gethostname():
+        return False
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # Exists but belongs to another user
+        return False
+    return False
+
+
+def _dead_lease_owners(db: Session) -> list[str]:
+    owners = db.scalars(
+        select(ResponseRecord.lease_owner)
+        .where(
+            ResponseRecord.status == ResponseStatus.RUNNING,
+            ResponseRecord.lease_owner.is_not(None),
+        )
+        .distinct()
+    ).all()
+    return [owner for owner in owners if _owner_is_dead(owner)]
+
+
+def lease_expiry(now: datetime = None) -> datetime:
+    """Expiry of a lease taken or renewed at `now`."""
+    return (now or datetime.utcnow()) + timedelta(seconds=RUN_LEASE_SECONDS)
+
+
+def _live_lease(now: datetime, dead_owners: Optional[list[str]] = None):
+    live = (ResponseRecord.status == ResponseStatus.RUNNING) & (
+        ResponseRecord.lease_expires_at >= now
+    )
+    if dead_owners:
+        live &= or_(
+            ResponseRecord.lease_owner.is_(None),
+            ResponseRecord.lease_owner.not_in(dead_owners),
+        )
+    return live
+
+
+def has_live_leases(db: Session, experiment_id: int, now: datetime = None) -> bool:
+    """Return True if some run of the experiment is being executed right now."""
+    now = now or datetime.utcnow()
+    query = (
+        select(ResponseRecord.id)
+        .join(ExperimentRun, ResponseRecord.experiment_run_id == ExperimentRun.id)
+        .where(ExperimentRun.experiment_id == experiment_id, _live_lease(now))
+        .limit(1)
+    )
+    return db.execute(query).first() is not None
+
+
+def reclaim_stale_runs(db: Session, now: datetime = None) -> list[int]:
+    """
+    Recover from processes that died while running experiments.
+
+    RUNNING ResponseRecords whose lease expired, or whose lease is held by
+    a process that exited, are put back to PENDING, and RUNNING experiments
+    that no process works on anymore are marked PARTIAL so they can be
+    resumed. Returns the ids of those experiments.
+    """
+    now = now or datetime.utcnow()
+    dead_owners = _dead_lease_owners(db)
+
+    stale = (ResponseRecord.status == ResponseStatus.RUNNING) & or_(
+        ResponseRecord.lease_expires_at.is_(None),
+        ResponseRecord.lease_expires_at < now,
+        ResponseRecord.lease_owner.in_(dead_owners),
+    )
+    # Experiments whose runs were abandoned by a process that exited, known
+    # to be interrupted however recently they were updated
+    orphaned = (
+        select(ExperimentRun.experiment_id)
+        .join(ResponseRecord, ResponseRecord.experiment_run_id == ExperimentRun.id)
+        .where(
+            ResponseRecord.status == ResponseStatus.RUNNING,
+            ResponseRecord.lease_owner.in_(dead_owners),
+        )
+    )
+    orphaned_ids = db.scalars(orphaned).all() if dead_owners else []
+    db.execute(
+        update(ResponseRecord)
+        .where(stale)
+        .values(status=ResponseStatus.PENDING, lease_expires_at=None),
+        execution_options={"synchronize_session": False},
+    )
+
+    # An experiment that started less than a lease ago may not have leased
+    # its first runs yet
+    live = (
+        select(ExperimentRun.experiment_id)
+        .join(ResponseRecord, ResponseRecord.experiment_run_id == ExperimentRun.id)
+        .where(_live_lease(now, dead_owners))
+    )
+    interrupted = db.scalars(
+        select(Experiment.id).where(
+            Experiment.status == ExperimentStatus.RUNNING,
+            or_(
+                Experiment.updated_at < now - timedelta(seconds=RUN_LEASE_SECONDS),
+                Experiment.id.in_(orphaned_ids),
+            ),
+            Experiment.id.not_in(live),
+        )
+    ).all()
+    if interrupted:
+        db.execute(
+            update(Experiment)
+            .where(Experiment.id.in_(interrupted))
+            .values(status=ExperimentStatus.PARTIAL),
+            execution_options={"synchronize_session": False},
+        )
+
+    db.commit()
+    if interrupted:
+        logger.warning(
+            "Experiments %s were interrupted and can be resumed", interrupted
+        )
+    return list(interrupted)
+
+
+def reset_unfinished_runs(db: Session, experiment_id: int) -> int:
+    """
+    Put the ResponseRecords of every run of the experiment without a
+    COMPLETED response back to PENDING, so the next execution of the
+    experiment runs them again. Returns the number of records reset.
+    """
+    experiment_runs = select(ExperimentRun.id).where(
+        ExperimentRun.experiment_id == experiment_id
+    )
+    completed_runs = select(ResponseRecord.experiment_run_id).where(
+        ResponseRecord.experiment_run_id.in_(experiment_runs),
+        ResponseRecord.status == ResponseStatus.COMPLETED,
+    )
+    result = db.execute(
+        update(ResponseRecord)
+        .where(
+            ResponseRecord.experiment_run_id.in_(experiment_runs),
+            ResponseRecord.experiment_run_id.not_in(completed_runs),
+            ResponseRecord.status != ResponseStatus.PENDING,
+        )
+        .values(
+            status=ResponseStatus.PENDING,
+            error_message=None,
+            lease_expires_at=None,
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount
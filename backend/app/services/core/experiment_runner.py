@@ -1,3 +1,7 @@
+import threading
+import time
+from typing import Callable, Optional
+
 from app.services.llm.constants import (
     DEFAULT_MAX_TOKENS,
     DEFAULT_OPENAI_MODEL_NAME,
@@ -6,20 +10,37 @@ from app.services.llm.constants import (
 )
 from app.services.llm.openai_responder import OpenAIResponder
 from app.services.metrics.overall_metric import OverallMetric
+from app.services.timings import merge_timings, record_timings
+from app.services.token_usage import merge_usage, record_usage, split_tokens
+
+from .generation_cache import GenerationCache
 
 
 class ExperimentRunner:
     """Facade class to handle running the full experiment:
-    1. Get response from LLM
-    2. Calculate overall metrics
+    1. Get response from LLM (generate)
+    2. Calculate overall metrics (score)
     3. Return combined result
+
+    The two steps can also be called separately, so that scoring one
+    response overlaps with generating the next.
+
+    With a generation cache, results of reproducible runs (seeded, or at
+    temperature 0) are looked up before calling the LLM and stored after.
     """
 
     def __init__(
-        self, model_name: str = DEFAULT_OPENAI_MODEL_NAME, metrics_list: list = None
+        self,
+        model_name: str = DEFAULT_OPENAI_MODEL_NAME,
+        metrics_list: list = None,
+        stream: bool = False,
+        cache: Optional[GenerationCache] = None,
     ):
+        self.model_name = model_name
         self.responder = OpenAIResponder(model=model_name)
         self.metric = OverallMetric()
+        self.stream = stream
+        self.cache = cache
 
     def run(
         self,
@@ -27,27 +48,251 @@ class ExperimentRunner:
         temperature: float = DEFAULT_TEMPERATURE,
         top_p: float = DEFAULT_TOP_P,
         max_tokens: int = DEFAULT_MAX_TOKENS,
+        on_delta: Optional[Callable[[str], None]] = None,
+        seed: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
     ) -> dict:
         """
-        Run the experiment for a given user prompt.
+        Run the experiment for a given user prompt: generate, then score.
+        In streaming mode each content delta is passed to on_delta as it arrives.
+        Setting cancel_event abandons the LLM call where possible by raising
+        RequestCancelled.
         Returns:
             dict: {
-                "user_prompt": str,
                 "llm_response": str,
-                "metrics": dict
+                "metrics": dict,
+                "generation": dict,  # ttft_ms, generation_ms, tokens_per_second
+                "timings": dict,  # ms per stage, metric, embedding and tokenization
+                "usage": dict,  # prompt, completion, cached and embedding tokens
+                "cache_hit": Optional[bool]  # None when the cache is not used
+            }
+        """
+        result = self.generate(
+            user_prompt, temperature, top_p, max_tokens, on_delta, seed, cancel_event
+        )
+        return self.score(user_prompt, result)
+
+    def generate(
+        self,
+        user_prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        top_p: float = DEFAULT_TOP_P,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        on_delta: Optional[Callable[[str], None]] = None,
+        seed: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> dict:
+        """
+        Get the LLM response of a run, without metrics unless it was served
+        from the cache. Pass the result to score() to complete it.
+        """
+        if not self.uses_cache(temperature, seed):
+            result = self._generate(
+                user_prompt,
+                temperature,
+                top_p,
+                max_tokens,
+                on_delta,
+                seed,
+                cancel_event,
+            )
+            return {**result, "cache_hit": None}
+
+        key = self.cache.make_key(
+            self.model_name, user_prompt, temperature, top_p, max_tokens, seed
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            if on_delta is not None:
+                on_delta(cached["llm_response"])
+            # Nothing was generated, so there are no generation timings or usage
+            return {
+                **cached,
+                "generation": {},
+                "timings": {},
+                "usage": {},
+                "cache_hit": True,
+            }
+
+        result = self._generate(
+            user_prompt, temperature, top_p, max_tokens, on_delta, seed, cancel_event
+        )
+        # The entry is stored once score() has the metrics
+        return {**result, "cache_hit": False, "cache_key": key}
+
+    def uses_cache(self, temperature: float, seed: Optional[int] = None) -> bool:
+        """Whether generate() looks runs with these parameters up in the cache."""
+        # Unseeded sampling is not reproducible, so it is never cached
+        return self.cache is not None and (seed is not None or temperature == 0)
+
+    def generate_choices(
+        self,
+        user_prompt: str,
+        n: int,
+        temperature: float = DEFAULT_TEMPERATURE,
+        top_p: float = DEFAULT_TOP_P,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        on_delta: Optional[Callable[[int, str], None]] = None,
+        seed: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> list[dict]:
+        """
+        Generate the responses of `n` identical runs as the choices of a
+        single LLM request, bypassing the cache. Returns one generate()
+        result per choice, in choice index order, each with its
+        "choice_index". In streaming mode on_delta receives the choice index
+        of every delta.
+        The usage of the request is split over the choices: prompt tokens
+        evenly and completion tokens in proportion to the response length.
+        """
+        with record_usage() as recorder:
+            responses, generations = self._generate_choices(
+                user_prompt,
+                n,
+                temperature,
+                top_p,
+                max_tokens,
+                on_delta,
+                seed,
+                cancel_event,
+            )
+
+        usages = [{} for _ in responses]
+        for name, tokens in recorder.tokens.items():
+            weights = [
+                len(response or "") if name == "completion_tokens" else 1
+                for response in responses
+            ]
+            for usage, share in zip(usages, split_tokens(tokens, weights)):
+                usage[name] = share
+
+        return [
+            {
+                "llm_response": response,
+                "generation": generation,
+                "timings": {"generation_ms": generation.get("generation_ms")},
+                "usage": usage,
+                "cache_hit": None,
+                "choice_index": index,
             }
+            for index, (response, generation, usage) in enumerate(
+                zip(responses, generations, usages)
+            )
+        ]
+
+    def _generate_choices(
+        self,
+        user_prompt,
+        n,
+        temperature,
+        top_p,
+        max_tokens,
+        on_delta,
+        seed,
+        cancel_event,
+    ):
+        if self.stream:
+            choices = self.responder.run_streaming_choices(
+                user_prompt,
+                n,
+                temperature=temperature,
+                top_p=top_p,
+                max_tokens=max_tokens,
+                on_delta=on_delta,
+                seed=seed,
+                cancel_event=cancel_event,
+            )
+            generations = [dict(choice) for choice in choices]
+            responses = [generation.pop("content") for generation in generations]
+        else:
+            start_time = time.perf_counter()
+            responses = self.responder.run_choices(
+                user_prompt,
+                n,
+                temperature=temperature,
+                top_p=top_p,
+                max_tokens=max_tokens,
+                seed=seed,
+                cancel_event=cancel_event,
+            )
+            generation_ms = (time.perf_counter() - start_time) * 1000
+            generations = [{"generation_ms": generation_ms} for _ in responses]
+        return responses, generations
+
+    def score(self, user_prompt: str, result: dict) -> dict:
         """
+        Add the metrics of a generate() result. Results served from the cache
+        are already scored.
+        """
+        if "metrics" in result:
+            return result
 
-        # 1. Get LLM response
-        response = self.responder.run(
-            user_prompt,
-            temperature=temperature,
-            top_p=top_p,
-            max_tokens=max_tokens,
+        result = dict(result)
+        cache_key = result.pop("cache_key", None)
+        start_time = time.perf_counter()
+        with record_timings() as recorder, record_usage() as usage_recorder:
+            result["metrics"] = self.metric.compute(result["llm_response"], user_prompt)
+        result["timings"] = merge_timings(
+            result.get("timings"),
+            recorder.timings,
+            {"scoring_ms": (time.perf_counter() - start_time) * 1000},
         )
+        result["usage"] = merge_usage(result.get("usage"), usage_recorder.tokens)
+        if cache_key is not None:
+            self.cache.put(
+                cache_key,
+                {"llm_response": result["llm_response"], "metrics": result["metrics"]},
+            )
+        return result
+
+    def score_many(self, user_prompt: str, llm_responses: list[str]) -> list[dict]:
+        """Metrics of many responses to the prompt, with bulk embedding calls."""
+        return self.metric.compute_many(llm_responses, user_prompt)
 
-        # 2. Calculate overall metrics
-        score_dict = self.metric.compute(response, user_prompt)
+    def _generate(
+        self, user_prompt, temperature, top_p, max_tokens, on_delta, seed, cancel_event
+    ):
+        with record_usage() as recorder:
+            response, generation = self._complete(
+                user_prompt,
+                temperature,
+                top_p,
+                max_tokens,
+                on_delta,
+                seed,
+                cancel_event,
+            )
 
-        # 3. Return combined result
-        return {"llm_response": response, "metrics": score_dict}
+        return {
+            "llm_response": response,
+            "generation": generation,
+            "timings": {"generation_ms": generation.get("generation_ms")},
+            "usage": recorder.tokens,
+        }
+
+    def _complete(
+        self, user_prompt, temperature, top_p, max_tokens, on_delta, seed, cancel_event
+    ):
+        if self.stream:
+            generation = self.responder.run_streaming(
+                user_prompt,
+                temperature=temperature,
+                top_p=top_p,
+                max_tokens=max_tokens,
+                on_delta=on_delta,
+                seed=seed,
+                cancel_event=cancel_event,
+            )
+            response = generation.pop("content")
+        else:
+            start_time = time.perf_counter()
+            response = self.responder.run(
+                user_prompt,
+                temperature=temperature,
+                top_p=top_p,
+                max_tokens=max_tokens,
+                seed=seed,
+                cancel_event=cancel_event,
+            )
+            generation = {"generation_ms": (time.perf_counter() - start_time) * 1000}
+        return response, generation
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from .constants import (
+    GENERATION_CACHE_EVICT_TO,
+    GENERATION_CACHE_MAX_BYTES,
+    GENERATION_CACHE_PATH,
+    GENERATION_CACHE_VERSION,
+)
+
+
+class GenerationCache:
+    """
+    Persistent cache of runner results keyed on the model, prompt and
+    sampling parameters of a run.
+
+    Entries live in their own SQLite file, apart from the application
+    database, and the least recently used ones are evicted once the stored
+    results exceed `max_bytes`. The stored size is summed once when the
+    file is opened and kept up to date by every write, so the table is only
+    scanned when an eviction is due.
+    """
+
+    def __init__(
+        self,
+        path: str = GENERATION_CACHE_PATH,
+        max_bytes: int = GENERATION_CACHE_MAX_BYTES,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._connection = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        model: str,
+        prompt: str,
+        temperature: float,
+        top_p: float,
+        max_tokens: int,
+        seed: Optional[int],
+    ) -> str:
+        parameters = [
+            GENERATION_CACHE_VERSION,
+            model,
+            prompt,
+            temperature,
+            top_p,
+            max_tokens,
+            seed,
+        ]
+        return hashlib.sha256(json.dumps(parameters).encode()).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use so that importing the module creates no file
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_generations_last_used "
+                "ON generations (last_used)"
+            )
+            connection.commit()
+            self._connection = connection
+            self._total_bytes = self._stored_bytes(connection)
+        return self._connection
+
+    @staticmethod
+    def _stored_bytes(connection: sqlite3.Connection) -> int:
+        (total,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM generations"
+        ).fetchone()
+        return total
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE generations SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        payload = json.dumps(value)
+        with self._lock:
+            connection = self._connect()
+            replaced = connection.execute(
+                "SELECT size FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+            connection.execute(
+                "INSERT OR REPLACE INTO generations (key, value, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            self._total_bytes += len(payload) - (replaced[0] if replaced else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict(connection)
+            connection.commit()
+
+    def _evict(self, connection: sqlite3.Connection):
+        # Summed again, as other processes may share the file
+        self._total_bytes = self._stored_bytes(connection)
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        excess = self._total_bytes - int(self.max_bytes * GENERATION_CACHE_EVICT_TO)
+        evicted = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM generations ORDER BY last_used"
+        ):
+            evicted.append((key,))
+            excess -= size
+            self._total_bytes -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM generations WHERE key = ?", evicted)
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM generations")
+            connection.commit()
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+generation_cache = GenerationCache()
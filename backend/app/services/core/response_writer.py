@@ -0,0 +1,147 @@
+import threading
+import time
+from typing import Iterable
+
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.orm import Session
+
+from ...db.enums import ResponseStatus
+from ...db.models.experiment_models import ResponseRecord
+from .constants import RESPONSE_WRITE_BATCH_SIZE, RESPONSE_WRITE_INTERVAL_SECONDS
+
+# Serializes ResponseRecord write transactions of every experiment running in
+# this process, so concurrent experiments queue here instead of contending
+# for the SQLite write lock
+_write_lock = threading.Lock()
+
+
+class ResponseWriter:
+    """
+    Write-behind buffer for the ResponseRecords of one experiment.
+
+    Status and result updates are buffered per record, merging successive
+    updates of the same record, and written in one transaction once
+    `batch_size` records changed or `flush_interval` seconds passed.
+    Amounts passed to add() are added to the stored values instead of
+    replacing them. The owner must call flush() when the experiment ends.
+    """
+
+    def __init__(
+        self,
+        db_session: Session,
+        batch_size: int = RESPONSE_WRITE_BATCH_SIZE,
+        flush_interval: float = RESPONSE_WRITE_INTERVAL_SECONDS,
+    ):
+        self.db_session = db_session
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._updates: dict[int, dict] = {}
+        self._increments: dict[int, dict[str, int]] = {}
+        self._oldest_update_at = None
+
+    def create_pending(self, run_ids: Iterable[int]) -> dict[int, int]:
+        """
+        Insert a PENDING ResponseRecord for each run in a single transaction.
+        Returns the id of the new record of each run.
+        """
+        rows = [
+            {"experiment_run_id": run_id, "status": ResponseStatus.PENDING}
+            for run_id in run_ids
+        ]
+        if not rows:
+            return {}
+
+        statement = insert(ResponseRecord).returning(
+            ResponseRecord.id, ResponseRecord.experiment_run_id
+        )
+        with _write_lock:
+            try:
+                created = self.db_session.execute(statement, rows).all()
+                self.db_session.commit()
+            except Exception:
+                self.db_session.rollback()
+                raise
+        return {run_id: response_id for response_id, run_id in created}
+
+    def update(self, response_id: int, **values):
+        """Buffer new column values for a ResponseRecord."""
+        self._updates.setdefault(response_id, {"id": response_id}).update(values)
+        self._changed()
+
+    def add(self, response_id: int, **amounts: int):
+        """
+        Buffer amounts to add to integer columns of a ResponseRecord, e.g.
+        the tokens used by one more attempt of its run. Missing (NULL)
+        values count as 0.
+        """
+        amounts = {
+            name: amount for name, amount in amounts.items() if amount is not None
+        }
+        if not amounts:
+            return
+
+        increments = self._increments.setdefault(response_id, {})
+        for name, amount in amounts.items():
+            increments[name] = increments.get(name, 0) + amount
+        self._changed()
+
+    def _changed(self):
+        if self._oldest_update_at is None:
+            self._oldest_update_at = time.monotonic()
+
+        if len(self._updates.keys() | self._increments.keys()) >= self.batch_size:
+            self.flush()
+
+    def flush_if_due(self):
+        """Write the buffered updates if the oldest one is flush_interval old."""
+        if (
+            self._oldest_update_at is not None
+            and time.monotonic() - self._oldest_update_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write every buffered update in one transaction."""
+        if not self._updates and not self._increments:
+            return
+
+        with _write_lock:
+            try:
+                if self._updates:
+                    self.db_session.execute(
+                        update(ResponseRecord), list(self._updates.values())
+                    )
+                for statement, rows in self._increment_statements():
+                    self.db_session.execute(statement, rows)
+                self.db_session.commit()
+            except Exception:
+                self.db_session.rollback()
+                raise
+
+        self._updates.clear()
+        self._increments.clear()
+        self._oldest_update_at = None
+
+    def _increment_statements(self):
+        """One executemany UPDATE per set of columns incremented together."""
+        groups: dict[tuple[str, ...], list[dict]] = {}
+        for response_id, increments in self._increments.items():
+            rows = groups.setdefault(tuple(sorted(increments)), [])
+            rows.append(
+                {"response_id": response_id}
+                | {f"add_{name}": amount for name, amount in increments.items()}
+            )
+
+        table = ResponseRecord.__table__
+        for names, rows in groups.items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("response_id"))
+                .values(
+                    {
+                        name: func.coalesce(table.c[name], 0) + bindparam(f"add_{name}")
+                        for name in names
+                    }
+                )
+            )
+            yield statement, rows
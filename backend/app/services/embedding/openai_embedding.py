@@ -1,34 +1,73 @@
-import os
 from typing import List
 
 import numpy as np
-from dotenv import load_dotenv
 from openai import OpenAI
 
+from ..llm.client_registry import openai_clients
+from ..llm.constants import (
+    EMBEDDING_MAX_INPUTS,
+    EMBEDDING_MAX_TOKENS_PER_REQUEST,
+    OPENAI_EMBEDDING_MODEL_NAME,
+)
+from ..llm.rate_limiter import estimate_tokens, request_scheduler
+from ..timings import timed
+from ..token_usage import add_usage
 from .base import EmbeddingProvider
 
-load_dotenv()
-
 
 class OpenAIEmbeddingProvider(EmbeddingProvider):
     """
     Embedding provider using OpenAI API.
     """
 
-    def __init__(self, model_name: str = "text-embedding-3-small"):
+    def __init__(self, model_name: str = OPENAI_EMBEDDING_MODEL_NAME):
         self.model_name = model_name
+        self.scheduler = request_scheduler
 
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=self.api_key)
+    @property
+    def client(self) -> OpenAI:
+        # Looked up on every call, as configuring the registry closes the
+        # clients it handed out before
+        return openai_clients.client(max_retries=0)
 
     def embed(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for a list of texts using OpenAI API.
+        Lists beyond the input or token limit of one request are embedded
+        over several requests.
         Returns a numpy array of shape (len(texts), embedding_dim)
         """
         if not texts:
             return np.array([])
 
-        response = self.client.embeddings.create(model=self.model_name, input=texts)
-        embeddings = [item.embedding for item in response.data]
+        embeddings = []
+        for chunk, tokens in self._chunks(texts):
+            with timed("embedding_ms"):
+                response = self.scheduler.call(
+                    self.model_name,
+                    lambda: self.client.embeddings.create(
+                        model=self.model_name, input=chunk
+                    ),
+                    tokens=tokens,
+                )
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                add_usage(embedding_tokens=usage.total_tokens)
+                self.scheduler.settle(self.model_name, tokens, usage.total_tokens)
+            embeddings.extend(item.embedding for item in response.data)
         return np.array(embeddings)
+
+    @staticmethod
+    def _chunks(texts: List[str]):
+        chunk, chunk_tokens = [], 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if chunk and (
+                len(chunk) == EMBEDDING_MAX_INPUTS
+                or chunk_tokens + tokens > EMBEDDING_MAX_TOKENS_PER_REQUEST
+            ):
+                yield chunk, chunk_tokens
+                chunk, chunk_tokens = [], 0
+            chunk.append(text)
+            chunk_tokens += tokens
+        yield chunk, chunk_tokens
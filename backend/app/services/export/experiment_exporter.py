@@ -0,0 +1,88 @@
+import csv
+import json
+import zlib
+from io import StringIO
+from typing import Iterable, Iterator
+
+from ..metrics.overall_metric import METRIC_CLASSES
+
+# Metric columns exported after the overall score, in a stable order
+EXPORTED_METRICS = list(METRIC_CLASSES.keys())
+
+CSV_HEADER = [
+    "Run ID",
+    "Temperature",
+    "Top P",
+    "Response Text",
+    "Overall Metric",
+] + [f"{name.replace('_', ' ').title()} Metric" for name in EXPORTED_METRICS]
+
+
+def iter_csv(rows: Iterable, chunk_rows: int) -> Iterator[str]:
+    """
+    Render export rows as CSV, yielding one chunk of text every chunk_rows
+    rows so memory stays constant regardless of experiment size.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+
+    for count, row in enumerate(rows, start=1):
+        metrics = row.metrics or {}
+        writer.writerow(
+            [
+                row.run_id,
+                row.temperature,
+                row.top_p,
+                row.generated_text or "",
+                metrics.get("overall", ""),
+            ]
+            + [metrics.get(name, "") for name in EXPORTED_METRICS]
+        )
+        if count % chunk_rows == 0:
+            yield _drain(buffer)
+
+    yield _drain(buffer)
+
+
+def iter_ndjson(rows: Iterable, chunk_rows: int) -> Iterator[str]:
+    """Render export rows as newline-delimited JSON, one object per run."""
+    lines = []
+    for row in rows:
+        lines.append(
+            json.dumps(
+                {
+                    "run_id": row.run_id,
+                    "temperature": row.temperature,
+                    "top_p": row.top_p,
+                    "max_output_tokens": row.max_output_tokens,
+                    "status": row.status.value if row.status else None,
+                    "generated_text": row.generated_text,
+                    "latency_ms": row.latency_ms,
+                    "metrics": row.metrics or {},
+                }
+            )
+        )
+        if len(lines) == chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Gzip a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _drain(buffer: StringIO) -> str:
+    content = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return content
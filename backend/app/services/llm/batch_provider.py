@@ -0,0 +1,216 @@
+import json
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from openai import OpenAI
+
+from .client_registry import openai_clients
+from .constants import BATCH_COMPLETION_WINDOW, BATCH_ENDPOINT
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    prompt: str
+    temperature: float
+    top_p: float
+    max_tokens: int
+    seed: Optional[int] = None
+
+
+@dataclass
+class BatchResult:
+    custom_id: str
+    content: Optional[str] = None
+    error: Optional[str] = None
+    # prompt_tokens, completion_tokens and cached_tokens of the completion
+    usage: dict = field(default_factory=dict)
+
+
+def batch_input_lines(model: str, requests: list[BatchRequest]) -> Iterator[str]:
+    """Lines of a Batch API input file, one chat completion request each."""
+    for request in requests:
+        body = {
+            "model": model,
+            "messages": [{"role": "user", "content": request.prompt}],
+            "temperature": request.temperature,
+            "top_p": request.top_p,
+            "max_tokens": request.max_tokens,
+        }
+        if request.seed is not None:
+            body["seed"] = request.seed
+        line = {
+            "custom_id": request.custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": body,
+        }
+        yield json.dumps(line) + "\n"
+
+
+def parse_batch_output_line(line: dict) -> BatchResult:
+    """Parse one line of a Batch API output or error file."""
+    custom_id = line["custom_id"]
+    error = line.get("error")
+    if error:
+        return BatchResult(custom_id, error=error.get("message") or str(error))
+
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+    if response.get("status_code") != 200:
+        message = (body.get("error") or {}).get("message", "unknown error")
+        return BatchResult(
+            custom_id, error=f"HTTP {response.get('status_code')}: {message}"
+        )
+    usage = body.get("usage") or {}
+    return BatchResult(
+        custom_id,
+        content=body["choices"][0]["message"]["content"],
+        usage={
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "cached_tokens": (usage.get("prompt_tokens_details") or {}).get(
+                "cached_tokens"
+            ),
+        },
+    )
+
+
+class BatchProvider(ABC):
+    """Runs many chat completion requests as one asynchronous batch."""
+
+    @abstractmethod
+    def submit(self, model: str, requests: list[BatchRequest]) -> str:
+        """Submit the requests as one batch and return its id"""
+        pass
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Provider state of the batch, one of BATCH_DONE_STATES once done"""
+        pass
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        """Results of a finished batch; requests that did not run are missing"""
+        pass
+
+    @abstractmethod
+    def cancel(self, batch_id: str):
+        """Stop a batch in progress"""
+        pass
+
+
+class OpenAIBatchProvider(BatchProvider):
+    """
+    Batch provider using the OpenAI Batch API: requests are uploaded as a
+    JSONL file and results downloaded once the batch completes.
+    """
+
+    @property
+    def client(self) -> OpenAI:
+        # Looked up on every call, as configuring the registry closes the
+        # clients it handed out before
+        return openai_clients.client()
+
+    def submit(self, model: str, requests: list[BatchRequest]) -> str:
+        content = "".join(batch_input_lines(model, requests)).encode()
+        input_file = self.client.files.create(
+            file=("batch.jsonl", content), purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = self.client.files.content(file_id).text
+            for line in content.splitlines():
+                if line.strip():
+                    yield parse_batch_output_line(json.loads(line))
+
+    def cancel(self, batch_id: str):
+        self.client.batches.cancel(batch_id)
+
+
+def _echo_prompt(body: dict) -> str:
+    return body["messages"][-1]["content"]
+
+
+class LocalBatchProvider(BatchProvider):
+    """
+    File-based stand-in for the Batch API, for tests and local development.
+    Input and output files use the Batch API format and live in `directory`.
+    A batch completes on its first status check by passing the body of every
+    request to `respond`; an exception becomes the error of that request.
+    Usage counts words in place of tokens.
+    """
+
+    def __init__(self, directory: str, respond: Callable[[dict], str] = _echo_prompt):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.respond = respond
+
+    def _path(self, batch_id: str, kind: str) -> Path:
+        return self.directory / f"{batch_id}.{kind}.jsonl"
+
+    def submit(self, model: str, requests: list[BatchRequest]) -> str:
+        batch_id = f"local-batch-{uuid.uuid4().hex}"
+        with open(self._path(batch_id, "input"), "w") as f:
+            f.writelines(batch_input_lines(model, requests))
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if self._path(batch_id, "cancelled").exists():
+            return "cancelled"
+        if not self._path(batch_id, "output").exists():
+            self._process(batch_id)
+        return "completed"
+
+    def _process(self, batch_id: str):
+        output = []
+        with open(self._path(batch_id, "input")) as f:
+            for line in f:
+                request = json.loads(line)
+                result = {"custom_id": request["custom_id"], "error": None}
+                try:
+                    content = self.respond(request["body"])
+                    prompt = request["body"]["messages"][-1]["content"]
+                    result["response"] = {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"content": content}}],
+                            "usage": {
+                                "prompt_tokens": len(prompt.split()),
+                                "completion_tokens": len(content.split()),
+                            },
+                        },
+                    }
+                except Exception as e:
+                    result["error"] = {"message": str(e)}
+                output.append(json.dumps(result) + "\n")
+
+        with open(self._path(batch_id, "output"), "w") as f:
+            f.writelines(output)
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        path = self._path(batch_id, "output")
+        if not path.exists():
+            return
+        with open(path) as f:
+            for line in f:
+                yield parse_batch_output_line(json.loads(line))
+
+    def cancel(self, batch_id: str):
+        self._path(batch_id, "cancelled").touch()
@@ -0,0 +1,141 @@
+import importlib.util
+import os
+import threading
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import DEFAULT_MAX_RETRIES, OpenAI
+
+from .constants import (
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT_SECONDS,
+)
+
+load_dotenv()
+
+
+def _h2_installed() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class OpenAIClientRegistry:
+    """
+    Process-wide OpenAI clients sharing one pooled HTTP client, so that
+    connections and TLS sessions are reused by every responder, embedding
+    provider and experiment instead of being set up per component.
+
+    The HTTP client is created on first use, and again in a forked child,
+    so every worker process gets a pool of its own. The API key and base URL
+    are read from OPENAI_API_KEY and OPENAI_BASE_URL.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS,
+        http2: bool = HTTP2_ENABLED,
+    ):
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._clients: dict[tuple, OpenAI] = {}
+        self.configure(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            timeout=timeout,
+            connect_timeout=connect_timeout,
+            http2=http2,
+        )
+
+    def configure(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS,
+        http2: bool = HTTP2_ENABLED,
+    ):
+        """
+        Set the pool limits, keep-alive expiry and timeouts. The current pool
+        is closed, so clients handed out before must be fetched again.
+        """
+        with self._lock:
+            self.limits = httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            )
+            self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+            # HTTP/2 needs h2 (httpx[http2] in requirements.txt); without
+            # it the pool falls back to HTTP/1.1
+            self.http2 = http2 and _h2_installed()
+            self._close_http_client()
+
+    def http_client(self) -> httpx.Client:
+        """The pooled HTTP client of this process."""
+        with self._lock:
+            return self._get_http_client()
+
+    def client(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_url: Optional[str] = None,
+    ) -> OpenAI:
+        """
+        The OpenAI client with these settings, created once per process.
+        Pass max_retries=0 when retries are left to the request scheduler.
+        """
+        api_key = os.getenv("OPENAI_API_KEY")
+        base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        key = (api_key, base_url, max_retries)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    max_retries=max_retries,
+                    timeout=self.timeout,
+                    http_client=self._get_http_client(),
+                )
+                self._clients[key] = client
+            return client
+
+    def close(self):
+        """Close the pooled connections; clients are created again on use."""
+        with self._lock:
+            self._close_http_client()
+
+    def _close_http_client(self):
+        if self._http_client is not None:
+            self._http_client.close()
+        self._http_client = None
+        self._clients.clear()
+
+    def _get_http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            self._http_client = httpx.Client(
+                limits=self.limits, timeout=self.timeout, http2=self.http2
+            )
+        return self._http_client
+
+    def _forget(self):
+        # Connections of the parent process must not be used by a child
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._clients.clear()
+
+
+openai_clients = OpenAIClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=openai_clients._forget)
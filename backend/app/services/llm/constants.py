@@ -12,3 +12,43 @@ MAX_OUTPUT_TOKENS = 2000
 DEFAULT_TEMPERATURE = 1
 DEFAULT_TOP_P = 1.0
 DEFAULT_MAX_TOKENS = 500
+
+OPENAI_EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+
+# Requests and tokens per minute allowed for each model
+MODEL_RATE_LIMITS = {
+    OPEN_AI_GPT_4_1_MINI: {"rpm": 500, "tpm": 200_000},
+    OPEN_AI_GPT_4_1_NANO: {"rpm": 500, "tpm": 200_000},
+    OPENAI_EMBEDDING_MODEL_NAME: {"rpm": 3000, "tpm": 1_000_000},
+}
+DEFAULT_RATE_LIMIT = {"rpm": 500, "tpm": 200_000}
+# Share of the quota the scheduler uses, leaving room for estimation error
+RATE_LIMIT_HEADROOM = 0.9
+# Seconds of quota that may be spent in a single burst
+RATE_LIMIT_BURST_SECONDS = 5
+# Rough prompt size estimate used to charge the tokens-per-minute bucket
+CHARS_PER_TOKEN = 4
+
+# Connection pool shared by every OpenAI client of the process. HTTP/2 is
+# used when the optional h2 package is installed
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30
+HTTP_TIMEOUT_SECONDS = 120
+HTTP_CONNECT_TIMEOUT_SECONDS = 10
+HTTP2_ENABLED = True
+
+# Retries of rate-limited, timed-out and server-failed requests
+MAX_REQUEST_RETRIES = 5
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 60.0
+
+# Inputs per embeddings request; larger lists are split over several requests
+EMBEDDING_MAX_INPUTS = 2048
+EMBEDDING_MAX_TOKENS_PER_REQUEST = 250_000
+
+# Batch API: endpoint the requests go to and how long OpenAI may take
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+# Batch states after which a batch no longer changes
+BATCH_DONE_STATES = ("completed", "failed", "expired", "cancelled")
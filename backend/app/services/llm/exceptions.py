@@ -8,3 +8,9 @@ class OpenAIAPIError(Exception):
     """Exception raised for OpenAI API related errors."""
 
     pass
+
+
+class RequestCancelled(Exception):
+    """Exception raised when a request is cancelled before it completes."""
+
+    pass
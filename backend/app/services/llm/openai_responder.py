@@ -1,8 +1,11 @@
-import os
+import threading
+import time
+from typing import Callable, Optional
 
-from dotenv import load_dotenv
 from openai import APIError, APIStatusError, APITimeoutError, OpenAI, RateLimitError
 
+from ..token_usage import add_usage
+from .client_registry import openai_clients
 from .constants import (
     ALLOWED_OPENAI_MODELS,
     DEFAULT_MAX_TOKENS,
@@ -10,39 +13,240 @@ from .constants import (
     DEFAULT_TEMPERATURE,
     DEFAULT_TOP_P,
 )
-from .exceptions import ModelNotAllowedError, OpenAIAPIError
-
-load_dotenv()
+from .exceptions import ModelNotAllowedError, OpenAIAPIError, RequestCancelled
+from .rate_limiter import estimate_tokens, request_scheduler
 
 
 class OpenAIResponder:
     def __init__(self, model: str = DEFAULT_OPENAI_MODEL_NAME):
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=self.api_key)
+        self.scheduler = request_scheduler
         self.model = model
         if model not in ALLOWED_OPENAI_MODELS:
             raise ModelNotAllowedError(f"Model {model} is not allowed.")
 
+    @property
+    def client(self) -> OpenAI:
+        # Looked up on every call, as configuring the registry closes the
+        # clients it handed out before
+        return openai_clients.client(max_retries=0)
+
+    @staticmethod
+    def _seed_option(seed: Optional[int]) -> dict:
+        # Only sent when set, so unseeded requests are unchanged
+        return {} if seed is None else {"seed": seed}
+
+    @staticmethod
+    def _choices_option(n: int) -> dict:
+        # Only sent for several choices, so single requests are unchanged
+        return {} if n == 1 else {"n": n}
+
+    def _record_usage(self, usage, charged_tokens: int):
+        """
+        Report the token usage of a completion, when the API returned it, and
+        settle the estimated rate limit charge of the request with it.
+        """
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        add_usage(
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            cached_tokens=getattr(details, "cached_tokens", None),
+        )
+        total_tokens = getattr(usage, "total_tokens", None)
+        if total_tokens is not None:
+            self.scheduler.settle(self.model, charged_tokens, total_tokens)
+
     def run(
         self,
         prompt: str,
         temperature: float = DEFAULT_TEMPERATURE,
         top_p: float = DEFAULT_TOP_P,
         max_tokens: int = DEFAULT_MAX_TOKENS,
+        seed: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
     ) -> str:
+        return self.run_choices(
+            prompt, 1, temperature, top_p, max_tokens, seed, cancel_event
+        )[0]
+
+    def run_choices(
+        self,
+        prompt: str,
+        n: int,
+        temperature: float = DEFAULT_TEMPERATURE,
+        top_p: float = DEFAULT_TOP_P,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        seed: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> list[str]:
+        """
+        Sample `n` completions of the prompt in a single request, so the
+        prompt is sent and charged once. Returns them in choice index order.
+        """
+        tokens = estimate_tokens(prompt, max_tokens * n)
+        try:
+            response = self.scheduler.call(
+                self.model,
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    top_p=top_p,
+                    max_tokens=max_tokens,
+                    **self._choices_option(n),
+                    **self._seed_option(seed),
+                ),
+                tokens=tokens,
+                cancel_event=cancel_event,
+            )
+            self._record_usage(getattr(response, "usage", None), tokens)
+
+            choices = sorted(response.choices, key=lambda choice: choice.index)
+            return [choice.message.content for choice in choices]
+
+        except (APIError, APIStatusError, APITimeoutError, RateLimitError) as e:
+            raise OpenAIAPIError(f"OpenAI API error: {str(e)}")
+        except Exception as e:
+            raise e
 
+    def run_streaming(
+        self,
+        prompt: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        top_p: float = DEFAULT_TOP_P,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        on_delta: Optional[Callable[[str], None]] = None,
+        seed: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> dict:
+        """
+        Stream the completion, passing each content delta to on_delta as it
+        arrives, and measure generation timings.
+        Setting `cancel_event` closes the stream at the next chunk and raises
+        RequestCancelled.
+        Returns:
+            dict: {
+                "content": str,
+                "ttft_ms": float,  # time to first content token
+                "generation_ms": float,  # total generation time
+                "tokens_per_second": float,  # decode throughput after the first token
+            }
+        """
+        return self.run_streaming_choices(
+            prompt,
+            1,
+            temperature,
+            top_p,
+            max_tokens,
+            on_delta=(
+                None if on_delta is None else lambda index, delta: on_delta(delta)
+            ),
+            seed=seed,
+            cancel_event=cancel_event,
+        )[0]
+
+    def run_streaming_choices(
+        self,
+        prompt: str,
+        n: int,
+        temperature: float = DEFAULT_TEMPERATURE,
+        top_p: float = DEFAULT_TOP_P,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        on_delta: Optional[Callable[[int, str], None]] = None,
+        seed: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> list[dict]:
+        """
+        Stream `n` completions of the prompt from a single request, passing
+        the choice index and content of each delta to on_delta as it arrives.
+        Returns the content and timings of every choice, as run_streaming()
+        does, in choice index order. Timings of a choice end when that choice
+        finishes. Usage only reports the tokens of all choices together, so
+        with several choices the throughput counts content chunks instead.
+        """
+        tokens = estimate_tokens(prompt, max_tokens * n)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=temperature,
-                top_p=top_p,
-                max_tokens=max_tokens,
+            start_time = None
+
+            def open_stream():
+                # Timings start at the attempt that succeeds, not at the
+                # rate limiter
+                nonlocal start_time
+                start_time = time.perf_counter()
+                return self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    top_p=top_p,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **self._choices_option(n),
+                    **self._seed_option(seed),
+                )
+
+            # Only opening the stream is retried; deltas already relayed
+            # cannot be taken back
+            stream = self.scheduler.call(
+                self.model,
+                open_stream,
+                tokens=tokens,
+                cancel_event=cancel_event,
             )
 
-            return response.choices[0].message.content
+            parts = [[] for _ in range(n)]
+            first_token_times = [None] * n
+            finish_times = [None] * n
+            delta_counts = [0] * n
+            usage = None
+            for chunk in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    # Closing the connection stops the generation
+                    stream.close()
+                    raise RequestCancelled("Request cancelled while streaming")
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                for choice in chunk.choices:
+                    index = choice.index
+                    delta = choice.delta.content
+                    if delta:
+                        if first_token_times[index] is None:
+                            first_token_times[index] = time.perf_counter()
+                        delta_counts[index] += 1
+                        parts[index].append(delta)
+                        if on_delta is not None:
+                            on_delta(index, delta)
+                    if choice.finish_reason is not None:
+                        finish_times[index] = time.perf_counter()
+            end_time = time.perf_counter()
 
         except (APIError, APIStatusError, APITimeoutError, RateLimitError) as e:
             raise OpenAIAPIError(f"OpenAI API error: {str(e)}")
         except Exception as e:
             raise e
+
+        self._record_usage(usage, tokens)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        results = []
+        for index in range(n):
+            finish_time = finish_times[index] or end_time
+            first_token_time = first_token_times[index] or finish_time
+            # Fall back to the number of content chunks when usage is not
+            # reported per choice
+            if n == 1 and completion_tokens is not None:
+                choice_tokens = completion_tokens
+            else:
+                choice_tokens = delta_counts[index]
+            decode_seconds = finish_time - first_token_time
+            results.append(
+                {
+                    "content": "".join(parts[index]),
+                    "ttft_ms": (first_token_time - start_time) * 1000,
+                    "generation_ms": (finish_time - start_time) * 1000,
+                    "tokens_per_second": (
+                        choice_tokens / decode_seconds if decode_seconds > 0 else None
+                    ),
+                }
+            )
+        return results
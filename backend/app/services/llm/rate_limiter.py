@@ -0,0 +1,274 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, TypeVar
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+from .constants import (
+    CHARS_PER_TOKEN,
+    DEFAULT_RATE_LIMIT,
+    MAX_REQUEST_RETRIES,
+    MODEL_RATE_LIMITS,
+    RATE_LIMIT_BURST_SECONDS,
+    RATE_LIMIT_HEADROOM,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+)
+from .exceptions import RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors worth retrying; APITimeoutError is an APIConnectionError
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+def estimate_tokens(prompt: str, max_tokens: int = 0) -> int:
+    """Tokens a request is charged for: estimated prompt size plus max_tokens."""
+    return len(prompt) // CHARS_PER_TOKEN + 1 + max_tokens
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the server in the Retry-After(-Ms) response header."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                retry_at = parsedate_to_datetime(value)
+                return (retry_at - datetime.now(timezone.utc)).total_seconds()
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class TokenBucket:
+    """
+    Token bucket that lets callers reserve tokens ahead of time: a reservation
+    always succeeds and may leave the bucket in debt, and the caller waits
+    until the debt is paid off. Callers therefore queue in reservation order
+    and the bucket drains at exactly its refill rate. Not thread-safe.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float, clock=time.monotonic):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens and return the seconds to wait before using them."""
+        now = self.clock()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+        self.updated_at = now
+
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate_per_second)
+
+    def release(self, amount: float):
+        """Give back tokens of a reservation that will not be used."""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits of one model.
+    Only `headroom` of each quota is used, and at most `burst_seconds` worth
+    of it may be spent at once.
+    """
+
+    def __init__(
+        self,
+        rpm: int,
+        tpm: int,
+        headroom: float = RATE_LIMIT_HEADROOM,
+        burst_seconds: float = RATE_LIMIT_BURST_SECONDS,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        requests_per_second = rpm * headroom / 60
+        tokens_per_second = tpm * headroom / 60
+        self.requests = TokenBucket(
+            requests_per_second,
+            capacity=max(1.0, requests_per_second * burst_seconds),
+            clock=clock,
+        )
+        self.tokens = TokenBucket(
+            tokens_per_second,
+            capacity=tokens_per_second * burst_seconds,
+            clock=clock,
+        )
+        self.clock = clock
+        self.sleep = sleep
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and `tokens` tokens; returns the seconds to wait."""
+        with self._lock:
+            return max(
+                self.requests.reserve(1),
+                self.tokens.reserve(tokens),
+                self._paused_until - self.clock(),
+            )
+
+    def acquire(self, tokens: int, cancel_event: Optional[threading.Event] = None):
+        """
+        Block until a request of `tokens` tokens fits in the limits.
+        Setting `cancel_event` stops the wait, gives the reservation back for
+        other requests to use and raises RequestCancelled.
+        """
+        delay = self.reserve(tokens)
+        if delay <= 0:
+            return
+        if cancel_event is None:
+            self.sleep(delay)
+        elif cancel_event.wait(delay):
+            self.release(tokens)
+            raise RequestCancelled("Request cancelled while rate limited")
+
+    def release(self, tokens: int):
+        """Give back one request and `tokens` tokens that will not be used."""
+        with self._lock:
+            self.requests.release(1)
+            self.tokens.release(tokens)
+
+    def settle(self, charged: int, used: int):
+        """
+        Replace the estimate a request was charged with its actual token
+        count, giving back unused tokens or taking the shortfall.
+        """
+        with self._lock:
+            if used < charged:
+                self.tokens.release(charged - used)
+            else:
+                self.tokens.reserve(used - charged)
+
+    def pause(self, seconds: float):
+        """Hold back every request of this model for `seconds`."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+
+class RequestScheduler:
+    """
+    Paces API requests to stay within the rate limits of each model and
+    retries rate-limited, timed-out and server-failed requests with
+    exponential backoff and jitter, honouring Retry-After.
+
+    A 429 pauses every request of the model rather than only the one that
+    got it, so concurrent runs back off together instead of hammering the
+    API in lockstep.
+
+    Requests sent through the scheduler use OpenAI clients created with
+    max_retries=0, so that the client does not retry on top of it.
+    """
+
+    def __init__(
+        self,
+        limits: dict = MODEL_RATE_LIMITS,
+        max_retries: int = MAX_REQUEST_RETRIES,
+        base_delay: float = RETRY_BASE_DELAY_SECONDS,
+        max_delay: float = RETRY_MAX_DELAY_SECONDS,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.limits = dict(limits)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self._limiters: dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, model: str, rpm: int, tpm: int):
+        """Set the rate limits of a model."""
+        with self._lock:
+            self.limits[model] = {"rpm": rpm, "tpm": tpm}
+            self._limiters.pop(model, None)
+
+    def limiter(self, model: str) -> RateLimiter:
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                limits = self.limits.get(model, DEFAULT_RATE_LIMIT)
+                limiter = RateLimiter(
+                    limits["rpm"], limits["tpm"], clock=self.clock, sleep=self.sleep
+                )
+                self._limiters[model] = limiter
+            return limiter
+
+    def call(
+        self,
+        model: str,
+        request: Callable[[], T],
+        tokens: int,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> T:
+        """
+        Run `request` once the limits of `model` allow a request of `tokens`
+        tokens, retrying it on transient errors. The last error is raised
+        once the retries are exhausted.
+
+        Once `cancel_event` is set, waiting for the limits or for a retry
+        stops and RequestCancelled is raised instead of sending the request.
+        """
+        limiter = self.limiter(model)
+        for attempt in range(self.max_retries + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise RequestCancelled("Request cancelled")
+            limiter.acquire(tokens, cancel_event)
+            try:
+                return request()
+            except RETRYABLE_ERRORS as e:
+                # Exhausted billing quota does not recover by waiting
+                if attempt == self.max_retries or (
+                    getattr(e, "code", None) == "insufficient_quota"
+                ):
+                    raise
+
+                delay = self.retry_delay(e, attempt)
+                logger.warning(
+                    "%s request failed (%s), retrying in %.1fs",
+                    model,
+                    type(e).__name__,
+                    delay,
+                )
+                if isinstance(e, RateLimitError):
+                    # acquire() waits for the pause before the next attempt
+                    limiter.pause(delay)
+                elif cancel_event is None:
+                    self.sleep(delay)
+                else:
+                    cancel_event.wait(delay)
+
+    def settle(self, model: str, charged: int, used: int):
+        """Correct the tokens charged for a request once its usage is known."""
+        self.limiter(model).settle(charged, used)
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # Jitter keeps callers told the same delay from retrying together
+            return max(0.0, retry_after) + random.uniform(0, self.base_delay)
+        # Full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+request_scheduler = RequestScheduler()
@@ -6,3 +6,12 @@ class Metric(ABC):
     def compute(self, llm_response: str, user_prompt: str = None) -> float:
         """Compute metric score. User prompt is optional."""
         pass
+
+    def compute_many(
+        self, llm_responses: list[str], user_prompt: str = None
+    ) -> list[float]:
+        """
+        Compute the scores of many responses to the same prompt. Metrics that
+        call an API override this to make one call for all of them.
+        """
+        return [self.compute(response, user_prompt) for response in llm_responses]
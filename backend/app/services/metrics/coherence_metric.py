@@ -3,6 +3,7 @@ from nltk.tokenize import sent_tokenize
 from sklearn.metrics.pairwise import cosine_similarity
 
 from ..embedding.openai_embedding import OpenAIEmbeddingProvider
+from ..timings import timed
 from .base import Metric
 
 
@@ -14,7 +15,8 @@ class CoherenceMetric(Metric):
         """
         Compute coherence score for an LLM response.
         """
-        sentences = sent_tokenize(llm_response)
+        with timed("tokenization_ms"):
+            sentences = sent_tokenize(llm_response)
         if not sentences:
             return 0.0  # empty response
 
@@ -22,13 +24,7 @@ class CoherenceMetric(Metric):
             return 1.0  # single sentence fully coherent
 
         embeddings = self.embedding_provider.embed(sentences)
-        sim_scores = [
-            cosine_similarity([embeddings[i]], [embeddings[i + 1]])[0][0]
-            for i in range(len(embeddings) - 1)
-        ]
-        final_score = float(np.mean(sim_scores))
-
-        final_score = max(0.0, min(1.0, final_score))
+        final_score = self._score(embeddings)
         """
         # Simple linear scaling based on observed min/max
         min_raw = 0.1   # empirically determined for incoherent text
@@ -38,3 +34,34 @@ class CoherenceMetric(Metric):
         percentage = int(scaled_score * 100)
         """
         return final_score
+
+    def compute_many(
+        self, llm_responses: list[str], user_prompt: str = None
+    ) -> list[float]:
+        """Embed the sentences of every response in bulk."""
+        with timed("tokenization_ms"):
+            sentences = [sent_tokenize(response) for response in llm_responses]
+
+        scores = [0.0 if not s else 1.0 for s in sentences]
+        scored = [i for i, s in enumerate(sentences) if len(s) > 1]
+        if not scored:
+            return scores
+
+        embeddings = self.embedding_provider.embed(
+            [sentence for i in scored for sentence in sentences[i]]
+        )
+        start = 0
+        for i in scored:
+            end = start + len(sentences[i])
+            scores[i] = self._score(embeddings[start:end])
+            start = end
+        return scores
+
+    @staticmethod
+    def _score(embeddings: np.ndarray) -> float:
+        """Mean similarity of consecutive sentence embeddings, clamped to 0-1."""
+        sim_scores = [
+            cosine_similarity([embeddings[i]], [embeddings[i + 1]])[0][0]
+            for i in range(len(embeddings) - 1)
+        ]
+        return max(0.0, min(1.0, float(np.mean(sim_scores))))
@@ -1,5 +1,6 @@
 from nltk.tokenize import word_tokenize
 
+from ..timings import timed
 from .base import Metric
 
 
@@ -17,7 +18,8 @@ class LexicalDiversityMetric(Metric):
             return 0.0
 
         # Tokenize text into words
-        tokens = word_tokenize(llm_response.lower())  # lowercase for consistency
+        with timed("tokenization_ms"):
+            tokens = word_tokenize(llm_response.lower())  # lowercase for consistency
         if not tokens:
             return 0.0
 
@@ -1,3 +1,4 @@
+from ..timings import timed
 from .base import Metric
 from .coherence_metric import CoherenceMetric
 from .lexical_diversity_metric import LexicalDiversityMetric
@@ -43,7 +44,8 @@ class OverallMetric(Metric):
         total_weight = 0
 
         for name, metric in self.metrics.items():
-            score = metric.compute(llm_response, user_prompt)
+            with timed(f"{name}_ms"):
+                score = metric.compute(llm_response, user_prompt)
             results[name] = score
             weight = METRIC_WEIGHTS.get(name, 1.0)  # default weight = 1
             weighted_sum += score * weight
@@ -52,3 +54,25 @@ class OverallMetric(Metric):
         overall_score = weighted_sum / total_weight if total_weight > 0 else 0.0
         results["overall"] = overall_score
         return results
+
+    def compute_many(
+        self, llm_responses: list[str], user_prompt: str = None
+    ) -> list[dict]:
+        """
+        Score many responses to the same prompt, one metric at a time so that
+        embedding-based metrics make bulk API calls.
+        """
+        results = [{} for _ in llm_responses]
+        for name, metric in self.metrics.items():
+            with timed(f"{name}_ms"):
+                scores = metric.compute_many(llm_responses, user_prompt)
+            for result, score in zip(results, scores):
+                result[name] = score
+
+        total_weight = sum(METRIC_WEIGHTS.get(name, 1.0) for name in self.metrics)
+        for result in results:
+            weighted_sum = sum(
+                result[name] * METRIC_WEIGHTS.get(name, 1.0) for name in self.metrics
+            )
+            result["overall"] = weighted_sum / total_weight if total_weight > 0 else 0.0
+        return results
@@ -35,3 +35,19 @@ class RelevanceMetric(Metric):
         embeddings = self.embedding_provider.embed([user_prompt, llm_response])
         prompt_emb, response_emb = embeddings[0], embeddings[1]
         return self._cosine_similarity(prompt_emb, response_emb)
+
+    def compute_many(
+        self, llm_responses: list[str], user_prompt: str = None
+    ) -> list[float]:
+        """Embed the prompt once and every non-empty response in bulk."""
+        scored = [i for i, response in enumerate(llm_responses) if response]
+        scores = [0.0] * len(llm_responses)
+        if not user_prompt or not scored:
+            return scores
+
+        embeddings = self.embedding_provider.embed(
+            [user_prompt, *(llm_responses[i] for i in scored)]
+        )
+        for i, response_emb in zip(scored, embeddings[1:]):
+            scores[i] = self._cosine_similarity(embeddings[0], response_emb)
+        return scores
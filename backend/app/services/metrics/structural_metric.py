@@ -4,6 +4,7 @@ import nltk
 import numpy as np
 from nltk.tokenize import sent_tokenize, word_tokenize
 
+from ..timings import timed
 from .base import Metric
 from .constants import CONCLUSION_WORDS, STRUCTURAL_INDICATORS
 
@@ -42,7 +43,8 @@ class StructuralMetric(Metric):
     def _get_sentence_variety_score(self, sentences: list) -> float:
         if len(sentences) < 2:
             return 0.0
-        sentence_lengths = [len(word_tokenize(sent)) for sent in sentences]
+        with timed("tokenization_ms"):
+            sentence_lengths = [len(word_tokenize(sent)) for sent in sentences]
         length_std = np.std(sentence_lengths)
         if SENTENCE_STD_MIN <= length_std <= SENTENCE_STD_MAX:
             return 1.0
@@ -102,8 +104,9 @@ class StructuralMetric(Metric):
         Compute a single Structural Quality score (0-1) for an LLM response.
         """
         text = llm_response
-        sentences = sent_tokenize(text)
-        words = word_tokenize(text)
+        with timed("tokenization_ms"):
+            sentences = sent_tokenize(text)
+            words = word_tokenize(text)
         if len(words) == 0:
             return 0.0
 
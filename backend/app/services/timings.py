@@ -0,0 +1,63 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Stage timings stored on every response, besides one "<metric>_ms" entry per
+# metric. Embedding and tokenization time is also part of the metrics and of
+# scoring that spent it.
+TIMING_NAMES = ("generation_ms", "scoring_ms", "embedding_ms", "tokenization_ms")
+
+
+class TimingRecorder:
+    """Milliseconds spent per stage, summed over every block timed under a name."""
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+
+    def add(self, name: str, ms: float):
+        self.timings[name] = self.timings.get(name, 0.0) + ms
+
+
+_recorder: ContextVar[Optional[TimingRecorder]] = ContextVar(
+    "timing_recorder", default=None
+)
+
+
+@contextmanager
+def record_timings():
+    """
+    Collect the timings of every timed() block run inside this block on the
+    current thread into a new TimingRecorder.
+    """
+    recorder = TimingRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+@contextmanager
+def timed(name: str):
+    """Add the wall time of the block to `name` when timings are recorded."""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, (time.perf_counter() - start) * 1000)
+
+
+def merge_timings(*timings: Optional[dict]) -> dict:
+    """Sum timing dicts name by name, skipping missing values."""
+    merged = {}
+    for entry in timings:
+        for name, ms in (entry or {}).items():
+            if ms is not None:
+                merged[name] = merged.get(name, 0.0) + ms
+    return merged
@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Token counts stored on every response. Prompt, completion and cached
+# (prompt tokens served from the prompt cache) tokens come from the
+# completion, embedding tokens from the embedding calls of scoring.
+USAGE_NAMES = (
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "embedding_tokens",
+)
+
+
+class UsageRecorder:
+    """Tokens reported per kind, summed over every API call made."""
+
+    def __init__(self):
+        self.tokens: dict[str, int] = {}
+
+    def add(self, name: str, tokens: int):
+        self.tokens[name] = self.tokens.get(name, 0) + tokens
+
+
+_recorder: ContextVar[Optional[UsageRecorder]] = ContextVar(
+    "usage_recorder", default=None
+)
+
+
+@contextmanager
+def record_usage():
+    """
+    Collect the token usage reported by every API call made inside this
+    block on the current thread into a new UsageRecorder.
+    """
+    recorder = UsageRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def add_usage(**tokens: Optional[int]):
+    """Add token counts, e.g. add_usage(prompt_tokens=12), when usage is recorded."""
+    recorder = _recorder.get()
+    if recorder is None:
+        return
+
+    for name, count in tokens.items():
+        if count is not None:
+            recorder.add(name, count)
+
+
+def merge_usage(*usages: Optional[dict]) -> dict:
+    """Sum token usage dicts name by name, skipping missing values."""
+    merged = {}
+    for usage in usages:
+        for name, tokens in (usage or {}).items():
+            if tokens is not None:
+                merged[name] = merged.get(name, 0) + tokens
+    return merged
+
+
+def split_tokens(total: int, weights: list[float]) -> list[int]:
+    """
+    Split `total` tokens in proportion to `weights` into whole counts that
+    add up to `total`, e.g. the usage of one request over its choices.
+    """
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights, weight_sum = [1] * len(weights), len(weights)
+
+    shares = [total * weight / weight_sum for weight in weights]
+    counts = [int(share) for share in shares]
+    # Largest remainders get the tokens lost to rounding down
+    by_remainder = sorted(
+        range(len(shares)), key=lambda i: shares[i] - counts[i], reverse=True
+    )
+    for i in by_remainder[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.enums import ExperimentStatus
+from app.db.models.experiment_models import Experiment, ExperimentRun, ResponseRecord
+from app.services.llm.constants import DEFAULT_OPENAI_MODEL_NAME
+
+
+@pytest.fixture(autouse=True)
+def openai_api_key(monkeypatch):
+    """Tests never call the API, but the OpenAI client requires a key"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+
+@pytest.fixture
+def test_db():
+    """In-memory database; the API and model tests override it with a StaticPool"""
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def create_experiment(test_db):
+    """
+    Factory of experiments stored in test_db. Each item
+    of `responses` adds a run with a ResponseRecord of those column values,
+    or a run without a response for None. Other keyword arguments are
+    Experiment columns (completed by default, total_runs is the run count).
+    """
+
+    def create(responses=(), **fields) -> Experiment:
+        experiment = Experiment(
+            **{
+                "user_prompt": "Test prompt",
+                "model_name": DEFAULT_OPENAI_MODEL_NAME,
+                "status": ExperimentStatus.COMPLETED,
+                "total_runs": len(responses),
+                **fields,
+            }
+        )
+        for response in responses:
+            run = ExperimentRun(temperature=0.5, top_p=1.0, max_output_tokens=50)
+            if response is not None:
+                run.response = ResponseRecord(**response)
+            experiment.runs.append(run)
+        test_db.add(experiment)
+        test_db.commit()
+        return experiment
+
+    return create
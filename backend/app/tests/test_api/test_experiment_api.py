@@ -1,17 +1,32 @@
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.db.base import Base
-from app.db.enums import ExperimentStatus, ResponseStatus
+from app.db.enums import ExecutionMode, ExperimentStatus, ResponseStatus
 from app.db.models.experiment_models import Experiment, ExperimentRun, ResponseRecord
 from app.db.session import get_db
 from app.main import app
-from app.services.llm.constants import DEFAULT_OPENAI_MODEL_NAME
+from app.schemas.experiment_schemas import SweepRangeSchema
+from app.services.core.event_bus import (
+    EXPERIMENT_EVENT,
+    RUN_EVENT,
+    experiment_event_bus,
+)
+from app.services.llm.constants import (
+    DEFAULT_OPENAI_MODEL_NAME,
+    OPEN_AI_GPT_4_1_MINI,
+    OPEN_AI_GPT_4_1_NANO,
+)
 
 
 @pytest.fixture(scope="function")
@@ -96,6 +111,91 @@ class TestExperimentAPI:
         assert data[0]["total_runs"] == 3
         assert data[0]["status"] == "pending"
 
+    def test_list_experiments_paginates_with_cursor(self, client, test_db):
+        """Test keyset pagination across pages via the next-cursor header"""
+        test_db.add_all(
+            [
+                Experiment(
+                    user_prompt=f"Prompt {i}",
+                    name=f"Experiment {i}",
+                    model_name=DEFAULT_OPENAI_MODEL_NAME,
+                    total_runs=1,
+                )
+                for i in range(5)
+            ]
+        )
+        test_db.commit()
+
+        seen = []
+        cursor = None
+        for expected_size in (2, 2, 1):
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/experiments/", params=params)
+            assert response.status_code == 200
+            assert len(response.json()) == expected_size
+            seen.extend(e["id"] for e in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+
+        assert cursor is None
+        assert seen == sorted(seen, reverse=True)
+        assert len(set(seen)) == 5
+
+    def test_list_experiments_filters(self, client, test_db):
+        """Test filtering by status, model name and name prefix"""
+        test_db.add_all(
+            [
+                Experiment(
+                    user_prompt="a",
+                    name="Sweep alpha",
+                    model_name="gpt-4.1-mini",
+                    status=ExperimentStatus.COMPLETED,
+                ),
+                Experiment(
+                    user_prompt="b",
+                    name="Sweep beta",
+                    model_name="gpt-4.1-nano",
+                    status=ExperimentStatus.FAILED,
+                ),
+                Experiment(
+                    user_prompt="c",
+                    name="Demo",
+                    model_name="gpt-4.1-nano",
+                    status=ExperimentStatus.COMPLETED,
+                ),
+            ]
+        )
+        test_db.commit()
+
+        def names(**params):
+            response = client.get("/experiments/", params=params)
+            assert response.status_code == 200
+            return sorted(e["name"] for e in response.json())
+
+        assert names(status="completed") == ["Demo", "Sweep alpha"]
+        assert names(model_name="gpt-4.1-nano") == ["Demo", "Sweep beta"]
+        assert names(name_prefix="Sweep") == ["Sweep alpha", "Sweep beta"]
+        assert names(name_prefix="Sweep", status="failed") == ["Sweep beta"]
+
+    def test_list_experiments_name_prefix_matches_non_bmp_names(
+        self, client, create_experiment
+    ):
+        for name in ("abc", "abc\U0001f600", "abc\uffff", "abd"):
+            create_experiment(name=name)
+
+        response = client.get("/experiments/", params={"name_prefix": "abc"})
+        assert response.status_code == 200
+        assert sorted(e["name"] for e in response.json()) == [
+            "abc",
+            "abc\uffff",
+            "abc\U0001f600",
+        ]
+
+    def test_list_experiments_invalid_cursor(self, client):
+        response = client.get("/experiments/", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
     def test_get_experiment_detail_not_found(self, client):
         """Test getting experiment detail when experiment doesn't exist"""
         response = client.get("/experiments/999/")
@@ -217,6 +317,103 @@ class TestExperimentAPI:
         assert resp_data_2["generated_text"] == "Test response 2"
 
 
+class TestExperimentDetailQueries:
+    def _count_detail_queries(self, client, test_db, experiment_id):
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append(statement)
+
+        engine = test_db.get_bind()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            response = client.get(f"/experiments/{experiment_id}/")
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        assert response.status_code == 200
+        return response, len(statements)
+
+    def test_detail_query_count_is_constant(self, client, test_db, create_experiment):
+        """Version lookup, then experiment, runs and responses one query per level"""
+        response = {"generated_text": "text", "status": ResponseStatus.COMPLETED}
+        small_id, large_id = (
+            create_experiment([response] * count, status=ExperimentStatus.RUNNING).id
+            for count in (2, 50)
+        )
+        # Start from an empty identity map, like a fresh request would
+        test_db.expunge_all()
+
+        _, small_count = self._count_detail_queries(client, test_db, small_id)
+        response, large_count = self._count_detail_queries(client, test_db, large_id)
+
+        assert len(response.json()["runs"]) == 50
+        assert all(r["response"] for r in response.json()["runs"])
+        assert small_count == large_count == 4
+
+
+class TestExperimentDetailCaching:
+    RESPONSES = [{"generated_text": "cached text", "status": ResponseStatus.COMPLETED}]
+
+    def test_finished_experiment_conditional_get(self, client, create_experiment):
+        exp = create_experiment(self.RESPONSES)
+
+        first = client.get(f"/experiments/{exp.id}/")
+        assert first.status_code == 200
+        assert first.json()["runs"][0]["response"]["generated_text"] == "cached text"
+        etag = first.headers["etag"]
+        last_modified = first.headers["last-modified"]
+
+        not_modified = client.get(
+            f"/experiments/{exp.id}/", headers={"If-None-Match": etag}
+        )
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == etag
+
+        not_modified = client.get(
+            f"/experiments/{exp.id}/",
+            headers={"If-None-Match": f'"stale", W/{etag}'},
+        )
+        assert not_modified.status_code == 304
+
+        not_modified = client.get(
+            f"/experiments/{exp.id}/", headers={"If-Modified-Since": last_modified}
+        )
+        assert not_modified.status_code == 304
+
+        modified = client.get(
+            f"/experiments/{exp.id}/", headers={"If-None-Match": '"stale"'}
+        )
+        assert modified.status_code == 200
+        assert modified.json() == first.json()
+
+    def test_finished_experiment_payload_is_cached(self, client, create_experiment):
+        exp = create_experiment(self.RESPONSES)
+
+        first = client.get(f"/experiments/{exp.id}/")
+        with patch("app.api.experiment_router.get_experiment_with_runs") as mock_loader:
+            second = client.get(f"/experiments/{exp.id}/")
+
+        mock_loader.assert_not_called()
+        assert second.status_code == 200
+        assert second.content == first.content
+
+    def test_running_experiment_is_not_cached(self, client, test_db):
+        exp = Experiment(
+            user_prompt="Running prompt",
+            model_name=DEFAULT_OPENAI_MODEL_NAME,
+            total_runs=0,
+            status=ExperimentStatus.RUNNING,
+        )
+        test_db.add(exp)
+        test_db.commit()
+
+        response = client.get(f"/experiments/{exp.id}/")
+        assert response.status_code == 200
+        assert "etag" not in response.headers
+
+
 class TestCreateExperimentAPI:
     @patch("app.api.experiment_router.ExperimentOrchestrator")
     def test_create_experiment_success(self, mock_orchestrator, client, test_db):
@@ -408,6 +605,637 @@ class TestCreateExperimentAPI:
         mock_orchestrator_instance.run_experiment.assert_called_once()
 
 
+class TestBackgroundExperimentAPI:
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_create_experiment_in_background(self, mock_executor, client, test_db):
+        """Test that background creation queues the experiment and returns 202"""
+        experiment_data = {
+            "user_prompt": "Queued prompt",
+            "total_runs": 2,
+            "runs": [
+                {"temperature": 0.7, "top_p": 0.9, "max_output_tokens": 100},
+                {"temperature": 1.0, "top_p": 0.8, "max_output_tokens": 100},
+            ],
+        }
+
+        response = client.post("/experiments/?background=true", json=experiment_data)
+        assert response.status_code == 202
+
+        exp_in_db = test_db.query(Experiment).first()
+        data = response.json()
+        assert data["experiment_id"] == exp_in_db.id
+        assert data["status"] == "pending"
+        assert data["status_url"] == f"/experiments/{exp_in_db.id}/status"
+        assert len(exp_in_db.runs) == 2
+
+        mock_executor.submit.assert_called_once_with(
+            exp_in_db.id, ExecutionMode.INTERACTIVE
+        )
+
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_batch_mode_experiment_is_always_queued(
+        self, mock_executor, client, test_db
+    ):
+        experiment_data = {
+            "user_prompt": "Batch prompt",
+            "execution_mode": "batch",
+            "runs": [{"temperature": 0.7, "top_p": 0.9, "max_output_tokens": 100}],
+        }
+
+        response = client.post("/experiments/", json=experiment_data)
+        assert response.status_code == 202
+
+        exp_in_db = test_db.query(Experiment).first()
+        assert exp_in_db.execution_mode == ExecutionMode.BATCH
+        mock_executor.submit.assert_called_once_with(exp_in_db.id, ExecutionMode.BATCH)
+
+    def test_get_experiment_status(self, client, test_db):
+        """Test progress counts reported by the status endpoint"""
+        exp = Experiment(
+            user_prompt="Status prompt",
+            model_name=DEFAULT_OPENAI_MODEL_NAME,
+            total_runs=4,
+            status=ExperimentStatus.RUNNING,
+        )
+        test_db.add(exp)
+        test_db.commit()
+
+        runs = [
+            ExperimentRun(
+                experiment_id=exp.id, temperature=0.5, top_p=1.0, max_output_tokens=50
+            )
+            for _ in range(4)
+        ]
+        test_db.add_all(runs)
+        test_db.commit()
+
+        test_db.add_all(
+            [
+                ResponseRecord(
+                    experiment_run_id=runs[0].id, status=ResponseStatus.COMPLETED
+                ),
+                ResponseRecord(
+                    experiment_run_id=runs[1].id, status=ResponseStatus.FAILED
+                ),
+                ResponseRecord(
+                    experiment_run_id=runs[2].id, status=ResponseStatus.RUNNING
+                ),
+            ]
+        )
+        test_db.commit()
+
+        response = client.get(f"/experiments/{exp.id}/status")
+        assert response.status_code == 200
+        assert response.json() == {
+            "id": exp.id,
+            "status": "running",
+            "total_runs": 4,
+            "pending": 1,
+            "running": 1,
+            "completed": 1,
+            "failed": 1,
+            "cancelled": 0,
+        }
+
+    def test_get_experiment_status_not_found(self, client):
+        response = client.get("/experiments/999/status")
+        assert response.status_code == 404
+
+
+class TestResumeExperimentAPI:
+    def _interrupted_responses(self, running_lease=None):
+        return [
+            {"status": ResponseStatus.COMPLETED},
+            {"status": ResponseStatus.FAILED, "error_message": "timeout"},
+            {"status": ResponseStatus.RUNNING, "lease_expires_at": running_lease},
+        ]
+
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_resume_experiment(self, mock_executor, client, test_db, create_experiment):
+        mock_executor.is_active.return_value = False
+        exp = create_experiment(
+            self._interrupted_responses(), status=ExperimentStatus.PARTIAL
+        )
+
+        response = client.post(f"/experiments/{exp.id}/resume")
+        assert response.status_code == 202
+        assert response.json()["status_url"] == f"/experiments/{exp.id}/status"
+        mock_executor.submit.assert_called_once_with(exp.id, ExecutionMode.INTERACTIVE)
+
+        test_db.expire_all()
+        assert exp.status == ExperimentStatus.PENDING
+        statuses = [run.response.status for run in exp.runs]
+        assert statuses == [
+            ResponseStatus.COMPLETED,
+            ResponseStatus.PENDING,
+            ResponseStatus.PENDING,
+        ]
+
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_resume_running_experiment_conflicts(
+        self, mock_executor, client, create_experiment
+    ):
+        mock_executor.is_active.return_value = False
+        exp = create_experiment(
+            self._interrupted_responses(datetime.utcnow() + timedelta(minutes=5)),
+            status=ExperimentStatus.PARTIAL,
+        )
+
+        response = client.post(f"/experiments/{exp.id}/resume")
+        assert response.status_code == 409
+
+        mock_executor.is_active.return_value = True
+        exp = create_experiment(
+            self._interrupted_responses(), status=ExperimentStatus.PARTIAL
+        )
+        response = client.post(f"/experiments/{exp.id}/resume")
+        assert response.status_code == 409
+        mock_executor.submit.assert_not_called()
+
+    def test_resume_not_found(self, client):
+        assert client.post("/experiments/999/resume").status_code == 404
+
+
+class TestCancelExperimentAPI:
+    def _running_responses(self):
+        # The last run was never started
+        return [
+            {"status": ResponseStatus.COMPLETED},
+            {
+                "status": ResponseStatus.RUNNING,
+                "lease_expires_at": datetime.utcnow() + timedelta(minutes=5),
+            },
+            None,
+        ]
+
+    @patch("app.api.experiment_router.experiment_cancellations")
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_cancel_experiment(
+        self, mock_executor, mock_cancellations, client, test_db, create_experiment
+    ):
+        mock_executor.cancel.return_value = False
+        exp = create_experiment(
+            self._running_responses(), status=ExperimentStatus.RUNNING
+        )
+
+        response = client.post(f"/experiments/{exp.id}/cancel")
+        assert response.status_code == 200
+        assert response.json() == {
+            "id": exp.id,
+            "status": "cancelled",
+            "total_runs": 3,
+            "pending": 0,
+            "running": 0,
+            "completed": 1,
+            "failed": 0,
+            "cancelled": 2,
+        }
+        mock_executor.cancel.assert_called_once_with(exp.id)
+        mock_cancellations.cancel.assert_called_once_with(exp.id)
+
+        test_db.expire_all()
+        assert exp.status == ExperimentStatus.CANCELLED
+        responses = [run.response for run in exp.runs]
+        assert [r.status for r in responses] == [
+            ResponseStatus.COMPLETED,
+            ResponseStatus.CANCELLED,
+            ResponseStatus.CANCELLED,
+        ]
+        assert responses[1].lease_expires_at is None
+
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_cancel_finished_experiment_conflicts(
+        self, mock_executor, client, create_experiment
+    ):
+        exp = create_experiment(self._running_responses())
+
+        response = client.post(f"/experiments/{exp.id}/cancel")
+        assert response.status_code == 409
+        mock_executor.cancel.assert_not_called()
+
+    def test_cancel_not_found(self, client):
+        assert client.post("/experiments/999/cancel").status_code == 404
+
+
+class TestBatchExperimentAPI:
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_create_experiments_batch(self, mock_executor, client, test_db):
+        """Test that a batch is inserted with bulk statements and queued"""
+        payload = [
+            {
+                "user_prompt": f"Batch prompt {i}",
+                "total_runs": 2,
+                "runs": [
+                    {"temperature": 0.2, "top_p": 1.0, "max_output_tokens": 50},
+                    {"temperature": 0.9, "top_p": 0.5, "max_output_tokens": 80},
+                ],
+            }
+            for i in range(3)
+        ]
+
+        inserts = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("INSERT"):
+                inserts.append(statement)
+
+        engine = test_db.get_bind()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            response = client.post("/experiments/batch", json=payload)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        assert response.status_code == 202
+        jobs = response.json()
+        assert len(jobs) == 3
+        assert all(job["status"] == "pending" for job in jobs)
+
+        experiments = test_db.query(Experiment).order_by(Experiment.id).all()
+        assert [e.id for e in experiments] == [job["experiment_id"] for job in jobs]
+        assert [e.user_prompt for e in experiments] == [
+            "Batch prompt 0",
+            "Batch prompt 1",
+            "Batch prompt 2",
+        ]
+        assert all(len(e.runs) == 2 for e in experiments)
+        assert experiments[1].runs[1].max_output_tokens == 80
+        assert len(inserts) == 2
+
+        assert mock_executor.submit.call_count == 3
+
+    def test_create_experiments_batch_rejects_empty(self, client):
+        response = client.post("/experiments/batch", json=[])
+        assert response.status_code == 422
+
+    @patch("app.api.experiment_router.create_experiments")
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_create_experiments_batch_rejects_too_many_runs(
+        self, mock_executor, mock_create, client, test_db
+    ):
+        # 10 * 1 * 100 * 10 = 10,000 runs per experiment, the sweep limit
+        sweep = {
+            "temperature": {"start": 0.0, "stop": 1.8, "step": 0.2},
+            "top_p": [1.0],
+            "max_output_tokens": {"start": 1, "stop": 100, "step": 1},
+            "repetitions": 10,
+        }
+        experiment = {"user_prompt": "Sweep", "sweep": sweep}
+
+        response = client.post("/experiments/batch", json=[experiment] * 11)
+
+        assert response.status_code == 422
+        assert "more than" in response.json()["detail"]
+        mock_create.assert_not_called()
+        mock_executor.submit.assert_not_called()
+        assert test_db.query(Experiment).count() == 0
+
+
+class TestSweepExperimentAPI:
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_sweep_expands_into_runs(self, mock_executor, client, test_db):
+        """Test that a sweep spec is expanded server-side into runs"""
+        experiment_data = {
+            "user_prompt": "Sweep prompt",
+            "sweep": {
+                "temperature": {"start": 0.0, "stop": 1.0, "step": 0.5},
+                "top_p": [0.9, 1.0],
+                "max_output_tokens": [100],
+                "repetitions": 2,
+            },
+        }
+
+        response = client.post("/experiments/?background=true", json=experiment_data)
+        assert response.status_code == 202
+
+        experiment = test_db.query(Experiment).first()
+        assert experiment.total_runs == 12
+        cells = sorted(
+            (r.temperature, r.top_p, r.max_output_tokens) for r in experiment.runs
+        )
+        assert cells == sorted(
+            [(t, p, 100) for t in (0.0, 0.5, 1.0) for p in (0.9, 1.0)] * 2
+        )
+        mock_executor.submit.assert_called_once_with(
+            experiment.id, ExecutionMode.INTERACTIVE
+        )
+
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_sweep_seeds_each_repetition(self, mock_executor, client, test_db):
+        experiment_data = {
+            "user_prompt": "Sweep prompt",
+            "use_cache": True,
+            "runs": [
+                {"temperature": 0.3, "top_p": 0.5, "max_output_tokens": 10, "seed": 7}
+            ],
+            "sweep": {
+                "temperature": [1.0],
+                "top_p": [1.0],
+                "max_output_tokens": [20],
+                "repetitions": 3,
+                "seed": 100,
+            },
+        }
+
+        response = client.post("/experiments/?background=true", json=experiment_data)
+        assert response.status_code == 202
+
+        experiment = test_db.query(Experiment).first()
+        assert experiment.use_cache is True
+        assert [run.seed for run in experiment.runs] == [7, 100, 101, 102]
+
+        detail = client.get(f"/experiments/{experiment.id}/").json()
+        assert detail["use_cache"] is True
+        assert [run["seed"] for run in detail["runs"]] == [7, 100, 101, 102]
+
+    @patch("app.api.experiment_router.experiment_executor")
+    def test_sweep_combined_with_explicit_runs(self, mock_executor, client, test_db):
+        experiment_data = {
+            "user_prompt": "Sweep prompt",
+            "total_runs": 99,  # recomputed from runs + sweep
+            "runs": [{"temperature": 0.3, "top_p": 0.5, "max_output_tokens": 10}],
+            "sweep": {"temperature": [1.0], "top_p": [1.0], "max_output_tokens": [20]},
+        }
+
+        response = client.post("/experiments/?background=true", json=experiment_data)
+        assert response.status_code == 202
+
+        experiment = test_db.query(Experiment).first()
+        assert experiment.total_runs == 2
+        assert len(experiment.runs) == 2
+
+    def test_invalid_sweeps_are_rejected(self, client):
+        base = {"top_p": [1.0], "max_output_tokens": [100]}
+        invalid_sweeps = [
+            {**base, "temperature": [3.0]},
+            {**base, "temperature": {"start": 1.0, "stop": 0.0, "step": 0.1}},
+            {**base, "temperature": []},
+            {
+                "temperature": {"start": 0.0, "stop": 2.0, "step": 0.01},
+                "top_p": {"start": 0.0, "stop": 1.0, "step": 0.01},
+                "max_output_tokens": [100],
+            },
+        ]
+        for sweep in invalid_sweeps:
+            response = client.post(
+                "/experiments/", json={"user_prompt": "Sweep", "sweep": sweep}
+            )
+            assert response.status_code == 422
+
+        response = client.post("/experiments/", json={"user_prompt": "No runs"})
+        assert response.status_code == 422
+
+    def test_oversized_sweep_is_rejected_without_expanding_it(self, client):
+        sweep = {
+            "temperature": {"start": 0.0, "stop": 2.0, "step": 1e-12},
+            "top_p": [1.0],
+            "max_output_tokens": [100],
+        }
+        with patch.object(
+            SweepRangeSchema, "values", side_effect=AssertionError("expanded")
+        ):
+            response = client.post(
+                "/experiments/", json={"user_prompt": "Sweep", "sweep": sweep}
+            )
+
+        assert response.status_code == 422
+        assert "more than" in response.text
+
+
+class TestExperimentStatsAPI:
+    def test_stats_per_parameter_cell(self, client, test_db):
+        exp = Experiment(
+            user_prompt="Stats prompt",
+            model_name=DEFAULT_OPENAI_MODEL_NAME,
+            total_runs=6,
+            status=ExperimentStatus.COMPLETED,
+        )
+        test_db.add(exp)
+        test_db.commit()
+
+        cells = [(0.2, 1.0, 100)] * 4 + [(1.0, 0.5, 100)] * 2
+        runs = [
+            ExperimentRun(
+                experiment_id=exp.id,
+                temperature=t,
+                top_p=p,
+                max_output_tokens=m,
+            )
+            for t, p, m in cells
+        ]
+        test_db.add_all(runs)
+        test_db.commit()
+
+        overall = [0.1, 0.2, 0.3, 0.4, 0.9, None]
+        latencies = [100.0, 200.0, 300.0, 400.0, 50.0, 70.0]
+        records = [
+            ResponseRecord(
+                experiment_run_id=run.id,
+                status=ResponseStatus.COMPLETED,
+                generated_text="text",
+                latency_ms=latency,
+                metrics={"overall": score} if score is not None else {},
+                timings={"generation_ms": latency - 10},
+            )
+            for run, score, latency in zip(runs, overall, latencies)
+        ]
+        # Failed responses are left out of the statistics
+        records.append(
+            ResponseRecord(
+                experiment_run_id=runs[0].id,
+                status=ResponseStatus.FAILED,
+                latency_ms=9999.0,
+            )
+        )
+        test_db.add_all(records)
+        test_db.commit()
+
+        response = client.get(f"/experiments/{exp.id}/stats")
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["id"] == exp.id
+        low, high = data["cells"]
+        assert (low["temperature"], low["top_p"]) == (0.2, 1.0)
+        assert low["runs"] == 4
+
+        assert low["stats"]["overall"]["count"] == 4
+        assert low["stats"]["overall"]["mean"] == pytest.approx(0.25)
+        assert low["stats"]["overall"]["stddev"] == pytest.approx(0.1290994, rel=1e-4)
+        assert low["stats"]["overall"]["p50"] == pytest.approx(0.2)
+        assert low["stats"]["overall"]["p90"] == pytest.approx(0.4)
+
+        assert low["stats"]["latency_ms"]["mean"] == pytest.approx(250.0)
+        assert low["stats"]["latency_ms"]["p99"] == pytest.approx(400.0)
+        assert low["stats"]["generation_ms"]["mean"] == pytest.approx(240.0)
+        assert "embedding_ms" not in low["stats"]
+
+        assert high["stats"]["overall"]["count"] == 1
+        assert high["stats"]["overall"]["stddev"] is None
+        # The run without a score does not take a percentile rank
+        assert high["stats"]["overall"]["p50"] == pytest.approx(0.9)
+        assert high["stats"]["latency_ms"]["count"] == 2
+        assert "coherence" not in high["stats"]
+
+    def test_stats_in_one_query_with_a_stable_stddev(
+        self, client, test_db, create_experiment
+    ):
+        # Large values with a small spread, where avg(x²) - avg(x)² cancels out
+        experiment_id = create_experiment(
+            [
+                {
+                    "status": ResponseStatus.COMPLETED,
+                    "latency_ms": 1e9 + offset,
+                    "metrics": {"overall": offset / 10, "coherence": 0.5},
+                    "timings": {"generation_ms": 1.0, "scoring_ms": 2.0},
+                }
+                for offset in (1.0, 2.0, 3.0)
+            ]
+        ).id
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append(statement)
+
+        engine = test_db.get_bind()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            response = client.get(f"/experiments/{experiment_id}/stats")
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        assert response.status_code == 200
+        (cell,) = response.json()["cells"]
+        assert cell["stats"]["latency_ms"]["stddev"] == pytest.approx(1.0)
+        assert cell["stats"]["overall"]["stddev"] == pytest.approx(0.1)
+        assert cell["stats"]["coherence"]["stddev"] == 0.0
+        # The experiment lookup, then every statistic of every value
+        assert len(statements) == 2
+
+    def test_stats_not_found(self, client):
+        assert client.get("/experiments/999/stats").status_code == 404
+
+
+class TestExperimentUsageAPI:
+    def _usage_responses(self, usages):
+        return [
+            {
+                "status": ResponseStatus.COMPLETED,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "cached_tokens": prompt // 2,
+                "embedding_tokens": 5,
+                "generation_ms": generation_ms,
+            }
+            for prompt, completion, generation_ms in usages
+        ]
+
+    def test_experiment_usage(self, client, create_experiment):
+        exp = create_experiment(
+            self._usage_responses([(10, 100, 1000.0), (10, 50, 1000.0), (10, 30, None)])
+        )
+
+        response = client.get(f"/experiments/{exp.id}/usage")
+        assert response.status_code == 200
+        assert response.json() == {
+            "id": exp.id,
+            "model_name": DEFAULT_OPENAI_MODEL_NAME,
+            "responses": 3,
+            "prompt_tokens": 30,
+            "completion_tokens": 180,
+            "cached_tokens": 15,
+            "embedding_tokens": 15,
+            # Responses without a generation time are left out
+            "tokens_per_second": 75.0,
+        }
+
+    def test_usage_per_model(self, client, create_experiment):
+        for model_name, generation_ms in (
+            (OPEN_AI_GPT_4_1_MINI, 1000.0),
+            (OPEN_AI_GPT_4_1_NANO, 500.0),
+            (OPEN_AI_GPT_4_1_NANO, 500.0),
+        ):
+            create_experiment(
+                self._usage_responses([(10, 20, generation_ms)]), model_name=model_name
+            )
+
+        response = client.get("/experiments/usage")
+        assert response.status_code == 200
+        mini, nano = response.json()
+        assert (mini["model_name"], mini["experiments"]) == (OPEN_AI_GPT_4_1_MINI, 1)
+        assert mini["tokens_per_second"] == pytest.approx(20.0)
+        assert (nano["model_name"], nano["experiments"]) == (OPEN_AI_GPT_4_1_NANO, 2)
+        assert nano["completion_tokens"] == 40
+        assert nano["tokens_per_second"] == pytest.approx(40.0)
+
+    def test_usage_not_found(self, client):
+        assert client.get("/experiments/999/usage").status_code == 404
+
+
+class TestExperimentEventsAPI:
+    def test_events_for_finished_experiment(self, client, test_db):
+        """A finished experiment streams only its terminal event"""
+        exp = Experiment(
+            user_prompt="Done prompt",
+            model_name=DEFAULT_OPENAI_MODEL_NAME,
+            total_runs=0,
+            status=ExperimentStatus.COMPLETED,
+        )
+        test_db.add(exp)
+        test_db.commit()
+
+        response = client.get(f"/experiments/{exp.id}/events")
+        assert response.status_code == 200
+        assert "text/event-stream" in response.headers["content-type"]
+        assert response.text == (
+            "event: experiment\n" f'data: {{"id": {exp.id}, "status": "completed"}}\n\n'
+        )
+
+    def test_events_relay_published_progress(self, client, test_db):
+        """Run events published by the orchestrator reach the stream"""
+        exp = Experiment(
+            user_prompt="Running prompt",
+            model_name=DEFAULT_OPENAI_MODEL_NAME,
+            total_runs=1,
+            status=ExperimentStatus.RUNNING,
+        )
+        test_db.add(exp)
+        test_db.commit()
+        experiment_id = exp.id
+
+        def publish():
+            deadline = time.time() + 5
+            while not experiment_event_bus.subscriber_count(experiment_id):
+                if time.time() > deadline:
+                    return
+                time.sleep(0.01)
+            experiment_event_bus.publish(
+                experiment_id, RUN_EVENT, {"run_id": 1, "status": "running"}
+            )
+            experiment_event_bus.publish(
+                experiment_id,
+                EXPERIMENT_EVENT,
+                {"id": experiment_id, "status": "completed"},
+            )
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        response = client.get(f"/experiments/{experiment_id}/events")
+        publisher.join()
+
+        assert response.status_code == 200
+        events = [e for e in response.text.split("\n\n") if e]
+        assert events[0] == 'event: run\ndata: {"run_id": 1, "status": "running"}'
+        assert events[1].startswith("event: experiment")
+        assert experiment_event_bus.subscriber_count(experiment_id) == 0
+
+    def test_events_not_found(self, client):
+        response = client.get("/experiments/999/events")
+        assert response.status_code == 404
+        assert experiment_event_bus.subscriber_count(999) == 0
+
+
 class TestExportExperimentCSVAPI:
     def test_export_experiment_csv(self, client, test_db):
         # Create experiment
@@ -455,3 +1283,142 @@ class TestExportExperimentCSVAPI:
         csv_content = resp.content.decode()
         assert "Run ID,Temperature,Top P,Response Text,Overall Metric" in csv_content
         assert "1,0.7,0.9,Test response," in csv_content  # metric is None, so empty
+
+    def _export_responses(self, count):
+        return [
+            {
+                "generated_text": f"Response {i}",
+                "status": ResponseStatus.COMPLETED,
+                "latency_ms": 10.0,
+                "metrics": {
+                    "coherence": 0.9,
+                    "structure": 0.8,
+                    "relevance": 0.7,
+                    "lexical_diversity": 0.6,
+                    "overall": 0.75,
+                },
+            }
+            for i in range(count)
+        ]
+
+    def test_export_csv_includes_every_metric(self, client, create_experiment):
+        experiment = create_experiment(self._export_responses(3))
+        runs = experiment.runs
+
+        resp = client.get(f"/experiments/{experiment.id}/export/csv/")
+        assert resp.status_code == 200
+
+        lines = resp.content.decode().splitlines()
+        assert lines[0] == (
+            "Run ID,Temperature,Top P,Response Text,Overall Metric,"
+            "Coherence Metric,Structure Metric,Relevance Metric,"
+            "Lexical Diversity Metric"
+        )
+        assert len(lines) == 4
+        assert lines[1] == f"{runs[0].id},0.5,1.0,Response 0,0.75,0.9,0.8,0.7,0.6"
+
+    def test_export_csv_gzip(self, client, create_experiment):
+        experiment = create_experiment(self._export_responses(2))
+
+        resp = client.get(f"/experiments/{experiment.id}/export/csv/?gzip=true")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/gzip"
+        assert (
+            f"filename=experiment_{experiment.id}.csv.gz"
+            in resp.headers["content-disposition"]
+        )
+        csv_content = gzip.decompress(resp.content).decode()
+        assert csv_content.startswith("Run ID,Temperature")
+        assert len(csv_content.splitlines()) == 3
+
+    def test_export_ndjson(self, client, create_experiment):
+        experiment = create_experiment(self._export_responses(2))
+        runs = experiment.runs
+
+        resp = client.get(f"/experiments/{experiment.id}/export/ndjson/")
+        assert resp.status_code == 200
+        assert "application/x-ndjson" in resp.headers["content-type"]
+
+        records = [json.loads(line) for line in resp.text.splitlines()]
+        assert [r["run_id"] for r in records] == [run.id for run in runs]
+        assert records[0]["status"] == "completed"
+        assert records[0]["generated_text"] == "Response 0"
+        assert records[0]["metrics"]["lexical_diversity"] == 0.6
+
+    def test_export_has_one_row_per_run_with_its_latest_response(
+        self, client, test_db, create_experiment
+    ):
+        experiment = create_experiment(self._export_responses(2))
+        runs = experiment.runs
+        test_db.add(
+            ResponseRecord(
+                experiment_run_id=runs[0].id,
+                generated_text="Superseded",
+                status=ResponseStatus.FAILED,
+                created_at=datetime(2000, 1, 1),
+            )
+        )
+        test_db.commit()
+
+        resp = client.get(f"/experiments/{experiment.id}/export/ndjson/")
+
+        records = [json.loads(line) for line in resp.text.splitlines()]
+        assert [r["run_id"] for r in records] == [run.id for run in runs]
+        assert records[0]["generated_text"] == "Response 0"
+
+    def test_export_not_found(self, client):
+        assert client.get("/experiments/999/export/csv/").status_code == 404
+        assert client.get("/experiments/999/export/ndjson/").status_code == 404
+
+
+class TestResponseCompression:
+    LARGE_RESPONSES = [
+        {
+            "generated_text": "A long generated answer. " * 40,
+            "status": ResponseStatus.COMPLETED,
+        }
+    ] * 20
+
+    @pytest.mark.parametrize("encoding", ["br", "gzip"])
+    def test_detail_is_compressed(self, client, create_experiment, encoding):
+        experiment = create_experiment(self.LARGE_RESPONSES)
+
+        plain = client.get(
+            f"/experiments/{experiment.id}/", headers={"Accept-Encoding": "identity"}
+        )
+        assert "content-encoding" not in plain.headers
+
+        response = client.get(
+            f"/experiments/{experiment.id}/", headers={"Accept-Encoding": encoding}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < len(plain.content) / 5
+        assert response.json() == plain.json()
+
+    def test_small_response_is_not_compressed(self, client):
+        response = client.get("/experiments/", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+
+    def test_streamed_export_is_compressed(self, client, create_experiment):
+        experiment = create_experiment(self.LARGE_RESPONSES)
+
+        response = client.get(
+            f"/experiments/{experiment.id}/export/ndjson/",
+            headers={"Accept-Encoding": "br"},
+        )
+        assert response.headers["content-encoding"] == "br"
+        assert len(response.text.splitlines()) == 20
+
+    def test_gzip_export_is_not_compressed_twice(self, client, create_experiment):
+        experiment = create_experiment(self.LARGE_RESPONSES)
+
+        response = client.get(
+            f"/experiments/{experiment.id}/export/csv/?gzip=true",
+            headers={"Accept-Encoding": "gzip, br"},
+        )
+        assert "content-encoding" not in response.headers
+        csv_content = gzip.decompress(response.content).decode()
+        assert len(csv_content.splitlines()) == 21
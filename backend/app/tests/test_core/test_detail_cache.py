@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from app.services.core.detail_cache import ExperimentDetailCache
+
+
+def test_get_requires_matching_version():
+    cache = ExperimentDetailCache()
+    version = datetime(2025, 1, 1)
+    cache.put(1, version, b"payload")
+
+    assert cache.get(1, version) == b"payload"
+    assert cache.get(1, version + timedelta(seconds=1)) is None
+    assert cache.get(2, version) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ExperimentDetailCache(max_entries=2)
+    version = datetime(2025, 1, 1)
+    cache.put(1, version, b"one")
+    cache.put(2, version, b"two")
+    cache.get(1, version)
+    cache.put(3, version, b"three")
+
+    assert cache.get(1, version) == b"one"
+    assert cache.get(2, version) is None
+    assert cache.get(3, version) == b"three"
+
+
+def test_invalidate_drops_entry():
+    cache = ExperimentDetailCache()
+    version = datetime(2025, 1, 1)
+    cache.put(1, version, b"payload")
+
+    cache.invalidate(1)
+
+    assert cache.get(1, version) is None
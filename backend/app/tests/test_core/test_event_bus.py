@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+from app.services.core import event_bus
+from app.services.core.event_bus import (
+    DELTA_EVENT,
+    EXPERIMENT_EVENT,
+    RUN_EVENT,
+    ExperimentEventBus,
+)
+
+
+def test_publish_from_thread_reaches_subscribers():
+    bus = ExperimentEventBus()
+
+    async def consume():
+        first = bus.subscribe(1)
+        second = bus.subscribe(1)
+        other = bus.subscribe(2)
+
+        publisher = threading.Thread(
+            target=bus.publish, args=(1, RUN_EVENT, {"run_id": 7})
+        )
+        publisher.start()
+        publisher.join()
+
+        events = [
+            await asyncio.wait_for(first.get(), timeout=1),
+            await asyncio.wait_for(second.get(), timeout=1),
+        ]
+        assert other.empty()
+        return events
+
+    events = asyncio.run(consume())
+
+    assert events == [{"event": RUN_EVENT, "data": {"run_id": 7}}] * 2
+
+
+def test_unsubscribe_removes_subscriber():
+    bus = ExperimentEventBus()
+
+    async def subscribe_and_leave():
+        queue = bus.subscribe(1)
+        assert bus.subscriber_count(1) == 1
+        bus.unsubscribe(1, queue)
+
+    asyncio.run(subscribe_and_leave())
+
+    assert bus.subscriber_count(1) == 0
+    bus.publish(1, RUN_EVENT, {})  # no subscribers, nothing to deliver
+
+
+def test_slow_subscribers_miss_deltas_but_not_status_events(monkeypatch):
+    monkeypatch.setattr(event_bus, "EVENT_STREAM_QUEUE_SIZE", 3)
+    bus = ExperimentEventBus()
+
+    async def fall_behind():
+        queue = bus.subscribe(1)
+        for delta in "abcde":
+            bus.publish(1, DELTA_EVENT, {"run_id": 7, "delta": delta})
+        bus.publish(1, RUN_EVENT, {"run_id": 7, "status": "completed"})
+        bus.publish(1, DELTA_EVENT, {"run_id": 8, "delta": "f"})
+        bus.publish(1, EXPERIMENT_EVENT, {"id": 1, "status": "completed"})
+        # Let the loop run the deliveries scheduled by publish
+        await asyncio.sleep(0)
+        return [queue.get_nowait()["event"] for _ in range(queue.qsize())]
+
+    events = asyncio.run(fall_behind())
+
+    assert events == [DELTA_EVENT] * 3 + [RUN_EVENT, EXPERIMENT_EVENT]
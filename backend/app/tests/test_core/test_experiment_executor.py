@@ -0,0 +1,89 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.db.enums import ExecutionMode, ExperimentStatus
+from app.db.models.experiment_models import Experiment
+from app.services.core.experiment_executor import ExperimentExecutor
+from app.services.llm.constants import DEFAULT_OPENAI_MODEL_NAME
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def experiment_id(session_factory):
+    session = session_factory()
+    experiment = Experiment(
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        status=ExperimentStatus.PENDING,
+    )
+    session.add(experiment)
+    session.commit()
+    experiment_id = experiment.id
+    session.close()
+    return experiment_id
+
+
+@patch("app.services.core.experiment_executor.ExperimentOrchestrator")
+def test_submit_runs_experiment_in_background(
+    mock_orchestrator, session_factory, experiment_id
+):
+    executor = ExperimentExecutor(session_factory=session_factory, max_workers=1)
+
+    executor.submit(experiment_id).result(timeout=5)
+    executor.shutdown()
+
+    mock_orchestrator.assert_called_once()
+    experiment, _ = mock_orchestrator.call_args.args
+    assert experiment.id == experiment_id
+    mock_orchestrator.return_value.run_experiment.assert_called_once()
+    assert not executor.is_active(experiment_id)
+
+
+@patch("app.services.core.experiment_executor.ExperimentOrchestrator")
+def test_orchestrator_error_marks_experiment_failed(
+    mock_orchestrator, session_factory, experiment_id
+):
+    mock_orchestrator.return_value.run_experiment.side_effect = Exception("boom")
+    executor = ExperimentExecutor(session_factory=session_factory, max_workers=1)
+
+    executor.submit(experiment_id).result(timeout=5)
+    executor.shutdown()
+
+    session = session_factory()
+    experiment = session.get(Experiment, experiment_id)
+    assert experiment.status == ExperimentStatus.FAILED
+    session.close()
+
+
+@patch("app.services.core.experiment_executor.ExperimentOrchestrator")
+def test_batch_experiments_run_on_their_own_pool(
+    mock_orchestrator, session_factory, experiment_id
+):
+    thread_names = []
+    mock_orchestrator.return_value.run_experiment.side_effect = (
+        lambda: thread_names.append(threading.current_thread().name)
+    )
+    executor = ExperimentExecutor(session_factory=session_factory, max_workers=1)
+
+    executor.submit(experiment_id, ExecutionMode.BATCH).result(timeout=5)
+    executor.submit(experiment_id).result(timeout=5)
+    executor.shutdown()
+
+    assert thread_names[0].startswith("experiment-batch")
+    assert not thread_names[1].startswith("experiment-batch")
@@ -1,30 +1,22 @@
+import threading
+import time
 from unittest.mock import MagicMock
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
 
-from app.db.base import Base
-from app.db.enums import ExperimentStatus, ResponseStatus
+from app.db.enums import ExecutionMode, ExperimentStatus, ResponseStatus
 from app.db.models.experiment_models import Experiment, ExperimentRun, ResponseRecord
+from app.services.core.experiment_cancellation import experiment_cancellations
 from app.services.core.experiment_orchestrator import ExperimentOrchestrator
+from app.services.core.experiment_recovery import reset_unfinished_runs
+from app.services.llm.batch_provider import LocalBatchProvider
 from app.services.llm.constants import DEFAULT_OPENAI_MODEL_NAME
+from app.services.llm.exceptions import RequestCancelled
 
 
 @pytest.fixture
-def test_db():
-    engine = create_engine(
-        "sqlite:///:memory:", connect_args={"check_same_thread": False}
-    )
-    Base.metadata.create_all(bind=engine)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    yield session
-    session.close()
-
-
-@pytest.fixture
-def experiment_with_runs():
+def experiment_with_runs(test_db):
     run1 = ExperimentRun(id=1, temperature=0.7, top_p=0.9, max_output_tokens=100)
     run2 = ExperimentRun(id=2, temperature=0.8, top_p=0.85, max_output_tokens=150)
     experiment = Experiment(
@@ -34,6 +26,8 @@ def experiment_with_runs():
         runs=[run1, run2],
         status=ExperimentStatus.PENDING,
     )
+    test_db.add(experiment)
+    test_db.commit()
     return experiment
 
 
@@ -41,7 +35,7 @@ def test_all_runs_success(experiment_with_runs, test_db):
     orchestrator = ExperimentOrchestrator(experiment_with_runs, test_db)
 
     # Mock the runner to always succeed
-    orchestrator.runner.run = MagicMock(
+    orchestrator.runner.generate = MagicMock(
         return_value={
             "llm_response": "This is a test response.",
             "metrics": {"accuracy": 1.0},
@@ -76,7 +70,7 @@ def test_mixed_success_failure(experiment_with_runs, test_db):
             raise result
         return result
 
-    orchestrator.runner.run = MagicMock(side_effect=runner_side_effect)
+    orchestrator.runner.generate = MagicMock(side_effect=runner_side_effect)
 
     result_experiment = orchestrator.run_experiment()
 
@@ -102,13 +96,15 @@ def test_experiment_status_failed(test_db):
         runs=[run1, run2],
         status=ExperimentStatus.PENDING,
     )
+    test_db.add(experiment)
+    test_db.commit()
 
     orchestrator = ExperimentOrchestrator(experiment, test_db)
 
     # First run fails, second succeeds
     results = [Exception("LLM failure"), {"llm_response": "ok", "metrics": {}}]
 
-    orchestrator.runner.run = MagicMock(
+    orchestrator.runner.generate = MagicMock(
         side_effect=lambda *a, **kw: (
             results.pop(0)
             if not isinstance(results[0], Exception)
@@ -145,7 +141,7 @@ def test_skip_already_completed_runs(test_db):
     orchestrator = ExperimentOrchestrator(experiment, test_db)
 
     # Mock runner to succeed
-    orchestrator.runner.run = MagicMock(
+    orchestrator.runner.generate = MagicMock(
         return_value={"llm_response": "new result", "metrics": {"score": 1}}
     )
 
@@ -155,4 +151,514 @@ def test_skip_already_completed_runs(test_db):
     assert result_experiment.status == ExperimentStatus.COMPLETED
 
     # Ensure first run was not called again
-    orchestrator.runner.run.assert_called_once()
+    orchestrator.runner.generate.assert_called_once()
+
+
+def test_run_with_pending_record_is_executed(test_db):
+    run1 = ExperimentRun(id=1, temperature=0.7, top_p=0.9, max_output_tokens=100)
+    run2 = ExperimentRun(id=2, temperature=0.8, top_p=0.85, max_output_tokens=150)
+    experiment = Experiment(
+        id=1,
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        runs=[run1, run2],
+        status=ExperimentStatus.PENDING,
+    )
+    test_db.add_all(
+        [
+            ResponseRecord(experiment_run=run1, status=ResponseStatus.COMPLETED),
+            ResponseRecord(experiment_run=run2, status=ResponseStatus.PENDING),
+        ]
+    )
+    test_db.commit()
+
+    orchestrator = ExperimentOrchestrator(experiment, test_db)
+    orchestrator.runner.generate = MagicMock(
+        return_value={"llm_response": "new result", "metrics": {}}
+    )
+
+    result_experiment = orchestrator.run_experiment()
+
+    assert result_experiment.status == ExperimentStatus.COMPLETED
+    orchestrator.runner.generate.assert_called_once()
+    assert orchestrator.runner.generate.call_args.kwargs["temperature"] == 0.8
+    # The pending record of run 2 is reused rather than duplicated
+    assert test_db.query(ResponseRecord).count() == 2
+
+
+def test_commit_count_does_not_grow_with_runs(test_db):
+    runs = [
+        ExperimentRun(temperature=0.5, top_p=1.0, max_output_tokens=50)
+        for _ in range(20)
+    ]
+    experiment = Experiment(
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        runs=runs,
+        status=ExperimentStatus.PENDING,
+    )
+    test_db.add(experiment)
+    test_db.commit()
+
+    commits = []
+    event.listen(test_db, "after_commit", lambda session: commits.append(1))
+
+    orchestrator = ExperimentOrchestrator(experiment, test_db)
+    # One request per run, so that every run calls generate()
+    orchestrator.max_choices_per_request = 1
+    orchestrator.writer.flush_interval = 60
+    orchestrator.runner.generate = MagicMock(
+        return_value={"llm_response": "ok", "metrics": {}}
+    )
+    orchestrator.run_experiment()
+
+    # Experiment RUNNING, pending records, one batch of updates, final status
+    assert len(commits) == 4
+    assert experiment.status == ExperimentStatus.COMPLETED
+    records = test_db.query(ResponseRecord).all()
+    assert len(records) == 20
+    assert {r.status for r in records} == {ResponseStatus.COMPLETED}
+
+
+def _count_selects_of_finished_experiment(test_db, experiment_id, run_count):
+    runs = [
+        ExperimentRun(temperature=0.5, top_p=1.0, max_output_tokens=50)
+        for _ in range(run_count)
+    ]
+    experiment = Experiment(
+        id=experiment_id,
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        runs=runs,
+        status=ExperimentStatus.PENDING,
+    )
+    test_db.add(experiment)
+    test_db.commit()
+    test_db.add_all(
+        [
+            ResponseRecord(experiment_run=run, status=ResponseStatus.COMPLETED)
+            for run in runs
+        ]
+    )
+    test_db.commit()
+
+    statements = []
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", count_selects)
+    try:
+        orchestrator = ExperimentOrchestrator(experiment, test_db)
+        orchestrator.runner.generate = MagicMock()
+        orchestrator.run_experiment()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_selects)
+
+    orchestrator.runner.generate.assert_not_called()
+    assert experiment.status == ExperimentStatus.COMPLETED
+    return len(statements)
+
+
+def test_select_count_does_not_grow_with_runs(test_db):
+    # Finished runs are skipped and rolled up without a query per run
+    small = _count_selects_of_finished_experiment(test_db, 1, 2)
+    large = _count_selects_of_finished_experiment(test_db, 2, 50)
+    assert small == large
+
+
+def test_runs_execute_concurrently_within_limit(test_db):
+    runs = [
+        ExperimentRun(id=i, temperature=0.5, top_p=1.0, max_output_tokens=50)
+        for i in range(1, 7)
+    ]
+    experiment = Experiment(
+        id=1,
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        runs=runs,
+        status=ExperimentStatus.PENDING,
+        max_concurrency=3,
+    )
+    test_db.add(experiment)
+    test_db.commit()
+
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def slow_run(*args, **kwargs):
+        nonlocal active, max_active
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return {"llm_response": "ok", "metrics": {}}
+
+    orchestrator = ExperimentOrchestrator(experiment, test_db)
+    # One request per run, so that every run calls generate()
+    orchestrator.max_choices_per_request = 1
+    orchestrator.runner.generate = MagicMock(side_effect=slow_run)
+
+    result_experiment = orchestrator.run_experiment()
+
+    assert result_experiment.status == ExperimentStatus.COMPLETED
+    assert orchestrator.runner.generate.call_count == 6
+    assert 1 < max_active <= 3
+    assert test_db.query(ResponseRecord).count() == 6
+
+
+def test_scoring_overlaps_generation(experiment_with_runs, test_db):
+    experiment_with_runs.max_concurrency = 1
+    test_db.commit()
+    second_generated = threading.Event()
+
+    def generate(*args, **kwargs):
+        if kwargs["temperature"] == 0.8:
+            second_generated.set()
+        return {"llm_response": f"text {kwargs['temperature']}", "generation": {}}
+
+    def score(user_prompt, result):
+        # Scoring the first response waits for the second to be generated
+        assert second_generated.wait(5)
+        return {**result, "metrics": {"overall": 1.0}}
+
+    orchestrator = ExperimentOrchestrator(experiment_with_runs, test_db)
+    orchestrator.scoring_concurrency = 1
+    orchestrator.runner.generate = MagicMock(side_effect=generate)
+    orchestrator.runner.score = MagicMock(side_effect=score)
+    orchestrator.writer.update = MagicMock(wraps=orchestrator.writer.update)
+
+    result_experiment = orchestrator.run_experiment()
+
+    assert result_experiment.status == ExperimentStatus.COMPLETED
+    records = test_db.query(ResponseRecord).order_by(ResponseRecord.id).all()
+    assert [r.generated_text for r in records] == ["text 0.7", "text 0.8"]
+    assert all(r.metrics == {"overall": 1.0} for r in records)
+
+    # Generated text is written ahead of the metrics
+    updates = [
+        c.kwargs
+        for c in orchestrator.writer.update.call_args_list
+        if c.args[0] == records[0].id
+    ]
+    text_update = next(i for i, u in enumerate(updates) if "generated_text" in u)
+    metrics_update = next(i for i, u in enumerate(updates) if "metrics" in u)
+    assert text_update < metrics_update
+
+
+def test_cancel_abandons_in_flight_runs(test_db):
+    runs = [
+        ExperimentRun(id=i, temperature=0.5, top_p=1.0, max_output_tokens=50)
+        for i in range(1, 7)
+    ]
+    experiment = Experiment(
+        id=1,
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        runs=runs,
+        status=ExperimentStatus.PENDING,
+        max_concurrency=2,
+    )
+    test_db.add(experiment)
+    test_db.commit()
+
+    started = threading.Semaphore(0)
+    release = threading.Event()
+
+    def hanging_run(*args, **kwargs):
+        started.release()
+        # A call that cannot be aborted and ignores the cancel
+        release.wait(5)
+        raise RequestCancelled("released")
+
+    orchestrator = ExperimentOrchestrator(experiment, test_db)
+    # One request per run, so that every run calls generate()
+    orchestrator.max_choices_per_request = 1
+    orchestrator.writer.flush_interval = 0.05
+    orchestrator.runner.generate = MagicMock(side_effect=hanging_run)
+
+    def cancel_when_started():
+        started.acquire(timeout=5)
+        started.acquire(timeout=5)
+        experiment_cancellations.cancel(1)
+
+    canceller = threading.Thread(target=cancel_when_started)
+    canceller.start()
+    start = time.monotonic()
+    result_experiment = orchestrator.run_experiment()
+    elapsed = time.monotonic() - start
+    release.set()
+    canceller.join()
+
+    # Returned without waiting for the hanging calls
+    assert elapsed < 2
+    assert result_experiment.status == ExperimentStatus.CANCELLED
+    assert orchestrator.runner.generate.call_count == 2
+    statuses = {record.status for record in test_db.query(ResponseRecord)}
+    assert statuses == {ResponseStatus.CANCELLED}
+    assert test_db.query(ResponseRecord).count() == 6
+
+
+def test_cancelled_experiment_is_not_started(experiment_with_runs, test_db):
+    experiment_with_runs.status = ExperimentStatus.CANCELLED
+    test_db.commit()
+
+    orchestrator = ExperimentOrchestrator(experiment_with_runs, test_db)
+    orchestrator.runner.generate = MagicMock()
+
+    result_experiment = orchestrator.run_experiment()
+
+    assert result_experiment.status == ExperimentStatus.CANCELLED
+    orchestrator.runner.generate.assert_not_called()
+
+
+def test_status_changes_are_published(experiment_with_runs, test_db):
+    orchestrator = ExperimentOrchestrator(experiment_with_runs, test_db)
+    orchestrator.event_bus = MagicMock()
+    orchestrator.runner.generate = MagicMock(
+        return_value={"llm_response": "ok", "metrics": {"overall": 0.5}}
+    )
+
+    orchestrator.run_experiment()
+
+    events = [c.args for c in orchestrator.event_bus.publish.call_args_list]
+    run_events = [data for _, event_type, data in events if event_type == "run"]
+    assert sorted((e["run_id"], e["status"]) for e in run_events) == [
+        (1, "completed"),
+        (1, "running"),
+        (2, "completed"),
+        (2, "running"),
+    ]
+    completed = [e for e in run_events if e["status"] == "completed"]
+    assert all(e["metrics"] == {"overall": 0.5} for e in completed)
+    assert all(e["latency_ms"] is not None for e in completed)
+    assert events[-1] == (1, "experiment", {"id": 1, "status": "completed"})
+
+
+def test_generation_timings_are_persisted(experiment_with_runs, test_db):
+    orchestrator = ExperimentOrchestrator(experiment_with_runs, test_db)
+    orchestrator.runner.generate = MagicMock(
+        return_value={
+            "llm_response": "ok",
+            "metrics": {},
+            "generation": {
+                "ttft_ms": 10.0,
+                "generation_ms": 100.0,
+                "tokens_per_second": 40.0,
+            },
+            "timings": {"generation_ms": 100.0, "scoring_ms": 20.0},
+        }
+    )
+
+    orchestrator.run_experiment()
+
+    for r in test_db.query(ResponseRecord).all():
+        assert r.ttft_ms == 10.0
+        assert r.generation_ms == 100.0
+        assert r.tokens_per_second == 40.0
+        # Word and sentence counting is timed on top of the runner's timings
+        assert r.timings["generation_ms"] == 100.0
+        assert r.timings["scoring_ms"] == 20.0
+        assert r.timings["tokenization_ms"] >= 0
+
+
+def test_token_usage_is_persisted(experiment_with_runs, test_db):
+    orchestrator = ExperimentOrchestrator(experiment_with_runs, test_db)
+    orchestrator.runner.generate = MagicMock(
+        return_value={
+            "llm_response": "Two words.",
+            "usage": {"prompt_tokens": 12, "completion_tokens": 3, "cached_tokens": 0},
+        }
+    )
+    orchestrator.runner.score = MagicMock(
+        side_effect=lambda prompt, result: {
+            **result,
+            "metrics": {},
+            "usage": {**result["usage"], "embedding_tokens": 7},
+        }
+    )
+
+    orchestrator.run_experiment()
+
+    for r in test_db.query(ResponseRecord).all():
+        assert (r.prompt_tokens, r.completion_tokens, r.cached_tokens) == (12, 3, 0)
+        assert r.embedding_tokens == 7
+        # NLTK word tokens, the period included
+        assert r.total_words == 3
+
+
+def test_token_usage_of_every_attempt_is_kept(experiment_with_runs, test_db):
+    usage = {"prompt_tokens": 12, "completion_tokens": 3}
+    scores = iter([RuntimeError("scoring failed")] * 2 + [{}] * 2)
+
+    def score(prompt, result):
+        metrics = next(scores)
+        if isinstance(metrics, Exception):
+            raise metrics
+        return {**result, "metrics": metrics, "usage": {"embedding_tokens": 7}}
+
+    for _ in range(2):
+        orchestrator = ExperimentOrchestrator(experiment_with_runs, test_db)
+        orchestrator.runner.generate = MagicMock(
+            return_value={"llm_response": "Two words.", "usage": usage}
+        )
+        orchestrator.runner.score = MagicMock(side_effect=score)
+        orchestrator.run_experiment()
+        reset_unfinished_runs(test_db, experiment_with_runs.id)
+        test_db.commit()
+
+    test_db.expire_all()
+    for r in test_db.query(ResponseRecord).all():
+        assert r.status == ResponseStatus.COMPLETED
+        # Generated twice, scored once
+        assert (r.prompt_tokens, r.completion_tokens) == (24, 6)
+        assert r.embedding_tokens == 7
+
+
+def test_cache_hits_are_recorded(experiment_with_runs, test_db):
+    orchestrator = ExperimentOrchestrator(experiment_with_runs, test_db)
+    orchestrator.runner.generate = MagicMock(
+        side_effect=[
+            {"llm_response": "cached", "metrics": {}, "cache_hit": True},
+            {"llm_response": "fresh", "metrics": {}, "cache_hit": False},
+        ]
+    )
+
+    orchestrator.run_experiment()
+
+    records = test_db.query(ResponseRecord).order_by(ResponseRecord.id).all()
+    assert [r.cache_hit for r in records] == [True, False]
+
+
+def test_identical_runs_share_one_request(test_db):
+    runs = [
+        ExperimentRun(id=i, temperature=0.5, top_p=1.0, max_output_tokens=50)
+        for i in range(1, 6)
+    ] + [
+        ExperimentRun(id=6, temperature=0.5, top_p=1.0, max_output_tokens=50, seed=7),
+        ExperimentRun(id=7, temperature=0.9, top_p=1.0, max_output_tokens=50),
+    ]
+    experiment = Experiment(
+        id=1,
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        runs=runs,
+        status=ExperimentStatus.PENDING,
+    )
+    test_db.add(experiment)
+    test_db.commit()
+
+    def generate_choices(*args, n, on_delta, **kwargs):
+        for index in range(n):
+            on_delta(index, f"choice {index}")
+        return [
+            {
+                "llm_response": f"choice {index}",
+                "metrics": {},
+                "generation": {"generation_ms": 10.0 + index},
+                "choice_index": index,
+            }
+            for index in range(n)
+        ]
+
+    orchestrator = ExperimentOrchestrator(experiment, test_db)
+    orchestrator.max_choices_per_request = 3
+    orchestrator.event_bus = MagicMock()
+    orchestrator.runner.generate = MagicMock(
+        return_value={"llm_response": "alone", "metrics": {}}
+    )
+    orchestrator.runner.generate_choices = MagicMock(side_effect=generate_choices)
+
+    result_experiment = orchestrator.run_experiment()
+
+    assert result_experiment.status == ExperimentStatus.COMPLETED
+    # Five identical runs in requests of three and two choices; the seeded
+    # run and the different cell get a request each
+    assert sorted(
+        c.kwargs["n"] for c in orchestrator.runner.generate_choices.call_args_list
+    ) == [2, 3]
+    assert sorted(
+        (c.kwargs["temperature"], c.kwargs["seed"])
+        for c in orchestrator.runner.generate.call_args_list
+    ) == [(0.5, 7), (0.9, None)]
+
+    records = {r.experiment_run_id: r for r in test_db.query(ResponseRecord).all()}
+    assert [records[i].choice_index for i in range(1, 8)] == [0, 1, 2, 0, 1, None, None]
+    assert [records[i].generated_text for i in range(1, 6)] == [
+        "choice 0",
+        "choice 1",
+        "choice 2",
+        "choice 0",
+        "choice 1",
+    ]
+    assert records[2].generation_ms == 11.0
+
+    # Deltas of every choice are relayed to the run it belongs to
+    deltas = [
+        data
+        for _, event_type, data in (
+            c.args for c in orchestrator.event_bus.publish.call_args_list
+        )
+        if event_type == "delta"
+    ]
+    assert {"run_id": 3, "delta": "choice 2"} in deltas
+    assert {"run_id": 5, "delta": "choice 1"} in deltas
+
+
+def test_batch_mode_ingests_and_scores_in_bulk(tmp_path, test_db):
+    runs = [
+        ExperimentRun(id=i, temperature=t, top_p=1.0, max_output_tokens=50)
+        for i, t in [(1, 0.2), (2, 0.4), (3, 1.5)]
+    ]
+    experiment = Experiment(
+        id=1,
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        runs=runs,
+        status=ExperimentStatus.PENDING,
+        execution_mode=ExecutionMode.BATCH,
+    )
+    test_db.add(experiment)
+    test_db.commit()
+
+    def respond(body):
+        if body["temperature"] > 1:
+            raise ValueError("temperature too high")
+        return f"Answer at {body['temperature']}."
+
+    orchestrator = ExperimentOrchestrator(experiment, test_db)
+    orchestrator.batch_provider = LocalBatchProvider(str(tmp_path), respond=respond)
+    orchestrator.runner.generate = MagicMock()
+    orchestrator.runner.score_many = MagicMock(
+        side_effect=lambda prompt, texts: [{"overall": 0.5} for _ in texts]
+    )
+
+    result_experiment = orchestrator.run_experiment()
+
+    assert result_experiment.status == ExperimentStatus.FAILED
+    assert result_experiment.batch_id is None
+    orchestrator.runner.generate.assert_not_called()
+    # Both generated responses are scored in one call
+    orchestrator.runner.score_many.assert_called_once_with(
+        "Hello world", ["Answer at 0.2.", "Answer at 0.4."]
+    )
+
+    records = test_db.query(ResponseRecord).order_by(ResponseRecord.id).all()
+    assert [r.status for r in records] == [
+        ResponseStatus.COMPLETED,
+        ResponseStatus.COMPLETED,
+        ResponseStatus.FAILED,
+    ]
+    assert records[0].generated_text == "Answer at 0.2."
+    assert records[0].metrics == {"overall": 0.5}
+    assert records[0].total_sentences == 1
+    assert records[0].total_words == 4
+    assert records[0].timings["tokenization_ms"] >= 0
+    # The local provider reports words as tokens
+    assert (records[0].prompt_tokens, records[0].completion_tokens) == (2, 3)
+    assert records[2].error_message == "temperature too high"
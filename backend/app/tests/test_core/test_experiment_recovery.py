@@ -0,0 +1,123 @@
+import os
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.enums import ExperimentStatus, ResponseStatus
+from app.services.core.experiment_recovery import (
+    has_live_leases,
+    lease_owner,
+    reclaim_stale_runs,
+    reset_unfinished_runs,
+)
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+LONG_AGO = NOW - timedelta(hours=1)
+
+
+@pytest.fixture
+def create_running(create_experiment):
+    """Factory of RUNNING experiments with one run per (status, lease) pair"""
+
+    def create(leases, updated_at=LONG_AGO, lease_owner=None):
+        responses = [
+            {
+                "status": status,
+                "lease_expires_at": lease_expires_at,
+                "lease_owner": lease_owner,
+                "error_message": "boom",
+            }
+            for status, lease_expires_at in leases
+        ]
+        return create_experiment(
+            responses, status=ExperimentStatus.RUNNING, updated_at=updated_at
+        )
+
+    return create
+
+
+def test_reclaim_stale_runs(test_db, create_running):
+    crashed = create_running(
+        [
+            (ResponseStatus.COMPLETED, None),
+            (ResponseStatus.RUNNING, NOW - timedelta(seconds=1)),
+            # Started before leases were recorded
+            (ResponseStatus.RUNNING, None),
+        ],
+    )
+    alive = create_running([(ResponseStatus.RUNNING, NOW + timedelta(seconds=30))])
+    just_started = create_running([], updated_at=NOW)
+
+    assert reclaim_stale_runs(test_db, now=NOW) == [crashed.id]
+
+    test_db.expire_all()
+    assert crashed.status == ExperimentStatus.PARTIAL
+    assert [run.response.status for run in crashed.runs] == [
+        ResponseStatus.COMPLETED,
+        ResponseStatus.PENDING,
+        ResponseStatus.PENDING,
+    ]
+    assert alive.status == ExperimentStatus.RUNNING
+    assert alive.runs[0].response.status == ResponseStatus.RUNNING
+    assert just_started.status == ExperimentStatus.RUNNING
+
+
+def test_reclaim_runs_of_exited_processes_before_their_leases_expire(
+    test_db, create_running
+):
+    host = socket.gethostname()
+    unexpired = [(ResponseStatus.RUNNING, NOW + timedelta(seconds=30))]
+
+    def create(owner):
+        return create_running(unexpired, updated_at=NOW, lease_owner=owner)
+
+    # Same pid as this process, e.g. pid 1 of a restarted container
+    restarted = create(f"{host}:{os.getpid()}:previous")
+    current = create(lease_owner())
+    # Another worker still running on this host
+    worker = create(f"{host}:{os.getppid()}:worker")
+    remote = create("elsewhere:1:remote")
+
+    assert reclaim_stale_runs(test_db, now=NOW) == [restarted.id]
+
+    test_db.expire_all()
+    assert restarted.status == ExperimentStatus.PARTIAL
+    assert restarted.runs[0].response.status == ResponseStatus.PENDING
+    for experiment in (current, worker, remote):
+        assert experiment.status == ExperimentStatus.RUNNING
+        assert experiment.runs[0].response.status == ResponseStatus.RUNNING
+
+
+def test_has_live_leases(test_db, create_running):
+    experiment = create_running([(ResponseStatus.RUNNING, NOW + timedelta(seconds=30))])
+
+    assert has_live_leases(test_db, experiment.id, now=NOW)
+    assert not has_live_leases(test_db, experiment.id, now=NOW + timedelta(minutes=1))
+
+
+def test_reset_unfinished_runs(test_db, create_running):
+    experiment = create_running(
+        [
+            (ResponseStatus.COMPLETED, None),
+            (ResponseStatus.FAILED, None),
+            (ResponseStatus.RUNNING, LONG_AGO),
+            (ResponseStatus.PENDING, None),
+        ],
+    )
+    other = create_running([(ResponseStatus.FAILED, None)])
+
+    assert reset_unfinished_runs(test_db, experiment.id) == 2
+    test_db.commit()
+
+    test_db.expire_all()
+    responses = [run.response for run in experiment.runs]
+    assert [r.status for r in responses] == [
+        ResponseStatus.COMPLETED,
+        ResponseStatus.PENDING,
+        ResponseStatus.PENDING,
+        ResponseStatus.PENDING,
+    ]
+    assert responses[1].error_message is None
+    assert responses[2].lease_expires_at is None
+    assert other.runs[0].response.status == ResponseStatus.FAILED
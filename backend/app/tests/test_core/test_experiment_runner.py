@@ -4,11 +4,13 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from app.services.core.experiment_runner import ExperimentRunner
+from app.services.core.generation_cache import GenerationCache
 from app.services.llm.constants import (
     DEFAULT_MAX_TOKENS,
     DEFAULT_TEMPERATURE,
     DEFAULT_TOP_P,
 )
+from app.services.token_usage import add_usage
 
 
 def test_experiment_runner_run():
@@ -37,5 +39,134 @@ def test_experiment_runner_run():
                 temperature=DEFAULT_TEMPERATURE,
                 top_p=DEFAULT_TOP_P,
                 max_tokens=DEFAULT_MAX_TOKENS,
+                seed=None,
+                cancel_event=None,
             )
-            mock_metric_instance.compute.assert_called_once_with("mocked response")
+            mock_metric_instance.compute.assert_called_once_with(
+                "mocked response", user_prompt
+            )
+
+
+def test_experiment_runner_streaming_run():
+    with patch("app.services.core.experiment_runner.OpenAIResponder") as MockResponder:
+        mock_responder_instance = MockResponder.return_value
+        mock_responder_instance.run_streaming.return_value = {
+            "content": "streamed response",
+            "ttft_ms": 12.0,
+            "generation_ms": 80.0,
+            "tokens_per_second": 50.0,
+        }
+
+        with patch("app.services.core.experiment_runner.OverallMetric") as MockMetric:
+            MockMetric.return_value.compute.return_value = {"overall": 0.5}
+            on_delta = MagicMock()
+
+            runner = ExperimentRunner(stream=True)
+            result = runner.run("Hello, LLM!", on_delta=on_delta)
+
+            assert result["llm_response"] == "streamed response"
+            assert result["generation"] == {
+                "ttft_ms": 12.0,
+                "generation_ms": 80.0,
+                "tokens_per_second": 50.0,
+            }
+            mock_responder_instance.run.assert_not_called()
+            assert (
+                mock_responder_instance.run_streaming.call_args.kwargs["on_delta"]
+                is on_delta
+            )
+
+
+def test_experiment_runner_uses_generation_cache(tmp_path):
+    cache = GenerationCache(path=str(tmp_path / "generations.db"))
+
+    with patch("app.services.core.experiment_runner.OpenAIResponder") as MockResponder:
+        mock_responder_instance = MockResponder.return_value
+        mock_responder_instance.run.return_value = "cached response"
+
+        with patch("app.services.core.experiment_runner.OverallMetric") as MockMetric:
+            MockMetric.return_value.compute.return_value = {"overall": 0.5}
+
+            runner = ExperimentRunner(cache=cache)
+            first = runner.run("Hello, LLM!", temperature=0.7, seed=42)
+            second = runner.run("Hello, LLM!", temperature=0.7, seed=42)
+            other_seed = runner.run("Hello, LLM!", temperature=0.7, seed=43)
+            unseeded = runner.run("Hello, LLM!", temperature=0.7)
+
+    assert first["cache_hit"] is False
+    assert second["cache_hit"] is True
+    assert second["llm_response"] == "cached response"
+    assert second["metrics"] == {"overall": 0.5}
+    assert other_seed["cache_hit"] is False
+    # Unseeded sampling is never served from the cache
+    assert unseeded["cache_hit"] is None
+    assert mock_responder_instance.run.call_count == 3
+    assert mock_responder_instance.run.call_args_list[0].kwargs["seed"] == 42
+    cache.close()
+
+
+def test_experiment_runner_generate_then_score(tmp_path):
+    cache = GenerationCache(path=str(tmp_path / "generations.db"))
+
+    with patch("app.services.core.experiment_runner.OpenAIResponder") as MockResponder:
+        MockResponder.return_value.run.return_value = "generated"
+
+        with patch("app.services.core.experiment_runner.OverallMetric") as MockMetric:
+            MockMetric.return_value.compute.return_value = {"overall": 0.5}
+
+            runner = ExperimentRunner(cache=cache)
+            generated = runner.generate("Hello, LLM!", temperature=0)
+            assert "metrics" not in generated
+            MockMetric.return_value.compute.assert_not_called()
+
+            scored = runner.score("Hello, LLM!", generated)
+            cached = runner.generate("Hello, LLM!", temperature=0)
+
+    assert scored["metrics"] == {"overall": 0.5}
+    assert "cache_key" not in scored
+    assert set(scored["timings"]) == {"generation_ms", "scoring_ms"}
+    # Stored in the cache once scored
+    assert cached["cache_hit"] is True
+    assert cached["metrics"] == {"overall": 0.5}
+    assert runner.score("Hello, LLM!", cached) is cached
+    cache.close()
+
+
+def test_experiment_runner_generate_choices(tmp_path):
+    with patch("app.services.core.experiment_runner.OpenAIResponder") as MockResponder:
+        mock_responder_instance = MockResponder.return_value
+
+        def run_streaming_choices(*args, **kwargs):
+            add_usage(prompt_tokens=9, completion_tokens=11)
+            return [
+                {"content": "first", "ttft_ms": 5.0, "generation_ms": 50.0},
+                {"content": "second", "ttft_ms": 6.0, "generation_ms": 40.0},
+            ]
+
+        mock_responder_instance.run_streaming_choices.side_effect = (
+            run_streaming_choices
+        )
+
+        with patch("app.services.core.experiment_runner.OverallMetric"):
+            runner = ExperimentRunner(
+                stream=True, cache=GenerationCache(str(tmp_path / "cache.db"))
+            )
+            results = runner.generate_choices("Hello, LLM!", 2, temperature=0.7)
+
+            assert [r["llm_response"] for r in results] == ["first", "second"]
+            assert [r["choice_index"] for r in results] == [0, 1]
+            assert results[1]["generation"] == {"ttft_ms": 6.0, "generation_ms": 40.0}
+            assert results[1]["timings"] == {"generation_ms": 40.0}
+            # Prompt tokens are split evenly, completion tokens by length
+            assert [r["usage"] for r in results] == [
+                {"prompt_tokens": 5, "completion_tokens": 5},
+                {"prompt_tokens": 4, "completion_tokens": 6},
+            ]
+            assert mock_responder_instance.run_streaming_choices.call_args.args == (
+                "Hello, LLM!",
+                2,
+            )
+            # Only seeded runs and runs at temperature 0 use the cache
+            assert not runner.uses_cache(0.7)
+            assert runner.uses_cache(0.7, seed=1)
+            assert runner.uses_cache(0)
@@ -0,0 +1,67 @@
+import pytest
+
+from app.services.core.generation_cache import GenerationCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "generations.db")
+
+
+def test_put_and_get_persist(cache_path):
+    cache = GenerationCache(path=cache_path)
+    key = cache.make_key("gpt-4.1-nano", "Hello", 0.0, 1.0, 100, None)
+
+    assert cache.get(key) is None
+    cache.put(key, {"llm_response": "Hi", "metrics": {"overall": 0.5}})
+    cache.close()
+
+    reopened = GenerationCache(path=cache_path)
+    assert reopened.get(key) == {"llm_response": "Hi", "metrics": {"overall": 0.5}}
+    reopened.close()
+
+
+def test_key_covers_every_parameter():
+    base = ("gpt-4.1-nano", "Hello", 0.0, 1.0, 100, 7)
+    keys = {GenerationCache.make_key(*base)}
+    for i, other in enumerate(["gpt-4.1-mini", "Bye", 0.5, 0.9, 50, 8]):
+        parameters = list(base)
+        parameters[i] = other
+        keys.add(GenerationCache.make_key(*parameters))
+    assert len(keys) == 7
+
+
+def test_least_recently_used_entries_are_evicted(cache_path):
+    value = {"llm_response": "x" * 100}
+    entry_size = len('{"llm_response": "' + "x" * 100 + '"}')
+    # Room for two entries, and for two after evicting down to 90%
+    cache = GenerationCache(path=cache_path, max_bytes=entry_size * 5 // 2)
+
+    cache.put("a", value)
+    cache.put("b", value)
+    # Touch "a" so that "b" is the least recently used entry
+    assert cache.get("a") == value
+    cache.put("c", value)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+
+    cache.clear()
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_puts_below_the_limit_do_not_scan_the_table(cache_path):
+    value = {"llm_response": "x" * 100}
+    cache = GenerationCache(path=cache_path, max_bytes=10_000)
+    cache.put("a", value)
+    statements = []
+    cache._connection.set_trace_callback(statements.append)
+
+    cache.put("b", value)
+    cache.put("a", {"llm_response": "y"})
+
+    assert not [s for s in statements if "SUM(size)" in s]
+    assert cache._total_bytes == cache._stored_bytes(cache._connection)
+    cache.close()
@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import event
+
+from app.db.enums import ExperimentStatus, ResponseStatus
+from app.db.models.experiment_models import Experiment, ExperimentRun, ResponseRecord
+from app.services.core.response_writer import ResponseWriter
+from app.services.llm.constants import DEFAULT_OPENAI_MODEL_NAME
+
+
+@pytest.fixture
+def run_ids(test_db):
+    experiment = Experiment(
+        user_prompt="Hello world",
+        model_name=DEFAULT_OPENAI_MODEL_NAME,
+        status=ExperimentStatus.RUNNING,
+        runs=[
+            ExperimentRun(temperature=0.5, top_p=1.0, max_output_tokens=50)
+            for _ in range(3)
+        ],
+    )
+    test_db.add(experiment)
+    test_db.commit()
+    return [run.id for run in experiment.runs]
+
+
+@pytest.fixture
+def commits(test_db):
+    commits = []
+    event.listen(test_db, "after_commit", lambda session: commits.append(1))
+    return commits
+
+
+def test_create_pending(test_db, run_ids, commits):
+    writer = ResponseWriter(test_db)
+
+    response_ids = writer.create_pending(run_ids)
+
+    assert len(commits) == 1
+    assert sorted(response_ids) == run_ids
+    for run_id, response_id in response_ids.items():
+        record = test_db.get(ResponseRecord, response_id)
+        assert record.experiment_run_id == run_id
+        assert record.status == ResponseStatus.PENDING
+
+    assert writer.create_pending([]) == {}
+
+
+def test_updates_are_merged_and_written_in_one_transaction(test_db, run_ids, commits):
+    writer = ResponseWriter(test_db, batch_size=10, flush_interval=60)
+    response_ids = writer.create_pending(run_ids)
+    commits.clear()
+
+    for response_id in response_ids.values():
+        writer.update(response_id, status=ResponseStatus.RUNNING)
+    writer.update(
+        response_ids[run_ids[0]], status=ResponseStatus.COMPLETED, generated_text="ok"
+    )
+    writer.update(
+        response_ids[run_ids[1]], status=ResponseStatus.FAILED, error_message="boom"
+    )
+    writer.flush_if_due()
+    assert commits == []
+
+    writer.flush()
+    assert len(commits) == 1
+
+    records = {r.experiment_run_id: r for r in test_db.query(ResponseRecord).all()}
+    assert records[run_ids[0]].status == ResponseStatus.COMPLETED
+    assert records[run_ids[0]].generated_text == "ok"
+    assert records[run_ids[1]].status == ResponseStatus.FAILED
+    assert records[run_ids[1]].error_message == "boom"
+    assert records[run_ids[2]].status == ResponseStatus.RUNNING
+
+    writer.flush()
+    assert len(commits) == 1
+
+
+def test_flush_thresholds(test_db, run_ids, commits):
+    writer = ResponseWriter(test_db, batch_size=2, flush_interval=0)
+    response_ids = list(writer.create_pending(run_ids).values())
+    commits.clear()
+
+    writer.update(response_ids[0], status=ResponseStatus.RUNNING)
+    writer.update(response_ids[1], status=ResponseStatus.RUNNING)
+    # Batch size reached
+    assert len(commits) == 1
+
+    writer.update(response_ids[2], status=ResponseStatus.RUNNING)
+    assert len(commits) == 1
+    # Flush interval elapsed
+    writer.flush_if_due()
+    assert len(commits) == 2
+    assert {r.status for r in test_db.query(ResponseRecord).all()} == {
+        ResponseStatus.RUNNING
+    }
+
+
+def test_added_amounts_accumulate_across_flushes(test_db, run_ids, commits):
+    writer = ResponseWriter(test_db, batch_size=10, flush_interval=60)
+    response_ids = list(writer.create_pending(run_ids).values())
+    commits.clear()
+
+    writer.add(response_ids[0], prompt_tokens=10, completion_tokens=5)
+    writer.add(response_ids[0], prompt_tokens=10, cached_tokens=None)
+    writer.add(response_ids[1], embedding_tokens=3)
+    writer.add(response_ids[2])
+    writer.update(response_ids[0], status=ResponseStatus.FAILED)
+    writer.flush()
+    writer.add(response_ids[0], prompt_tokens=10, embedding_tokens=2)
+    writer.flush()
+
+    assert len(commits) == 2
+    records = {r.id: r for r in test_db.query(ResponseRecord).all()}
+    first, second, third = (records[response_id] for response_id in response_ids)
+    assert (first.prompt_tokens, first.completion_tokens) == (30, 5)
+    assert (first.cached_tokens, first.embedding_tokens) == (None, 2)
+    assert first.status == ResponseStatus.FAILED
+    assert second.embedding_tokens == 3
+    assert third.prompt_tokens is None
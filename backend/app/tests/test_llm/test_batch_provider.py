@@ -0,0 +1,93 @@
+import json
+
+from ...services.llm.batch_provider import (
+    BatchRequest,
+    LocalBatchProvider,
+    batch_input_lines,
+    parse_batch_output_line,
+)
+
+
+def test_batch_input_lines():
+    lines = list(
+        batch_input_lines(
+            "gpt-4.1-nano",
+            [
+                BatchRequest("1", "Hello", temperature=0.5, top_p=1.0, max_tokens=50),
+                BatchRequest("2", "Hello", 0.5, 1.0, 50, seed=7),
+            ],
+        )
+    )
+
+    first, second = [json.loads(line) for line in lines]
+    assert first["custom_id"] == "1"
+    assert first["url"] == "/v1/chat/completions"
+    assert first["body"]["messages"] == [{"role": "user", "content": "Hello"}]
+    assert first["body"]["max_tokens"] == 50
+    assert "seed" not in first["body"]
+    assert second["body"]["seed"] == 7
+
+
+def test_parse_batch_output_line():
+    ok = parse_batch_output_line(
+        {
+            "custom_id": "1",
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "choices": [{"message": {"content": "hi"}}],
+                    "usage": {
+                        "prompt_tokens": 12,
+                        "completion_tokens": 1,
+                        "prompt_tokens_details": {"cached_tokens": 8},
+                    },
+                },
+            },
+            "error": None,
+        }
+    )
+    assert (ok.content, ok.error) == ("hi", None)
+    assert ok.usage == {"prompt_tokens": 12, "completion_tokens": 1, "cached_tokens": 8}
+
+    rejected = parse_batch_output_line(
+        {
+            "custom_id": "2",
+            "response": {
+                "status_code": 400,
+                "body": {"error": {"message": "bad request"}},
+            },
+            "error": None,
+        }
+    )
+    assert rejected.error == "HTTP 400: bad request"
+
+    expired = parse_batch_output_line(
+        {"custom_id": "3", "response": None, "error": {"message": "expired"}}
+    )
+    assert expired.error == "expired"
+
+
+def test_local_batch_provider(tmp_path):
+    def respond(body):
+        if body["temperature"] > 1:
+            raise ValueError("temperature too high")
+        return f"answer at {body['temperature']}"
+
+    provider = LocalBatchProvider(str(tmp_path), respond=respond)
+    batch_id = provider.submit(
+        "gpt-4.1-nano",
+        [
+            BatchRequest("1", "Hello", 0.5, 1.0, 50),
+            BatchRequest("2", "Hello", 1.5, 1.0, 50),
+        ],
+    )
+
+    assert provider.status(batch_id) == "completed"
+    results = {r.custom_id: r for r in provider.results(batch_id)}
+    assert results["1"].content == "answer at 0.5"
+    assert results["2"].error == "temperature too high"
+
+    cancelled = provider.submit("gpt-4.1-nano", [BatchRequest("1", "Hi", 0, 1, 5)])
+    provider.cancel(cancelled)
+    assert provider.status(cancelled) == "cancelled"
+    assert list(provider.results(cancelled)) == []
@@ -0,0 +1,71 @@
+from ...services.embedding.openai_embedding import OpenAIEmbeddingProvider
+from ...services.llm import client_registry
+from ...services.llm.client_registry import OpenAIClientRegistry, openai_clients
+from ...services.llm.openai_responder import OpenAIResponder
+
+
+def test_clients_share_one_pooled_http_client():
+    registry = OpenAIClientRegistry(max_connections=5, keepalive_expiry=10)
+
+    scheduled = registry.client(max_retries=0)
+    retrying = registry.client()
+
+    assert registry.client(max_retries=0) is scheduled
+    assert retrying is not scheduled
+    assert scheduled._client is registry.http_client()
+    assert retrying._client is registry.http_client()
+    assert registry.limits.max_connections == 5
+    assert registry.limits.keepalive_expiry == 10
+
+
+def test_base_url_is_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9999/v1")
+    registry = OpenAIClientRegistry()
+
+    assert str(registry.client().base_url) == "http://127.0.0.1:9999/v1/"
+
+
+def test_http2_requires_h2(monkeypatch):
+    monkeypatch.setattr(client_registry, "_h2_installed", lambda: False)
+    assert OpenAIClientRegistry(http2=True).http2 is False
+
+    monkeypatch.setattr(client_registry, "_h2_installed", lambda: True)
+    assert OpenAIClientRegistry(http2=True).http2 is True
+    assert OpenAIClientRegistry(http2=False).http2 is False
+
+
+def test_close_and_configure_start_a_new_pool():
+    registry = OpenAIClientRegistry()
+    http_client = registry.http_client()
+    client = registry.client()
+
+    registry.close()
+    assert http_client.is_closed
+    assert registry.client() is not client
+
+    pooled = registry.http_client()
+    registry.configure(max_connections=1)
+    assert pooled.is_closed
+    assert registry.http_client() is not pooled
+
+
+def test_responders_and_embedding_providers_share_connections():
+    responders = [OpenAIResponder(), OpenAIResponder()]
+    provider = OpenAIEmbeddingProvider()
+
+    assert responders[0].client is responders[1].client
+    assert provider.client._client is openai_clients.http_client()
+    assert responders[0].client._client is openai_clients.http_client()
+
+
+def test_responders_and_embedding_providers_survive_configure():
+    responder = OpenAIResponder()
+    provider = OpenAIEmbeddingProvider()
+    pooled = responder.client
+
+    openai_clients.configure()
+
+    assert pooled._client.is_closed
+    for client in (responder.client, provider.client):
+        assert not client._client.is_closed
+        assert client._client is openai_clients.http_client()
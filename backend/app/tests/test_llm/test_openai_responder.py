@@ -1,6 +1,10 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
 import pytest
 
 from ...services.llm.openai_responder import OpenAIResponder
+from ...services.token_usage import record_usage
 
 
 @pytest.mark.skip(reason="Tested it once, no need to run it every time.")
@@ -18,3 +22,116 @@ def test_raise_model_not_allowed_error():
     with pytest.raises(Exception) as excinfo:
         OpenAIResponder(model="invalid-model")
     assert "is not allowed" in str(excinfo.value)
+
+
+def _chunk(content=None, usage=None, index=0, finish_reason=None):
+    choices = (
+        []
+        if content is None
+        else [
+            SimpleNamespace(
+                index=index,
+                delta=SimpleNamespace(content=content),
+                finish_reason=finish_reason,
+            )
+        ]
+    )
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def test_run_streaming_relays_deltas_and_measures_timings(monkeypatch):
+    responder = OpenAIResponder()
+    monkeypatch.setattr(OpenAIResponder, "client", MagicMock())
+    responder.client.chat.completions.create.return_value = iter(
+        [
+            _chunk(""),
+            _chunk("Hello"),
+            _chunk(" there"),
+            _chunk(usage=SimpleNamespace(completion_tokens=2)),
+        ]
+    )
+    deltas = []
+
+    result = responder.run_streaming("Hi", max_tokens=5, on_delta=deltas.append)
+
+    assert deltas == ["Hello", " there"]
+    assert result["content"] == "Hello there"
+    assert 0 <= result["ttft_ms"] <= result["generation_ms"]
+    kwargs = responder.client.chat.completions.create.call_args.kwargs
+    assert kwargs["stream"] is True
+    assert kwargs["max_tokens"] == 5
+    assert "n" not in kwargs
+
+
+def test_run_choices_sends_one_request_for_all_choices(monkeypatch):
+    responder = OpenAIResponder()
+    monkeypatch.setattr(OpenAIResponder, "client", MagicMock())
+    responder.client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[
+            SimpleNamespace(index=1, message=SimpleNamespace(content="second")),
+            SimpleNamespace(index=0, message=SimpleNamespace(content="first")),
+        ]
+    )
+
+    contents = responder.run_choices("Hi", 2, max_tokens=5)
+
+    assert contents == ["first", "second"]
+    responder.client.chat.completions.create.assert_called_once()
+    assert responder.client.chat.completions.create.call_args.kwargs["n"] == 2
+
+
+def test_run_streaming_choices_splits_deltas_by_choice(monkeypatch):
+    responder = OpenAIResponder()
+    monkeypatch.setattr(OpenAIResponder, "client", MagicMock())
+    responder.client.chat.completions.create.return_value = iter(
+        [
+            _chunk("Hello", index=0),
+            _chunk("Bye", index=1, finish_reason="stop"),
+            _chunk(" there", index=0, finish_reason="stop"),
+            _chunk(usage=SimpleNamespace(completion_tokens=3)),
+        ]
+    )
+    deltas = []
+
+    results = responder.run_streaming_choices(
+        "Hi",
+        2,
+        max_tokens=5,
+        on_delta=lambda index, delta: deltas.append((index, delta)),
+    )
+
+    assert deltas == [(0, "Hello"), (1, "Bye"), (0, " there")]
+    assert [r["content"] for r in results] == ["Hello there", "Bye"]
+    assert results[1]["generation_ms"] <= results[0]["generation_ms"]
+    assert responder.client.chat.completions.create.call_args.kwargs["n"] == 2
+
+
+def test_usage_is_recorded_and_settles_the_rate_limit(monkeypatch):
+    responder = OpenAIResponder()
+    monkeypatch.setattr(OpenAIResponder, "client", MagicMock())
+    responder.scheduler = MagicMock()
+    responder.scheduler.call.side_effect = lambda model, request, **kwargs: request()
+    responder.client.chat.completions.create.return_value = iter(
+        [
+            _chunk("Hello", finish_reason="stop"),
+            _chunk(
+                usage=SimpleNamespace(
+                    prompt_tokens=12,
+                    completion_tokens=1,
+                    total_tokens=13,
+                    prompt_tokens_details=SimpleNamespace(cached_tokens=8),
+                )
+            ),
+        ]
+    )
+
+    with record_usage() as recorder:
+        responder.run_streaming("Hi", max_tokens=5)
+
+    assert recorder.tokens == {
+        "prompt_tokens": 12,
+        "completion_tokens": 1,
+        "cached_tokens": 8,
+    }
+    charged = responder.scheduler.call.call_args.kwargs["tokens"]
+    responder.scheduler.settle.assert_called_once_with(responder.model, charged, 13)
@@ -0,0 +1,191 @@
+import threading
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+
+from ...services.llm.exceptions import RequestCancelled
+from ...services.llm.rate_limiter import (
+    RateLimiter,
+    RequestScheduler,
+    TokenBucket,
+    estimate_tokens,
+    retry_after_seconds,
+)
+
+
+class FakeClock:
+    """Clock that only moves when the code under test sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _api_error(error_class, status_code, headers=None, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    body = {"code": code} if code else None
+    return error_class("error", response=response, body=body)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("a" * 400, max_tokens=100) == 201
+    assert estimate_tokens("") == 1
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(_api_error(RateLimitError, 429)) is None
+    assert retry_after_seconds(
+        _api_error(RateLimitError, 429, {"retry-after": "3"})
+    ) == pytest.approx(3)
+    assert retry_after_seconds(
+        _api_error(RateLimitError, 429, {"retry-after-ms": "250", "retry-after": "1"})
+    ) == pytest.approx(0.25)
+    assert retry_after_seconds(Exception("no response")) is None
+
+
+def test_token_bucket_goes_into_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_second=10, capacity=20, clock=clock)
+
+    assert bucket.reserve(20) == 0
+    assert bucket.reserve(5) == pytest.approx(0.5)
+    assert bucket.reserve(5) == pytest.approx(1.0)
+
+    clock.now = 1.0
+    assert bucket.reserve(1) == pytest.approx(0.1)
+    # Larger than the bucket: waits until the rest is refilled
+    clock.now = 100.0
+    assert bucket.reserve(50) == pytest.approx(3)
+
+
+def test_rate_limiter_sustains_quota():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        rpm=120,
+        tpm=60_000,
+        headroom=1.0,
+        burst_seconds=1,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+    for _ in range(120):
+        limiter.acquire(tokens=10)
+    # Two requests per second after the initial burst of two
+    assert clock.now == pytest.approx(59)
+
+    clock.now = 1000.0
+    for _ in range(10):
+        limiter.acquire(tokens=10_000)
+    # Token bound: 1,000 tokens per second after the initial burst
+    assert clock.now == pytest.approx(1000.0 + 99)
+
+
+def test_cancelled_wait_releases_reservation():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        rpm=60,
+        tpm=60_000,
+        headroom=1.0,
+        burst_seconds=1,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    limiter.acquire(tokens=10)
+    with pytest.raises(RequestCancelled):
+        limiter.acquire(tokens=10, cancel_event=cancel_event)
+    # The next request waits as if the cancelled one had never queued
+    assert limiter.reserve(10) == pytest.approx(1)
+
+
+def test_settle_replaces_estimate_with_usage():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        rpm=60_000,
+        tpm=60_000,
+        headroom=1.0,
+        burst_seconds=1,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+    limiter.acquire(tokens=1000)
+    # Only 200 of the 1000 estimated tokens were used
+    limiter.settle(charged=1000, used=200)
+    assert limiter.reserve(800) == 0
+    # Usage beyond the estimate is taken from the bucket
+    limiter.settle(charged=0, used=500)
+    assert limiter.reserve(0) == pytest.approx(0.5)
+
+
+def test_scheduler_does_not_send_cancelled_requests():
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep)
+    cancel_event = threading.Event()
+    cancel_event.set()
+    request = MagicMock(return_value="ok")
+
+    with pytest.raises(RequestCancelled):
+        scheduler.call("gpt-4.1-nano", request, tokens=100, cancel_event=cancel_event)
+    request.assert_not_called()
+
+
+def test_scheduler_retries_rate_limited_requests():
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep)
+    request = MagicMock(
+        side_effect=[
+            _api_error(RateLimitError, 429, {"retry-after": "2"}),
+            _api_error(RateLimitError, 429),
+            "ok",
+        ]
+    )
+
+    assert scheduler.call("gpt-4.1-nano", request, tokens=100) == "ok"
+    assert request.call_count == 3
+    # The first retry waits at least as long as the server asked for
+    assert clock.sleeps[0] >= 2
+
+
+def test_scheduler_gives_up():
+    clock = FakeClock()
+    scheduler = RequestScheduler(max_retries=2, clock=clock, sleep=clock.sleep)
+
+    request = MagicMock(side_effect=_api_error(RateLimitError, 429))
+    with pytest.raises(RateLimitError):
+        scheduler.call("gpt-4.1-nano", request, tokens=100)
+    assert request.call_count == 3
+
+    request = MagicMock(
+        side_effect=_api_error(RateLimitError, 429, code="insufficient_quota")
+    )
+    with pytest.raises(RateLimitError):
+        scheduler.call("gpt-4.1-nano", request, tokens=100)
+    assert request.call_count == 1
+
+    request = MagicMock(side_effect=_api_error(BadRequestError, 400))
+    with pytest.raises(BadRequestError):
+        scheduler.call("gpt-4.1-nano", request, tokens=100)
+    assert request.call_count == 1
+
+
+def test_scheduler_configure():
+    scheduler = RequestScheduler()
+    scheduler.configure("gpt-4.1-nano", rpm=60, tpm=1000)
+
+    limiter = scheduler.limiter("gpt-4.1-nano")
+    assert scheduler.limiter("gpt-4.1-nano") is limiter
+    assert limiter.requests.rate_per_second == pytest.approx(0.9)
@@ -1,3 +1,6 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
 import pytest
 
 from ...services.metrics.coherence_metric import CoherenceMetric
@@ -32,3 +35,18 @@ class TestCoherenceMetric:
         )
         score = metric.compute(response)
         assert 0.0 <= score <= 0.2  # expect low coherence
+
+
+@patch("app.services.metrics.coherence_metric.OpenAIEmbeddingProvider")
+def test_compute_many_embeds_in_one_call(mock_provider):
+    mock_provider.return_value.embed = MagicMock(
+        return_value=np.array([[1.0, 0.0], [1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+    )
+    metric = CoherenceMetric()
+
+    scores = metric.compute_many(["First. Second.", "", "Only one.", "Third. Fourth."])
+
+    mock_provider.return_value.embed.assert_called_once_with(
+        ["First.", "Second.", "Third.", "Fourth."]
+    )
+    assert scores == pytest.approx([1.0, 0.0, 1.0, 0.0])
@@ -7,6 +7,7 @@ from ...services.metrics.lexical_diversity_metric import LexicalDiversityMetric
 from ...services.metrics.overall_metric import OverallMetric
 from ...services.metrics.relevance_metric import RelevanceMetric
 from ...services.metrics.structural_metric import StructuralMetric
+from ...services.timings import record_timings
 
 
 def test_overall_metric_returns_dict():
@@ -35,3 +36,42 @@ def test_overall_metric_returns_dict():
         # Check the overall score is correct weighted average
         # Here all weights are 1, so average = (0.9 + 0.8 + 0.85 + 0.85)/4 = 0.85
         assert result["overall"] == pytest.approx(0.85)
+
+
+def test_overall_metric_records_timings():
+    with patch.object(CoherenceMetric, "compute", return_value=0.9), patch.object(
+        RelevanceMetric, "compute", return_value=0.85
+    ):
+        overall = OverallMetric()
+        with record_timings() as recorder:
+            overall.compute(
+                llm_response="First sentence. Second sentence.",
+                user_prompt="Sample prompt",
+            )
+
+    assert set(recorder.timings) == {
+        "coherence_ms",
+        "structure_ms",
+        "relevance_ms",
+        "lexical_diversity_ms",
+        "tokenization_ms",
+    }
+    assert all(ms >= 0 for ms in recorder.timings.values())
+
+
+def test_overall_metric_compute_many():
+    with patch.object(
+        CoherenceMetric, "compute_many", return_value=[0.9, 0.1]
+    ), patch.object(
+        StructuralMetric, "compute_many", return_value=[0.8, 0.1]
+    ), patch.object(
+        RelevanceMetric, "compute_many", return_value=[0.85, 0.1]
+    ), patch.object(
+        LexicalDiversityMetric, "compute_many", return_value=[0.85, 0.1]
+    ):
+        overall = OverallMetric()
+        results = overall.compute_many(["First", "Second"], user_prompt="Prompt")
+
+    assert results[0]["coherence"] == 0.9
+    assert results[0]["overall"] == pytest.approx(0.85)
+    assert results[1]["overall"] == pytest.approx(0.1)
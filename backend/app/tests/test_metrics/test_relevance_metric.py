@@ -1,3 +1,6 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
 import pytest
 
 from ...services.metrics.relevance_metric import RelevanceMetric
@@ -44,3 +47,18 @@ class TestRelevanceMetric:
         score = metric.compute(response, prompt)
         print(f"Empty prompt: {score*100:.2f}%")
         assert score == 0.0
+
+
+@patch("app.services.metrics.relevance_metric.OpenAIEmbeddingProvider")
+def test_compute_many_embeds_in_one_call(mock_provider):
+    mock_provider.return_value.embed = MagicMock(
+        return_value=np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+    )
+    metric = RelevanceMetric()
+
+    scores = metric.compute_many(["same", "", "orthogonal"], "prompt")
+
+    mock_provider.return_value.embed.assert_called_once_with(
+        ["prompt", "same", "orthogonal"]
+    )
+    assert scores == pytest.approx([1.0, 0.0, 0.5])
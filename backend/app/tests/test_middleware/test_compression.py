@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.middleware.compression import (
+    CompressionMiddleware,
+    negotiate_encoding,
+    parse_accept_encoding,
+)
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, identity;q=0, *;q=bad") == {
+        "gzip": 1.0,
+        "br": 0.5,
+        "identity": 0.0,
+        "*": 0.0,
+    }
+    assert parse_accept_encoding("") == {}
+
+
+def test_negotiate_encoding_prefers_brotli():
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.8") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("*") == "br"
+
+
+def test_negotiate_encoding_without_acceptable_coding():
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip;q=0") is None
+
+
+def test_negotiate_encoding_without_brotli():
+    with patch("app.middleware.compression.brotli", None):
+        assert negotiate_encoding("gzip, br") == "gzip"
+        assert negotiate_encoding("br") is None
+
+
+@pytest.fixture
+def client():
+    async def chunks():
+        for i in range(3):
+            yield f"chunk {i}\n" * 10
+
+    routes = [
+        Route("/small", lambda request: PlainTextResponse("small")),
+        Route("/large", lambda request: PlainTextResponse("x" * 2000)),
+        Route(
+            "/stream",
+            lambda request: StreamingResponse(chunks(), media_type="text/plain"),
+        ),
+        Route(
+            "/events",
+            lambda request: StreamingResponse(chunks(), media_type="text/event-stream"),
+        ),
+    ]
+    app = Starlette(routes=routes)
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_compresses_large_and_streamed_responses(client, encoding):
+    for path, body in [
+        ("/large", "x" * 2000),
+        ("/stream", "".join(f"chunk {i}\n" * 10 for i in range(3))),
+    ]:
+        response = client.get(path, headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert response.headers["vary"] == "Accept-Encoding"
+        # Decoded by the client
+        assert response.text == body
+
+
+def test_small_responses_and_event_streams_are_not_compressed(client):
+    for path in ["/small", "/events"]:
+        response = client.get(path, headers={"Accept-Encoding": "gzip, br"})
+        assert "content-encoding" not in response.headers
+
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "x" * 2000
@@ -0,0 +1,173 @@
+"""
+Bytes and milliseconds per request for the experiment detail and export
+endpoints of a 1,000-run experiment, for each response encoding, plus the
+cost of rendering the detail payload with the stdlib and orjson encoders.
+
+Run from the backend directory:
+
+    python -m benchmarks.api_encoding --runs 1000 --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.enums import ExperimentStatus, ResponseStatus
+from app.db.models.experiment_models import Experiment, ExperimentRun, ResponseRecord
+from app.db.queries.experiment_queries import get_experiment_with_runs
+from app.db.session import get_db
+from app.main import app
+from app.schemas.experiment_schemas import ExperimentDetailSchema
+from app.services.core.detail_cache import experiment_detail_cache
+
+PARAGRAPH = (
+    "Large language models sample each token from a distribution shaped by "
+    "temperature and top_p. Lower values make the output more focused, while "
+    "higher values make it more varied and occasionally less coherent. "
+)
+
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def seed_experiment(db, runs: int) -> int:
+    experiment = Experiment(
+        name="Encoding benchmark",
+        user_prompt="Explain how sampling parameters change model output.",
+        model_name="gpt-4o-mini",
+        total_runs=runs,
+        status=ExperimentStatus.COMPLETED,
+    )
+    db.add(experiment)
+    db.flush()
+
+    run_rows = [
+        ExperimentRun(
+            experiment_id=experiment.id,
+            temperature=round(0.1 * (i % 10), 1),
+            top_p=1.0,
+            max_output_tokens=500,
+        )
+        for i in range(runs)
+    ]
+    db.add_all(run_rows)
+    db.flush()
+
+    db.add_all(
+        [
+            ResponseRecord(
+                experiment_run_id=run.id,
+                generated_text=f"Answer {i}. " + PARAGRAPH * 12,
+                status=ResponseStatus.COMPLETED,
+                latency_ms=850.0 + i,
+                metrics={
+                    "coherence": 0.81,
+                    "structure": 0.74,
+                    "relevance": 0.9,
+                    "lexical_diversity": 0.55,
+                    "overall": 0.75,
+                },
+            )
+            for i, run in enumerate(run_rows)
+        ]
+    )
+    db.commit()
+    return experiment.id
+
+
+def measure(client, url: str, encoding: str, repeat: int, before=None):
+    timings = []
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        with client.stream("GET", url, headers={"Accept-Encoding": encoding}) as r:
+            assert r.status_code == 200, r.status_code
+            # Raw bytes as sent on the wire, before the client decodes them
+            size = sum(len(chunk) for chunk in r.iter_raw())
+        timings.append((time.perf_counter() - start) * 1000)
+    return size, statistics.median(timings)
+
+
+def measure_render(content, response_class, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = response_class(content).body
+        timings.append((time.perf_counter() - start) * 1000)
+    return len(body), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{tmp}/benchmark.db",
+            connect_args={"check_same_thread": False},
+        )
+        Base.metadata.create_all(engine)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        with SessionLocal() as db:
+            experiment_id = seed_experiment(db, args.runs)
+            experiment = get_experiment_with_runs(db, experiment_id)
+            content = jsonable_encoder(
+                ExperimentDetailSchema.model_validate(experiment)
+            )
+
+        def override_get_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        client = TestClient(app)
+
+        print(f"Experiment with {args.runs} runs, median of {args.repeat} requests\n")
+        print(f"{'render':<28}{'bytes':>12}{'ms':>10}")
+        for name, response_class in [
+            ("json (stdlib)", JSONResponse),
+            ("orjson", ORJSONResponse),
+        ]:
+            size, ms = measure_render(content, response_class, args.repeat)
+            print(f"{name:<28}{size:>12}{ms:>10.2f}")
+
+        base = f"/experiments/{experiment_id}"
+        endpoints = [
+            (
+                "detail (cold)",
+                f"{base}/",
+                lambda: experiment_detail_cache.invalidate(experiment_id),
+            ),
+            ("detail (cached)", f"{base}/", None),
+            ("export csv", f"{base}/export/csv/", None),
+            ("export ndjson", f"{base}/export/ndjson/", None),
+        ]
+        print(f"\n{'request':<28}{'bytes':>12}{'ms':>10}")
+        for name, url, before in endpoints:
+            for encoding in ENCODINGS:
+                size, ms = measure(client, url, encoding, args.repeat, before)
+                print(f"{name + ' ' + encoding:<28}{size:>12}{ms:>10.2f}")
+
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
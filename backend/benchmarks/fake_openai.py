@@ -0,0 +1,341 @@
+"""
+Local stand-in for the OpenAI chat completions and embeddings endpoints,
+with configurable latency, server errors and 429s, so load tests never
+call the real API or spend tokens.
+
+Run from the backend directory and point the app at it:
+
+    python -m benchmarks.fake_openai --port 8090 --latency-ms 400 --rate-limit-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 uvicorn app.main:app --port=8083
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import struct
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+WORDS = (
+    "model sample token prompt answer robot paint color light canvas brush "
+    "learn study pattern shape signal noise value layer output input detail "
+    "quiet bright slow careful simple gentle early later every other"
+).split()
+
+
+@dataclass
+class FakeOpenAIConfig:
+    # Time to the first token is lognormal around this median
+    latency_ms: float = 300.0
+    latency_sigma: float = 0.5
+    # Delay between streamed tokens, also added per token without streaming
+    token_ms: float = 2.0
+    # Mean completion length in tokens (words), capped at max_tokens
+    completion_tokens: int = 60
+    embedding_latency_ms: float = 40.0
+    embedding_dim: int = 64
+    # Share of requests answered with a 500 or a 429
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_ms: int = 200
+    seed: Optional[int] = None
+
+
+class FakeOpenAIStats:
+    """Requests served and failures injected, per kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: dict[str, int] = {}
+
+    def count(self, name: str):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> dict:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def _embedding(text: str, dim: int) -> list[float]:
+    # Deterministic per text, so identical inputs embed identically
+    rng = random.Random(hashlib.sha256(text.encode()).digest())
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeOpenAIServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.endswith("/chat/completions"):
+            kind = "chat"
+        elif self.path.endswith("/embeddings"):
+            kind = "embeddings"
+        else:
+            return self._send_error(404, "not_found", f"Unknown path {self.path}")
+
+        config = self.server.config
+        roll = self.server.random()
+        if roll < config.rate_limit_rate:
+            self.server.stats.count(f"{kind}_429")
+            return self._send_error(
+                429,
+                "rate_limit_exceeded",
+                "Rate limit reached",
+                {"retry-after-ms": str(config.retry_after_ms)},
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            self.server.stats.count(f"{kind}_500")
+            return self._send_error(500, "server_error", "Injected server error")
+
+        self.server.stats.count(kind)
+        if kind == "chat":
+            self._chat_completion(body)
+        else:
+            self._embeddings(body)
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, code: str, message: str, headers=None):
+        error = {"message": message, "type": code, "code": code, "param": None}
+        self._send_json(status, {"error": error}, headers)
+
+    def _chat_completion(self, body: dict):
+        config = self.server.config
+        prompt = " ".join(m["content"] for m in body["messages"])
+        prompt_tokens = len(prompt.split())
+        n = body.get("n", 1)
+        max_tokens = body.get("max_tokens") or config.completion_tokens
+        choices = [self.server.completion(max_tokens) for _ in range(n)]
+        completion_tokens = sum(len(words) for words in choices)
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": body["model"],
+        }
+
+        time.sleep(self.server.latency() / 1000)
+        if not body.get("stream"):
+            time.sleep(config.token_ms * max(map(len, choices)) / 1000)
+            return self._send_json(
+                200,
+                {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [
+                        {
+                            "index": index,
+                            "message": {
+                                "role": "assistant",
+                                "content": " ".join(words),
+                            },
+                            "finish_reason": "stop",
+                            "logprobs": None,
+                        }
+                        for index, words in enumerate(choices)
+                    ],
+                    "usage": _usage(prompt_tokens, completion_tokens),
+                },
+            )
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk = {**base, "object": "chat.completion.chunk"}
+        for position in range(max(map(len, choices))):
+            for index, words in enumerate(choices):
+                if position >= len(words):
+                    continue
+                last = position == len(words) - 1
+                text = words[position] if position == 0 else " " + words[position]
+                self._send_event(
+                    {
+                        **chunk,
+                        "choices": [
+                            {
+                                "index": index,
+                                "delta": {"content": text},
+                                "finish_reason": "stop" if last else None,
+                            }
+                        ],
+                    }
+                )
+            time.sleep(config.token_ms / 1000)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._send_event(
+                {
+                    **chunk,
+                    "choices": [],
+                    "usage": _usage(prompt_tokens, completion_tokens),
+                }
+            )
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_event(self, payload: dict):
+        self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _embeddings(self, body: dict):
+        config = self.server.config
+        inputs = body["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        tokens = sum(len(text.split()) for text in inputs)
+
+        data = []
+        for index, text in enumerate(inputs):
+            vector = _embedding(text, config.embedding_dim)
+            if body.get("encoding_format") == "base64":
+                packed = struct.pack(f"<{len(vector)}f", *vector)
+                vector = base64.b64encode(packed).decode()
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+
+        time.sleep(config.embedding_latency_ms / 1000)
+        self._send_json(
+            200,
+            {
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            },
+        )
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """
+    OpenAI-compatible server on a background thread. Use as a context
+    manager; base_url is what OPENAI_BASE_URL should be set to.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        config: FakeOpenAIConfig = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeOpenAIConfig()
+        self.stats = FakeOpenAIStats()
+        self._random = random.Random(self.config.seed)
+        self._random_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def random(self) -> float:
+        with self._random_lock:
+            return self._random.random()
+
+    def latency(self) -> float:
+        """Milliseconds to the first token of one request."""
+        with self._random_lock:
+            return self._random.lognormvariate(0, self.config.latency_sigma) * (
+                self.config.latency_ms
+            )
+
+    def completion(self, max_tokens: int) -> list[str]:
+        """Words of one completion, in sentences of about a dozen words."""
+        with self._random_lock:
+            length = max(
+                1, int(self._random.expovariate(1 / self.config.completion_tokens))
+            )
+            words = [self._random.choice(WORDS) for _ in range(min(length, max_tokens))]
+        for end in range(11, len(words), 12):
+            words[end] += "."
+        words[-1] = words[-1].rstrip(".") + "."
+        return words
+
+    def handle_error(self, request, client_address):
+        # Pooled client connections are reset when the app shuts down
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="fake-openai", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Command line flags for every FakeOpenAIConfig field."""
+    for name, value in asdict(FakeOpenAIConfig()).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=type(value) if value is not None else int,
+            default=value,
+        )
+
+
+def config_from_args(args: argparse.Namespace) -> FakeOpenAIConfig:
+    return FakeOpenAIConfig(
+        **{name: getattr(args, name) for name in asdict(FakeOpenAIConfig())}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(config_from_args(args), args.host, args.port)
+    print(f"Serving a fake OpenAI API at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
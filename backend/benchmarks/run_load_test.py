@@ -0,0 +1,282 @@
+"""
+End-to-end throughput of the experiments API and orchestrator against a
+local fake OpenAI server: experiments are created through POST /experiments/
+by concurrent clients and polled until they finish. Reports p50/p95/p99 of
+request, experiment and run latencies, runs per second and time spent in
+the database. Runs entirely offline.
+
+Run from the backend directory, saving a baseline and comparing against it:
+
+    python -m benchmarks.run_load_test --experiments 20 --concurrency 4 --output base.json
+    python -m benchmarks.run_load_test --experiments 20 --concurrency 4 --baseline base.json
+"""
+
+import argparse
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import uvicorn
+from sqlalchemy import create_engine, event, select
+
+from app.db import session
+from app.db.base import Base
+from app.db.enums import TERMINAL_EXPERIMENT_STATUSES, ResponseStatus
+from app.db.models.experiment_models import ExperimentRun, ResponseRecord
+from app.main import app
+from app.services.llm.constants import MODEL_RATE_LIMITS
+from app.services.llm.rate_limiter import request_scheduler
+
+from .fake_openai import FakeOpenAIServer, add_config_arguments, config_from_args
+
+TERMINAL_STATUSES = {status.value for status in TERMINAL_EXPERIMENT_STATUSES}
+
+PROMPT = "Write a short story about a robot learning to paint"
+
+
+class BackgroundServer(uvicorn.Server):
+    """The app served by uvicorn on a background thread."""
+
+    def install_signal_handlers(self):
+        pass
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.run, name="api", daemon=True)
+        self._thread.start()
+        while not self.started:
+            time.sleep(0.01)
+        host, port = self.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def __exit__(self, *exc_info):
+        self.should_exit = True
+        self._thread.join()
+
+
+class DatabaseTimer:
+    """Wall time and count of every SQL statement executed on an engine."""
+
+    def __init__(self, engine):
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.total_ms = 0.0
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started_at"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info.pop("query_started_at")) * 1000
+        with self._lock:
+            self.statements += 1
+            self.total_ms += elapsed_ms
+
+
+def percentile(values: list[float], p: int) -> float:
+    """Nearest-rank percentile, as the stats endpoint computes it."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def experiment_payload(args, index: int) -> dict:
+    temperatures = [round(0.2 + 0.5 * i, 1) for i in range(args.cells)]
+    return {
+        "user_prompt": PROMPT,
+        "name": f"Load test {index}",
+        "max_concurrency": args.max_concurrency,
+        "sweep": {
+            "temperature": temperatures,
+            "top_p": [1.0],
+            "max_output_tokens": [args.max_output_tokens],
+            "repetitions": args.repetitions,
+        },
+    }
+
+
+def run_experiment(client, args, index: int, requests: dict) -> dict:
+    """Create one experiment in the background and poll it until it is done."""
+
+    def timed_request(kind, method, url, **kwargs):
+        start = time.perf_counter()
+        response = client.request(method, url, **kwargs)
+        requests[kind].append((time.perf_counter() - start) * 1000)
+        assert response.status_code < 300, (url, response.status_code, response.text)
+        return response.json()
+
+    start = time.perf_counter()
+    job = timed_request(
+        "create",
+        "POST",
+        "/experiments/?background=true",
+        json=experiment_payload(args, index),
+    )
+    while True:
+        progress = timed_request(
+            "status", "GET", f"/experiments/{job['experiment_id']}/status"
+        )
+        if progress["status"] in TERMINAL_STATUSES:
+            break
+        time.sleep(args.poll_interval)
+    return {
+        "id": job["experiment_id"],
+        "status": progress["status"],
+        "ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def run_load(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(
+        config_from_args(args)
+    ) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        for model in MODEL_RATE_LIMITS:
+            request_scheduler.configure(model, rpm=args.rpm, tpm=args.tpm)
+
+        # Same engine settings as the app, on a scratch database
+        engine = create_engine(
+            f"sqlite:///{tmp}/load_test.db",
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(engine, "connect", session.set_sqlite_pragmas)
+        Base.metadata.create_all(engine)
+        session.SessionLocal.configure(bind=engine)
+        db_timer = DatabaseTimer(engine)
+
+        requests = {"create": [], "status": []}
+        api = BackgroundServer(
+            uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+        )
+        with api as api_url, httpx.Client(
+            base_url=api_url, timeout=60
+        ) as client, ThreadPoolExecutor(max_workers=args.concurrency) as clients:
+            start = time.perf_counter()
+            experiments = list(
+                clients.map(
+                    lambda i: run_experiment(client, args, i, requests),
+                    range(args.experiments),
+                )
+            )
+            wall_seconds = time.perf_counter() - start
+
+        with session.SessionLocal() as db:
+            records = db.execute(
+                select(
+                    ResponseRecord.status,
+                    ResponseRecord.latency_ms,
+                    ResponseRecord.ttft_ms,
+                )
+                .join(ExperimentRun)
+                .where(ExperimentRun.experiment_id.in_([e["id"] for e in experiments]))
+            ).all()
+        engine.dispose()
+
+    completed = [r for r in records if r.status == ResponseStatus.COMPLETED]
+    return {
+        "config": {
+            name: value
+            for name, value in vars(args).items()
+            if name not in ("output", "baseline")
+        },
+        "wall_seconds": wall_seconds,
+        "experiments": {
+            "total": len(experiments),
+            "completed": sum(e["status"] == "completed" for e in experiments),
+            "latency_ms": summarize([e["ms"] for e in experiments]),
+        },
+        "runs": {
+            "total": len(records),
+            "completed": len(completed),
+            "per_second": len(completed) / wall_seconds,
+            "latency_ms": summarize([r.latency_ms for r in completed]),
+            "ttft_ms": summarize([r.ttft_ms for r in completed if r.ttft_ms]),
+        },
+        "requests_ms": {kind: summarize(values) for kind, values in requests.items()},
+        "database": {
+            "statements": db_timer.statements,
+            "total_ms": db_timer.total_ms,
+            "ms_per_run": db_timer.total_ms / max(len(records), 1),
+            "share_of_wall": db_timer.total_ms / 1000 / wall_seconds,
+        },
+        "fake_openai": dict(sorted(server.stats.counts.items())),
+    }
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for name, value in results.items():
+        if name == "config":
+            continue
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{name}."))
+        else:
+            flat[f"{prefix}{name}"] = value
+    return flat
+
+
+def _format(value) -> str:
+    return f"{value:>14.2f}" if isinstance(value, float) else f"{value:>14}"
+
+
+def report(results: dict, baseline: dict = None):
+    current = _flatten(results)
+    previous = _flatten(baseline) if baseline else {}
+    header = f"{'measure':<34}{'value':>14}"
+    print(header + (f"{'baseline':>14}{'change':>10}" if baseline else ""))
+    for name, value in current.items():
+        line = f"{name:<34}{_format(value)}"
+        old = previous.get(name)
+        if old is not None:
+            change = f"{(value - old) / old:+.1%}" if old else ""
+            line += f"{_format(old)}{change:>10}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--experiments", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="API clients")
+    parser.add_argument("--cells", type=int, default=3, help="temperatures")
+    parser.add_argument("--repetitions", type=int, default=4)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--max-output-tokens", type=int, default=150)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    # The fake server has no quota, so the limits only bind when lowered
+    parser.add_argument("--rpm", type=int, default=1_000_000)
+    parser.add_argument("--tpm", type=int, default=1_000_000_000)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with results saved earlier")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    # The fake server accepts any key
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    results = run_load(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()